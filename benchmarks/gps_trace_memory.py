@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memória por pedido dos trajetos de GPS.
+
+Compara, para trajetos sintéticos de entregador (aproximação, parada no
+endereço e saída), a memória retida por:
+- gps_logs como List[dict] (o que o json.loads entrega);
+- GpsTrace (arrays tipados);
+- GpsTrace simplificado (Douglas-Peucker, tolerância configurável).
+
+Também mede o tempo do analyze_gps em cada representação.
+
+Como usar:
+    python benchmarks/gps_trace_memory.py
+    python benchmarks/gps_trace_memory.py --points 1000 10000 --tolerance 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "python_brain"))
+
+from gps_evidence import GpsTrace, analyze_gps  # noqa: E402
+
+ADDRESS = (-23.550520, -46.633308)
+
+
+def synthetic_trace(points: int) -> str:
+    """JSON de um trajeto: 40% aproximação, 30% parado na porta, 30% saída; um ponto a cada 2s."""
+    start = datetime(2025, 11, 20, 18, 0, tzinfo=timezone.utc)
+    approach, stop = int(points * 0.4), int(points * 0.3)
+    logs = []
+    for i in range(points):
+        if i < approach:
+            progress = 1 - i / approach
+            lat, lon = ADDRESS[0] - 0.02 * progress, ADDRESS[1] + 0.01 * progress
+        elif i < approach + stop:
+            lat, lon = ADDRESS[0] + 0.00001 * (i % 3), ADDRESS[1]
+        else:
+            progress = (i - approach - stop) / (points - approach - stop)
+            lat, lon = ADDRESS[0] + 0.02 * progress, ADDRESS[1]
+        logs.append({
+            "timestamp": (start + timedelta(seconds=2 * i)).isoformat().replace("+00:00", "Z"),
+            "latitude": round(lat, 7),
+            "longitude": round(lon, 7),
+            "distance_to_address_meters": None,
+        })
+    return json.dumps(logs)
+
+
+def retained_bytes(build):
+    """Bytes alocados e ainda vivos após build() (o resultado fica referenciado)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, after - before
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(points: int, tolerance: float):
+    # Aquecimento fora da medição: imports e caches do processo não contam como memória do pedido
+    GpsTrace.from_logs(json.loads(synthetic_trace(10))).simplify(tolerance)
+
+    payload = synthetic_trace(points)
+    logs, dict_bytes = retained_bytes(lambda: json.loads(payload))
+    trace, trace_bytes = retained_bytes(lambda: GpsTrace.from_logs(logs, simplify_tolerance_m=0))
+    simplified, simplified_bytes = retained_bytes(lambda: trace.simplify(tolerance))
+
+    rows = []
+    for label, data, size, count in (
+        ("List[dict]", logs, dict_bytes, len(logs)),
+        ("GpsTrace", trace, trace_bytes, len(trace)),
+        (f"GpsTrace DP {tolerance:g} m", simplified, simplified_bytes, len(simplified)),
+    ):
+        analysis = analyze_gps(data, eta_max="2025-11-20T19:00:00Z", address=ADDRESS)
+        rows.append((label, count, size, timed(lambda: analyze_gps(data, address=ADDRESS)),
+                     analysis["verdict"], analysis["dwell_seconds"]))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memória por pedido dos trajetos de GPS")
+    parser.add_argument("--points", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--tolerance", type=float, default=5.0, help="Tolerância do Douglas-Peucker (m)")
+    args = parser.parse_args()
+
+    print(f"{'pontos':>7} | {'representação':<20} | {'retidos':>7} | {'memória':>10} | {'B/ponto':>7} | "
+          f"{'analyze_gps':>11} | veredito (dwell)")
+    for points in args.points:
+        for label, count, size, ms, verdict, dwell in run(points, args.tolerance):
+            print(f"{points:>7} | {label:<20} | {count:>7} | {size / 1024:>7.1f} KB | {size / points:>7.1f} | "
+                  f"{ms:>8.2f} ms | {verdict} ({dwell:.0f}s)")
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline do cérebro: test_cases/ com serviços externos simulados.
+
+Roda cada arquivo de test_cases/ (e N cópias sintéticas, com order_id próprio)
+pelo modo lote do cérebro (process_jsonl_stream), com o código real de regras,
+caches e spool, mas com stand-ins locais para os serviços externos:
+LLM, Vision, embeddings/RAG, Telegram (HTTP) e Google Sheets. Cada stand-in
+dorme uma latência configurável, para simular a rede. O prompt da defesa e a
+mensagem do Vision também são montados sem o LangChain, então o benchmark não
+depende dele (nem de nenhum pacote do Google) instalado.
+
+Reporta a vazão (pedidos/s) e p50/p95/p99 por etapa. Com --check, compara com
+o baseline gravado (benchmarks/baseline.json) e sai com erro se alguma etapa
+piorar além do limite (código 1). Se a configuração ou as ações finais
+diferirem do baseline (ex.: dependências diferentes no ambiente), as medidas
+não são comparáveis (código 2): regenere o baseline com --update-baseline.
+
+Todo estado local (índices, caches, spool) fica em um diretório temporário.
+
+Como usar:
+    python benchmarks/refund_pipeline_bench.py
+    python benchmarks/refund_pipeline_bench.py --copies 50 --workers 8 --latency llm=0.8,vision=1.5
+    python benchmarks/refund_pipeline_bench.py --update-baseline
+    python benchmarks/refund_pipeline_bench.py --check --threshold 0.25
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import atexit
+import argparse
+import tempfile
+import threading
+import contextlib
+from types import SimpleNamespace
+
+import numpy as np
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BRAIN_DIR = os.path.join(REPO_DIR, "python_brain")
+CASES_DIR = os.path.join(REPO_DIR, "test_cases")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Latência simulada (s) de cada serviço externo
+DEFAULT_LATENCY = {
+    "llm": 0.05,
+    "vision": 0.08,
+    "embeddings": 0.01,
+    "telegram": 0.02,
+    "sheets": 0.03,
+}
+
+# Diferenças menores que isso (ms) não contam como regressão: ruído de agendamento
+MIN_DELTA_MS = 5.0
+
+
+class StageRecorder:
+    """Durações (ms) por etapa, de várias threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, stage: str, ms: float):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(ms)
+
+    def timed(self, stage: str, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, (time.perf_counter() - start) * 1000)
+        return wrapper
+
+    def summary(self) -> dict:
+        stages = {}
+        for stage, values in sorted(self.samples.items()):
+            arr = np.asarray(values)
+            p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+            stages[stage] = {
+                "count": int(arr.size),
+                "mean_ms": round(float(arr.mean()), 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+            }
+        return stages
+
+
+# --- STAND-INS DOS SERVIÇOS EXTERNOS ---
+def _usage(prompt: str, content: str) -> dict:
+    # ~4 caracteres por token, como estimativa do usage_metadata do Gemini
+    input_tokens, output_tokens = len(prompt) // 4, len(content) // 4
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+class FakeLLM:
+    """Gemini de texto: JSON para a análise de chat, texto para a defesa."""
+
+    def __init__(self, latency: float, recorder: StageRecorder):
+        self.latency = latency
+        self.recorder = recorder
+
+    def invoke(self, prompt):
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        text = str(prompt)
+        if '"informal_agreement"' in text:
+            stage = "llm_chat"
+            content = json.dumps({
+                "has_chat": True,
+                "informal_agreement": {"exists": False, "details": ""},
+                "customer_absent": {"likely": True, "evidence": "Entregador sem resposta (stand-in)"},
+                "contact_attempts": 3,
+                "sentiment": "neutral",
+                "findings": ["Cliente não respondeu (stand-in)"],
+                "red_flags": [],
+                "summary": "Conversa simulada.",
+            })
+        else:
+            stage = "llm_defense"
+            content = "Defesa gerada pelo stand-in do LLM."
+        self.recorder.add(stage, (time.perf_counter() - start) * 1000)
+        return SimpleNamespace(content=content, usage_metadata=_usage(text, content))
+
+
+class FakeVision:
+    def __init__(self, latency: float, recorder: StageRecorder):
+        self.latency = latency
+        self.recorder = recorder
+
+    def invoke(self, messages):
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        self.recorder.add("vision_model", (time.perf_counter() - start) * 1000)
+        content = json.dumps({
+            "verdict": "NEGAR_REEMBOLSO",
+            "confidence": 0.9,
+            "reasoning": "Imagem sem o defeito alegado (stand-in).",
+            "red_flags": [],
+        })
+        return SimpleNamespace(content=content, usage_metadata=_usage(str(messages), content))
+
+
+class FakeRagChain:
+    """Cadeia RAG: embedding da consulta + geração."""
+
+    def __init__(self, latency: dict, recorder: StageRecorder):
+        self.latency = latency
+        self.recorder = recorder
+
+    def invoke(self, inputs, config=None):
+        start = time.perf_counter()
+        time.sleep(self.latency["embeddings"] + self.latency["llm"])
+        self.recorder.add("rag_chain", (time.perf_counter() - start) * 1000)
+        return {"answer": f"Regra oficial (stand-in) para: {inputs['input']}"}
+
+
+class TemplatePrompt:
+    """ChatPromptTemplate da defesa sem langchain: mesmo template, formatação f-string."""
+
+    def __init__(self, template: str):
+        self.template = template
+
+    def format(self, **fields) -> str:
+        return self.template.format(**fields)
+
+
+def fake_vision_message(prompt: str, image_url: str) -> list:
+    """HumanMessage do Vision sem langchain: o FakeVision só precisa do conteúdo."""
+    return [{"type": "text", "text": prompt}, {"type": "image_url", "image_url": image_url}]
+
+
+class FakeHttp:
+    """Sessão HTTP do Telegram."""
+
+    def __init__(self, latency: float, recorder: StageRecorder):
+        self.latency = latency
+        self.recorder = recorder
+
+    def post(self, url, json=None, timeout=None):
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        self.recorder.add("telegram_http", (time.perf_counter() - start) * 1000)
+        return SimpleNamespace(status_code=200, text="ok", json=lambda: {"result": {"message_id": 1}})
+
+
+class FakeSheetsSink:
+    """Destino do spool de ROI: append_rows com latência, planilha em memória."""
+
+    def __init__(self, latency: float, recorder: StageRecorder):
+        self.latency = latency
+        self.recorder = recorder
+        self.order_ids = set()
+
+    def append_rows(self, rows):
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        self.order_ids.update(row[0] for row in rows)
+        self.recorder.add("sheets_append", (time.perf_counter() - start) * 1000)
+
+    def existing_order_ids(self) -> set:
+        return set(self.order_ids)
+
+
+# --- EXECUÇÃO ---
+def load_cases(copies: int) -> list:
+    """Linhas JSONL: cada caso de test_cases/ repetido `copies` vezes, com order_id único."""
+    lines = []
+    names = sorted(name for name in os.listdir(CASES_DIR) if name.endswith(".json"))
+    for copy in range(copies):
+        for name in names:
+            with open(os.path.join(CASES_DIR, name), encoding="utf-8") as f:
+                case = json.load(f)
+            case.pop("expected_result", None)
+            case["order_id"] = f"{case.get('order_id', name)}-B{copy:04d}"
+            photo = case.get("photo_evidence_url")
+            if photo and not photo.startswith(("http://", "https://")) and not os.path.isabs(photo):
+                case["photo_evidence_url"] = os.path.join(REPO_DIR, photo)
+            lines.append(json.dumps(case, ensure_ascii=False))
+    return lines
+
+
+def setup_environment(workdir: str):
+    """Estado local em diretório temporário e credenciais fictícias (antes de importar o cérebro)."""
+    os.environ.update({
+        "IMAGE_INDEX_PATH": os.path.join(workdir, "image_index.db"),
+        "CHAT_CACHE_PATH": os.path.join(workdir, "chat_cache.db"),
+        "CUSTOMER_RISK_PATH": os.path.join(workdir, "customer_risk.db"),
+        "LLM_USAGE_PATH": os.path.join(workdir, "llm_usage.db"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.db"),
+        "TELEGRAM_BOT_TOKEN": "bench",
+        "TELEGRAM_CHAT_ID": "bench",
+        "SPREADSHEET_ID": "bench",
+    })
+    sys.path.insert(0, BRAIN_DIR)
+
+
+def run(copies: int, workers: int, latency: dict) -> dict:
+    workdir = tempfile.mkdtemp(prefix="refund_bench_")
+    try:
+        setup_environment(workdir)
+        import reimbursement_brain as brain
+        from clients import get_registry
+        from policy_cache import PolicyAnswerCache
+        from roi_spool import RoiSpool
+
+        recorder = StageRecorder()
+        registry = get_registry()
+        registry.register("llm", lambda r: FakeLLM(latency["llm"], recorder))
+        registry.register("vision", lambda r: FakeVision(latency["vision"], recorder))
+        registry.register("rag_chain", lambda r: FakeRagChain(latency, recorder))
+        registry.register("http", lambda r: FakeHttp(latency["telegram"], recorder))
+
+        # Prompt e mensagens do LangChain também são simulados: as mesmas ações com ou sem
+        # langchain instalado, e o baseline vale para qualquer ambiente
+        brain._communication_prompt = TemplatePrompt(brain.COMMUNICATION_TEMPLATE)
+        brain.build_vision_message = fake_vision_message
+
+        # Cache de respostas da política vazio: a primeira consulta de cada regra passa pelo RAG
+        brain.policy_answers = PolicyAnswerCache(cache_path=os.path.join(workdir, "policy_answers.json"))
+        sink = FakeSheetsSink(latency["sheets"], recorder)
+        spool = RoiSpool(sink, path=os.path.join(workdir, "roi_spool.db"))
+        brain._roi_spool = spool
+
+        for name, stage in (
+            ("analyze_image_evidence", "vision"),
+            ("analyze_chat_context", "chat"),
+            ("get_policy_answer", "policy"),
+            ("send_telegram_approval", "telegram"),
+            ("log_roi_to_sheet", "roi_enqueue"),
+            ("_process_jsonl_line", "order"),
+        ):
+            setattr(brain, name, recorder.timed(stage, getattr(brain, name)))
+
+        lines = load_cases(copies)
+        out = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stderr(io.StringIO()):
+            brain.process_jsonl_stream(lines, max_in_flight=workers, out=out)
+            wall = time.perf_counter() - start
+            flush_start = time.perf_counter()
+            spool.flush_all()
+            recorder.add("sheets_flush", (time.perf_counter() - flush_start) * 1000)
+            spool.close()
+            # O diretório do spool é apagado ao final: nada a drenar no atexit
+            atexit.unregister(spool.close)
+
+        actions = {}
+        for line in out.getvalue().splitlines():
+            action = json.loads(line)["action"]
+            actions[action] = actions.get(action, 0) + 1
+        return {
+            "config": {"copies": copies, "workers": workers, "latency": latency},
+            "orders": len(lines),
+            "wall_s": round(wall, 3),
+            "throughput_per_s": round(len(lines) / wall, 2),
+            "actions": dict(sorted(actions.items())),
+            "stages": recorder.summary(),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def comparable(report: dict, baseline: dict):
+    """Motivo pelo qual o relatório não é comparável com o baseline, ou None."""
+    if report["config"] != baseline["config"]:
+        return f"configuração diferente do baseline: {report['config']} != {baseline['config']}"
+    # Mesmas entradas com ações diferentes = outros caminhos (ex.: dependências faltando no ambiente)
+    if report["actions"] != baseline["actions"]:
+        return f"ações diferentes do baseline: {report['actions']} != {baseline['actions']}"
+    return None
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """Regressões em relação ao baseline (lista vazia = ok); exige comparable()."""
+    regressions = []
+    for stage, base in baseline["stages"].items():
+        current = report["stages"].get(stage)
+        if current is None:
+            continue
+        limit = base["p95_ms"] * (1 + threshold)
+        if current["p95_ms"] > limit and current["p95_ms"] - base["p95_ms"] > MIN_DELTA_MS:
+            regressions.append(f"{stage}: p95 {current['p95_ms']:.1f} ms > {base['p95_ms']:.1f} ms "
+                               f"(+{threshold:.0%} = {limit:.1f} ms)")
+
+    floor = baseline["throughput_per_s"] / (1 + threshold)
+    if report["throughput_per_s"] < floor:
+        regressions.append(f"vazão {report['throughput_per_s']:.1f}/s < {baseline['throughput_per_s']:.1f}/s "
+                           f"(-{threshold:.0%} = {floor:.1f}/s)")
+    return regressions
+
+
+def parse_latency(spec: str) -> dict:
+    latency = dict(DEFAULT_LATENCY)
+    for item in filter(None, (spec or "").split(",")):
+        name, _, value = item.partition("=")
+        if name not in latency:
+            raise SystemExit(f"Serviço desconhecido em --latency: {name} (use {', '.join(latency)})")
+        latency[name] = float(value)
+    return latency
+
+
+def print_report(report: dict):
+    print(f"📦 {report['orders']} pedido(s) em {report['wall_s']:.2f}s com {report['config']['workers']} worker(s): "
+          f"{report['throughput_per_s']:.1f} pedidos/s")
+    print(f"   ações: {report['actions']}")
+    print(f"   {'etapa':<14} | {'n':>5} | {'p50':>9} | {'p95':>9} | {'p99':>9}")
+    for stage, s in report["stages"].items():
+        print(f"   {stage:<14} | {s['count']:>5} | {s['p50_ms']:>6.1f} ms | {s['p95_ms']:>6.1f} ms | {s['p99_ms']:>6.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark offline do cérebro com serviços simulados")
+    parser.add_argument("--copies", type=int, default=5, help="Cópias sintéticas de cada caso")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", default="", help="Ex.: llm=0.8,vision=1.5 (segundos)")
+    parser.add_argument("--json", action="store_true", help="Imprime o relatório em JSON")
+    parser.add_argument("--update-baseline", action="store_true", help=f"Grava o resultado em {BASELINE_PATH}")
+    parser.add_argument("--check", action="store_true", help="Falha se piorar além do limite em relação ao baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Piora tolerada (fração), padrão 0.25")
+    args = parser.parse_args()
+
+    report = run(args.copies, args.workers, parse_latency(args.latency))
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"💾 Baseline gravado em {BASELINE_PATH}")
+
+    if args.check:
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+        reason = comparable(report, baseline)
+        if reason:
+            print(f"⚠️ Baseline não comparável ({reason}). Regenere com --update-baseline neste ambiente.")
+            sys.exit(2)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print("❌ Regressão de performance:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"✅ Dentro do baseline (limite +{args.threshold:.0%}).")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark: índice NumPy (memmap) vs Chroma para a base da política.
+
+Cada backend é medido em um processo novo (como um worker do n8n):
+- import: tempo para importar o backend;
+- abertura: tempo para abrir o índice persistido;
+- memória: RSS máximo acrescido pelo import + abertura + consultas;
+- consulta: latência p50/p95 de similarity_search (k=4) nas consultas fixas do cérebro.
+
+Os embeddings são determinísticos e locais (hash -> vetor), então o benchmark
+não chama a API e mede só o índice. Sem chromadb instalado, o Chroma é pulado.
+
+Como usar:
+    python benchmarks/vector_index_bench.py
+    python benchmarks/vector_index_bench.py --synthetic 5000 --queries 500
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import resource
+import tempfile
+import subprocess
+
+BRAIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "python_brain")
+sys.path.insert(0, BRAIN_DIR)
+
+DIM = 768  # dimensão do text-embedding-004
+
+
+class HashEmbeddings:
+    """Embeddings determinísticos sem rede (mesmo texto -> mesmo vetor)."""
+
+    def _vector(self, text):
+        import numpy as np
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).standard_normal(DIM).astype("float32").tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def corpus(synthetic: int) -> list:
+    from policy_corpus import load_chunks
+    chunks = load_chunks()
+    for i in range(synthetic):
+        text = f"SEÇÃO SINTÉTICA {i // 10}:\n{i}.1. Cláusula sintética número {i} para medir escala."
+        chunks.append({"id": f"synthetic-{i}", "text": text, "metadata": {"source": "synthetic", "section": str(i // 10)}})
+    return chunks
+
+
+def open_store(backend: str, path: str):
+    if backend == "numpy":
+        from vector_index import NumpyVectorStore
+        return NumpyVectorStore(path, embedding_function=HashEmbeddings())
+    from langchain_community.vectorstores import Chroma
+    return Chroma(persist_directory=path, embedding_function=HashEmbeddings())
+
+
+def build(backend: str, path: str, synthetic: int):
+    from ingest_policy import sync_chunks
+    store = open_store(backend, path)
+    sync_chunks(store, corpus(synthetic))
+    store.persist()
+
+
+def child(backend: str, path: str, queries: int) -> dict:
+    """Roda dentro do processo medido."""
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if backend == "numpy":
+        import vector_index  # noqa: F401
+    else:
+        from langchain_community.vectorstores import Chroma  # noqa: F401
+    import_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = open_store(backend, path)
+    open_s = time.perf_counter() - start
+
+    from policy_cache import POLICY_QUERIES
+    search = store.similarity_search
+    if backend == "numpy":
+        try:
+            import langchain_core  # noqa: F401
+        except ImportError:
+            # Sem LangChain, mede a busca crua (sem embrulhar em Document)
+            search = store.search
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        search(POLICY_QUERIES[i % len(POLICY_QUERIES)], k=4)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "import_s": import_s,
+        "open_s": open_s,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+        # ru_maxrss em KB no Linux
+        "rss_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss) / 1024,
+    }
+
+
+def run_child(args: list) -> dict:
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__)] + args,
+                               capture_output=True, text=True, timeout=600)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "falhou")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def available(backend: str) -> bool:
+    if backend == "numpy":
+        return True
+    try:
+        import chromadb  # noqa: F401
+        import langchain_community  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice NumPy vs Chroma para a política")
+    parser.add_argument("--synthetic", type=int, default=0, help="Chunks sintéticos além da política")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--child", choices=["numpy", "chroma"], help=argparse.SUPPRESS)
+    parser.add_argument("--build", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        if args.build:
+            build(args.child, args.path, args.synthetic)
+            print(json.dumps({"built": True}))
+        else:
+            print(json.dumps(child(args.child, args.path, args.queries)))
+        sys.exit(0)
+
+    workdir = tempfile.mkdtemp(prefix="vector_index_bench_")
+    try:
+        print(f"{'backend':<8} | {'import':>8} | {'abertura':>8} | {'memória':>9} | {'p50':>8} | {'p95':>8}")
+        for backend in ("numpy", "chroma"):
+            if not available(backend):
+                print(f"{backend:<8} | chromadb/langchain_community não instalados: pulado")
+                continue
+            path = os.path.join(workdir, backend)
+            run_child(["--child", backend, "--build", "--path", path, "--synthetic", str(args.synthetic)])
+            r = run_child(["--child", backend, "--path", path, "--queries", str(args.queries)])
+            print(f"{backend:<8} | {r['import_s'] * 1000:>5.0f} ms | {r['open_s'] * 1000:>5.1f} ms | "
+                  f"{r['rss_mb']:>6.1f} MB | {r['p50_ms']:>5.2f} ms | {r['p95_ms']:>5.2f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -1,10 +1,15 @@
 import streamlit as st
 import pandas as pd
-import gspread
 import plotly.express as px
 import os
+import sys
 from datetime import datetime
 
+# Módulos compartilhados de acesso a dados ficam em python_brain/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'python_brain'))
+from sheets_client import find_credentials
+from roi_mirror import get_roi_mirror
+
 # Configuração da Página
 st.set_page_config(
     page_title="iFood Refund Agent Dashboard",
@@ -76,94 +81,37 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- Função de Carregamento de Dados ---
-# @st.cache_data(ttl=60) # Cache removido temporariamente para debug
+# O espelho SQLite só consulta a planilha quando o TTL expira (e só as linhas novas)
 def load_data():
     try:
-        # Caminho para as credenciais (ajuste conforme necessário)
-        # Assumindo que estamos rodando da raiz do projeto ou da pasta dashboard
         # Tenta pegar do .env primeiro (mais seguro)
         from dotenv import load_dotenv
         load_dotenv()
         
-        spreadsheet_id = os.getenv("SPREADSHEET_ID")
-        
-        # Caminho para as credenciais
         # Tenta achar o client_secret.json em vários lugares possíveis
-        possible_paths = [
-            os.path.join(os.path.dirname(os.path.dirname(__file__)), 'python_brain', 'client_secret.json'),
-            'client_secret.json',
-            '../python_brain/client_secret.json'
-        ]
-        
-        creds_path = None
-        for path in possible_paths:
-            if os.path.exists(path):
-                creds_path = path
-                break
-                
-        if not creds_path:
+        if not find_credentials():
             st.error("Arquivo client_secret.json não encontrado.")
-            return pd.DataFrame()
-             
-        gc = gspread.service_account(filename=creds_path)
-        
-        if spreadsheet_id:
-             sh = gc.open_by_key(spreadsheet_id)
-        else:
-             # Fallback para o ID antigo se não tiver no env (apenas para garantir retrocompatibilidade)
-             sh = gc.open_by_key("14qM34cpPSK8rPcIfjQhY1kI1ysJBAdkaGa_xGX3TKao")
+            return None
              
-        # Tenta abrir a aba correta, se falhar tenta a primeira
-        try:
-            ws = sh.worksheet("Relatório_ROI_iFood")
-        except:
-            ws = sh.sheet1
-        
-        # Pega todos os dados
-        data = ws.get_all_records()
-        df = pd.DataFrame(data)
-        
-        # DEBUG: Mostra os dados brutos no app se necessário (comentado para produção)
-        # st.write("Raw Data Sample:", df.head())
-        
-        # Limpeza e Conversão de Tipos
-        if 'Valor (R$)' in df.columns:
-            # Se já for numérico, não faz nada
-            if not pd.api.types.is_numeric_dtype(df['Valor (R$)']):
-                # Se for string, limpa R$, pontos de milhar e ajusta vírgula decimal
-                df['Valor (R$)'] = df['Valor (R$)'].astype(str).str.replace('R$', '', regex=False).str.strip()
-                
-                # Função segura para converter
-                def clean_currency(x):
-                    if isinstance(x, str):
-                        # Se tem vírgula, assume formato BR (1.000,00)
-                        if ',' in x:
-                            x = x.replace('.', '').replace(',', '.')
-                        # Se não tem vírgula mas tem ponto, assume formato US (1000.00)
-                        # (Nenhum tratamento especial necessário além do float())
-                    return float(x)
-
-                df['Valor (R$)'] = df['Valor (R$)'].apply(clean_currency)
-            
-        # Converte Data
-        if 'Data' in df.columns:
-            df['Data'] = pd.to_datetime(df['Data'])
-            
-        return df
+        # Cliente compartilhado (sem SPREADSHEET_ID no .env, usa o ID antigo por retrocompatibilidade)
+        mirror = get_roi_mirror()
+        mirror.sync_if_stale()
+        return mirror
     except Exception as e:
         st.error(f"Erro ao carregar dados: {e}")
-        return pd.DataFrame()
+        return None
 
 # --- Sidebar ---
 st.sidebar.image("https://logodownload.org/wp-content/uploads/2017/05/ifood-logo-0.png", width=150)
 st.sidebar.title("Filtros")
 
-df = load_data()
+mirror = load_data()
+bounds = mirror.date_bounds() if mirror is not None else (None, None)
 
-if not df.empty:
+if bounds[0] is not None:
     # Filtro de Data
-    min_date = df['Data'].min().date()
-    max_date = df['Data'].max().date()
+    min_date = pd.to_datetime(bounds[0]).date()
+    max_date = pd.to_datetime(bounds[1]).date()
     
     date_range = st.sidebar.date_input(
         "Período",
@@ -172,12 +120,11 @@ if not df.empty:
         max_value=max_date
     )
     
-    # Filtra o DataFrame
+    # Filtro aplicado direto nas consultas SQL do espelho
     if len(date_range) == 2:
-        mask = (df['Data'].dt.date >= date_range[0]) & (df['Data'].dt.date <= date_range[1])
-        df_filtered = df.loc[mask]
+        start, end = date_range[0].isoformat(), date_range[1].isoformat()
     else:
-        df_filtered = df
+        start, end = None, None
 
     # --- KPIs Principais ---
     st.title("🤖 Dashboard de Contestações")
@@ -185,15 +132,19 @@ if not df.empty:
     
     col1, col2, col3, col4 = st.columns(4)
     
-    total_contestacoes = len(df_filtered)
-    valor_total = df_filtered['Valor (R$)'].sum()
-    ticket_medio = df_filtered['Valor (R$)'].mean()
-    maior_valor = df_filtered['Valor (R$)'].max()
+    kpis = mirror.kpis(start, end)
+    total_contestacoes = kpis['total']
+    valor_total = kpis['valor_total']
+    ticket_medio = kpis['ticket_medio']
+    maior_valor = kpis['maior_valor']
     
     col1.metric("Total Contestações", total_contestacoes, delta_color="off")
     col2.metric("Valor Recuperado", f"R$ {valor_total:,.2f}", delta_color="normal")
     col3.metric("Ticket Médio", f"R$ {ticket_medio:,.2f}")
     col4.metric("Maior Valor", f"R$ {maior_valor:,.2f}")
+
+    if kpis['ambiguos']:
+        st.warning(f"⚠️ {kpis['ambiguos']} valor(es) ambíguo(s) na planilha (ex.: '1.234' ou inteiros > 100). Confira a coluna 'Valor (R$)'.")
     
     st.markdown("---")
     
@@ -203,7 +154,7 @@ if not df.empty:
     with col_left:
         st.subheader("📈 Evolução Diária")
         # Agrupa por dia
-        daily_data = df_filtered.groupby(df_filtered['Data'].dt.date)['Valor (R$)'].sum().reset_index()
+        daily_data = mirror.daily(start, end)
         fig_line = px.line(daily_data, x='Data', y='Valor (R$)', markers=True, line_shape='spline')
         
         # Estilização Dark Mode para Plotly
@@ -219,7 +170,7 @@ if not df.empty:
         
     with col_right:
         st.subheader("🏆 Top 5 Maiores Valores")
-        top_5 = df_filtered.nlargest(5, 'Valor (R$)')
+        top_5 = mirror.top(5, start, end)
         fig_bar = px.bar(top_5, x='Order ID', y='Valor (R$)', color='Valor (R$)', 
                          color_continuous_scale=[[0, '#ffcccc'], [1, '#ea1d2c']]) # Gradiente vermelho
         
@@ -237,7 +188,7 @@ if not df.empty:
     # --- Tabela de Detalhes ---
     st.subheader("📋 Detalhamento das Contestações")
     st.dataframe(
-        df_filtered[['Order ID', 'Data', 'Valor (R$)', 'Defesa Gerada']].sort_values('Data', ascending=False),
+        mirror.rows(start, end),
         use_container_width=True,
         hide_index=True
     )
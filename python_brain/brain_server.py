@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Modo serviço (long-lived) do Cérebro de Reembolso.
+
+Em vez de o n8n disparar um processo Python por pedido (reimportando
+langchain/gspread e reabrindo o ChromaDB a cada webhook), este servidor
+mantém o processo vivo: `llm`, `rag_db`, `retriever` e `rag_chain` são criados
+UMA vez (no primeiro pedido que precisa deles, via clients.py) e
+`process_refund_request` fica exposto via HTTP com atendimento concorrente.
+
+Como usar:
+    python brain_server.py                 # waitress em 127.0.0.1:8001
+    BRAIN_PORT=9000 python brain_server.py
+    BRAIN_WSGI_SERVER=flask python brain_server.py   # servidor de desenvolvimento (só local)
+
+Em produção o `python brain_server.py` já sobe o waitress (Linux e Windows).
+Com gunicorn, use um único processo com threads, para que o limite de
+concorrência, os clientes e o /metrics sejam compartilhados:
+    gunicorn -w 1 --threads 10 -b 127.0.0.1:8001 brain_server:app
+
+No n8n, troque o nó "Execute Command" por um nó "HTTP Request":
+    POST http://127.0.0.1:8001/process  (Body: JSON do pedido)
+A resposta é exatamente o mesmo JSON que o script imprime no stdout
+(com `?timings=1`, ou BRAIN_INCLUDE_TIMINGS=1, vem também o bloco `timings`).
+
+GET /metrics expõe histogramas de duração por etapa e por pedido no formato
+texto do Prometheus.
+"""
+
+import os
+import sys
+import threading
+
+from flask import Flask, Response, jsonify, request
+
+# Os clientes do cérebro (LLM, embeddings, ChromaDB) são criados no primeiro uso e reaproveitados
+import reimbursement_brain as brain
+from tracing import INCLUDE_TIMINGS, render_metrics
+
+app = Flask(__name__)
+
+# Limita quantos pedidos são processados ao mesmo tempo (protege cota do Gemini)
+MAX_CONCURRENCY = int(os.getenv("BRAIN_MAX_CONCURRENCY", "8"))
+_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+# Servidor WSGI do `python brain_server.py`: waitress (padrão) ou flask (desenvolvimento)
+WSGI_SERVER = os.getenv("BRAIN_WSGI_SERVER", "waitress")
+
+
+@app.route('/health')
+def health():
+    return jsonify({"status": "ok", "max_concurrency": MAX_CONCURRENCY})
+
+
+@app.route('/process', methods=['POST'])
+def process():
+    json_data = request.get_data(as_text=True)
+    include_timings = request.args.get("timings", "1" if INCLUDE_TIMINGS else "0") == "1"
+    with _slots:
+        result = brain.process_refund_request(json_data, include_timings=include_timings)
+    # Mesmo contrato do modo CLI: sempre 200 com o JSON de resultado
+    return jsonify(result)
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+if __name__ == '__main__':
+    host = os.getenv("BRAIN_HOST", "127.0.0.1")
+    port = int(os.getenv("BRAIN_PORT", "8001"))
+    if WSGI_SERVER == "flask":
+        print("⚠️ Servidor de desenvolvimento do Flask: não use em produção.", file=sys.stderr)
+        print(f"🚀 Cérebro em modo serviço em http://{host}:{port} (concorrência máx.: {MAX_CONCURRENCY})", file=sys.stderr)
+        app.run(host=host, port=port, threaded=True)
+    elif WSGI_SERVER == "waitress":
+        try:
+            from waitress import serve
+        except ImportError:
+            print("❌ waitress não instalado (pip install -r requirements.txt). "
+                  "Para testes locais, use BRAIN_WSGI_SERVER=flask.", file=sys.stderr)
+            sys.exit(1)
+        print(f"🚀 Cérebro em modo serviço (waitress) em http://{host}:{port} "
+              f"(concorrência máx.: {MAX_CONCURRENCY})", file=sys.stderr)
+        # Threads além do limite de pedidos: /health e /metrics respondem mesmo com a fila cheia
+        serve(app, host=host, port=port, threads=MAX_CONCURRENCY + 2)
+    else:
+        print(f"❌ BRAIN_WSGI_SERVER inválido: {WSGI_SERVER} (use waitress ou flask)", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Triagem em lote: regras determinísticas vetorizadas sobre milhares de pedidos.
+
+Carrega o lote em um DataFrame (uma coluna por campo do OrderData) e avalia
+as regras rígidas do cérebro de uma vez, na mesma ordem do
+process_refund_request:
+
+1. PIN validado                      -> decidido (CONTESTAR)
+2. cliente com risco alto, sem atraso -> decidido (PENDING, revisão humana)
+3. QUALITY_ISSUE com foto            -> needs_vision
+4. chegada após eta_max + 15 min     -> decidido (ACEITAR_CANCELAMENTO)
+5. ITEM_NOT_RECEIVED e GPS aguardou  -> decidido (CONTESTAR)
+6. chegada no prazo                  -> needs_chat
+7. sem horário de chegada / inválido -> incomplete
+
+O GPS (chegada medida e permanência no endereço) só é analisado nas linhas
+que dependem dele. O risco do cliente usa o customer_history do payload; o
+store por customer_id continua sendo consultado pelo cérebro.
+
+Os buckets são gravados como JSONL (as linhas originais), prontos para o
+modo lote do cérebro, de forma que as etapas caras só recebam o resíduo:
+    python bulk_triage.py pedidos.jsonl --out triagem/
+    python reimbursement_brain.py --jsonl triagem/decided.jsonl
+    python reimbursement_brain.py --jsonl triagem/needs_chat.jsonl --workers 8
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from customer_risk import HIGH_RATE, MIN_REFUNDS
+from gps_evidence import VERDICT_ANOMALOUS, VERDICT_WAITED, analyze_gps
+
+BUCKET_DECIDED = "decided"
+BUCKET_VISION = "needs_vision"
+BUCKET_CHAT = "needs_chat"
+BUCKET_INCOMPLETE = "incomplete"
+BUCKETS = [BUCKET_DECIDED, BUCKET_VISION, BUCKET_CHAT, BUCKET_INCOMPLETE]
+
+# Mesma tolerância da REGRA B do cérebro
+LATE_TOLERANCE = pd.Timedelta(minutes=15)
+
+REQUIRED_FIELDS = ["order_id", "reason_code", "timestamps", "delivery_evidence", "chat_history"]
+
+# Campos do OrderData carregados no DataFrame (aninhados com ".")
+COLUMNS = [
+    "order_id",
+    "reason_code",
+    "photo_evidence_url",
+    "timestamps.eta_max",
+    "timestamps.actual_arrival_at",
+    "delivery_evidence.gps_logs",
+    "delivery_evidence.delivery_pin_validated",
+    "delivery_evidence.address_latitude",
+    "delivery_evidence.address_longitude",
+    "customer_history.total_orders",
+    "customer_history.refund_requests",
+]
+
+
+def _parse(raw):
+    """JSON da linha (ou dict) e o motivo, se inválido."""
+    if isinstance(raw, dict):
+        order = raw
+    else:
+        try:
+            order = json.loads(raw)
+        except ValueError as e:
+            return {}, f"JSON inválido: {e}"
+        if not isinstance(order, dict):
+            return {}, "JSON inválido: esperado um objeto"
+    missing = [field for field in REQUIRED_FIELDS if field not in order]
+    if missing:
+        return order, f"Campos obrigatórios ausentes: {', '.join(missing)}"
+    return order, None
+
+
+def _get(order: dict, path: tuple):
+    for key in path:
+        if not isinstance(order, dict):
+            return None
+        order = order.get(key)
+    return order
+
+
+def load_orders(orders: list) -> pd.DataFrame:
+    """DataFrame colunar do lote: uma linha por pedido, com a linha original em `raw`."""
+    parsed = [_parse(raw) for raw in orders]
+    # Só as colunas que as regras usam (json_normalize do pedido inteiro custa ~3x mais)
+    frame = pd.DataFrame({
+        column: [_get(order, tuple(column.split("."))) for order, _ in parsed]
+        for column in COLUMNS
+    })
+    frame["raw"] = [raw if isinstance(raw, str) else json.dumps(raw, ensure_ascii=False) for raw in orders]
+    frame["invalid_reason"] = [error for _, error in parsed]
+    return frame
+
+
+def _gps_residue(frame: pd.DataFrame, mask: pd.Series) -> pd.DataFrame:
+    """Análise de GPS (por pedido, local) só nas linhas marcadas."""
+    arrived = pd.Series(pd.NaT, index=frame.index, dtype="datetime64[ns, UTC]")
+    waited = pd.Series(False, index=frame.index)
+    errors = pd.Series(None, index=frame.index, dtype=object)
+    logs = frame["delivery_evidence.gps_logs"]
+    eta = frame["timestamps.eta_max"]
+    lat = frame["delivery_evidence.address_latitude"]
+    lon = frame["delivery_evidence.address_longitude"]
+    for i in frame.index[mask]:
+        try:
+            address = (lat[i], lon[i]) if pd.notna(lat[i]) and pd.notna(lon[i]) else None
+            analysis = analyze_gps(logs[i], eta_max=eta[i], address=address)
+        except ValueError as e:
+            errors[i] = f"GPS inválido: {e}"
+            continue
+        # Trajeto anômalo não serve como prova: sem horário de chegada, como no cérebro
+        if analysis["arrived_at"] and analysis["verdict"] != VERDICT_ANOMALOUS:
+            arrived[i] = pd.Timestamp(analysis["arrived_at"])
+        waited[i] = analysis["verdict"] == VERDICT_WAITED
+    return pd.DataFrame({"gps_arrived_at": arrived, "gps_waited": waited, "gps_error": errors})
+
+
+def triage(orders: list) -> dict:
+    """
+    Particiona o lote nos buckets.
+
+    Args:
+        orders: linhas JSON (str) ou dicts no formato do OrderData
+
+    Returns:
+        dict com frame (colunas bucket, action, rule), counts e timings_ms
+    """
+    timings = {}
+    start = time.perf_counter()
+    frame = load_orders(orders)
+    timings["load"] = (time.perf_counter() - start) * 1000
+
+    step = time.perf_counter()
+    invalid = frame["invalid_reason"].notna()
+    reason = frame["reason_code"].astype(str)
+    pin = frame["delivery_evidence.delivery_pin_validated"].eq(True)
+    eta = pd.to_datetime(frame["timestamps.eta_max"], utc=True, errors="coerce", format="ISO8601")
+    arrival = pd.to_datetime(frame["timestamps.actual_arrival_at"], utc=True, errors="coerce",
+                             format="ISO8601")
+    photo = frame["photo_evidence_url"].fillna("").astype(str).str.len() > 0
+    quality_photo = (reason == "QUALITY_ISSUE") & photo
+    item_not_received = reason == "ITEM_NOT_RECEIVED"
+    has_gps = frame["delivery_evidence.gps_logs"].map(lambda logs: bool(logs) if isinstance(logs, list) else False)
+    invalid |= eta.isna()
+
+    # Risco pelo customer_history do payload (mesma fórmula do customer_risk.score)
+    refunds = pd.to_numeric(frame["customer_history.refund_requests"], errors="coerce").fillna(0).clip(lower=0)
+    total = pd.to_numeric(frame["customer_history.total_orders"], errors="coerce").fillna(0)
+    # Sem total de pedidos o risco é desconhecido (não vira a contagem de reembolsos)
+    total = np.where(total > 0, np.maximum(total, refunds), 0)
+    rate = (refunds + 1) / (total + 2)
+    high_risk = (total > 0) & (refunds >= MIN_REFUNDS) & (rate >= HIGH_RATE)
+    timings["rules"] = (time.perf_counter() - step) * 1000
+
+    # Resíduo do GPS: sem horário de chegada, ou ITEM_NOT_RECEIVED (REGRA D)
+    step = time.perf_counter()
+    gps_needed = ~invalid & ~pin & has_gps & (arrival.isna() | item_not_received)
+    gps = _gps_residue(frame, gps_needed)
+    invalid |= gps["gps_error"].notna()
+    timings["gps"] = (time.perf_counter() - step) * 1000
+    timings["gps_orders"] = int(gps_needed.sum())
+
+    step = time.perf_counter()
+    effective_arrival = arrival.fillna(gps["gps_arrived_at"])
+    has_arrival = effective_arrival.notna()
+    late = has_arrival & (effective_arrival > eta + LATE_TOLERANCE)
+
+    conditions = [
+        invalid,
+        pin,
+        high_risk & ~late,
+        quality_photo,
+        late,
+        has_arrival & item_not_received & gps["gps_waited"],
+        has_arrival,
+    ]
+    frame["bucket"] = np.select(conditions, [
+        BUCKET_INCOMPLETE, BUCKET_DECIDED, BUCKET_DECIDED, BUCKET_VISION,
+        BUCKET_DECIDED, BUCKET_DECIDED, BUCKET_CHAT,
+    ], default=BUCKET_INCOMPLETE)
+    frame["action"] = np.select(conditions, [
+        "ERROR", "CONTESTAR", "PENDING", "", "ACEITAR_CANCELAMENTO", "CONTESTAR", "",
+    ], default="PENDING")
+    frame["rule"] = np.select(conditions, [
+        "INVALIDO", "PIN", "RISCO_CLIENTE", "QUALIDADE_COM_FOTO", "ATRASO", "GPS_AGUARDOU", "CHAT",
+    ], default="SEM_CHEGADA")
+    frame["invalid_reason"] = frame["invalid_reason"].fillna(gps["gps_error"])
+    timings["partition"] = (time.perf_counter() - step) * 1000
+    timings["total"] = (time.perf_counter() - start) * 1000
+
+    counts = frame["bucket"].value_counts().reindex(BUCKETS, fill_value=0)
+    return {
+        "frame": frame,
+        "counts": {bucket: int(count) for bucket, count in counts.items()},
+        "timings_ms": {name: round(value, 3) if isinstance(value, float) else value
+                       for name, value in timings.items()},
+    }
+
+
+def write_buckets(frame: pd.DataFrame, out_dir: str):
+    """Um JSONL por bucket (linhas originais) e triage.jsonl com o veredito de cada pedido."""
+    os.makedirs(out_dir, exist_ok=True)
+    for bucket in BUCKETS:
+        with open(os.path.join(out_dir, f"{bucket}.jsonl"), "w", encoding="utf-8") as f:
+            for raw in frame.loc[frame["bucket"] == bucket, "raw"]:
+                f.write(raw.strip() + "\n")
+    order_ids = frame["order_id"]
+    with open(os.path.join(out_dir, "triage.jsonl"), "w", encoding="utf-8") as f:
+        for i in frame.index:
+            f.write(json.dumps({
+                "order_id": order_ids[i] if pd.notna(order_ids[i]) else None,
+                "bucket": frame.at[i, "bucket"],
+                "action": frame.at[i, "action"] or None,
+                "rule": frame.at[i, "rule"],
+                "error": frame.at[i, "invalid_reason"] if pd.notna(frame.at[i, "invalid_reason"]) else None,
+            }, ensure_ascii=False) + "\n")
+
+
+def _read_lines(source: str) -> list:
+    if source == "-":
+        return [line for line in sys.stdin if line.strip()]
+    if os.path.isdir(source):
+        # Diretório de casos (ex.: test_cases/): um pedido por arquivo .json
+        lines = []
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".json"):
+                with open(os.path.join(source, name), encoding="utf-8") as f:
+                    lines.append(json.dumps(json.load(f), ensure_ascii=False))
+        return lines
+    with open(source, encoding="utf-8") as f:
+        return [line for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Triagem em lote dos pedidos (sem LLM)")
+    parser.add_argument("source", help="Arquivo JSONL, diretório de .json ou - para stdin")
+    parser.add_argument("--out", help="Diretório para os JSONL por bucket")
+    args = parser.parse_args()
+
+    result = triage(_read_lines(args.source))
+    if args.out:
+        write_buckets(result["frame"], args.out)
+
+    total = sum(result["counts"].values())
+    timings = result["timings_ms"]
+    print(f"🗂️ Triagem de {total} pedido(s) em {timings['total']:.1f} ms "
+          f"(carga {timings['load']:.1f} ms, regras {timings['rules']:.1f} ms, "
+          f"GPS {timings['gps']:.1f} ms em {timings['gps_orders']} pedido(s), partição {timings['partition']:.1f} ms)",
+          file=sys.stderr)
+    for bucket in BUCKETS:
+        print(f"   {bucket}: {result['counts'][bucket]}", file=sys.stderr)
+    print(json.dumps({"counts": result["counts"], "timings_ms": timings}, ensure_ascii=False))
@@ -0,0 +1,160 @@
+"""
+Cache incremental da análise de chat (Gemini) por pedido.
+
+O n8n reenvia pedidos em retry e novos eventos chegam com o chat do mesmo
+pedido acrescido de mensagens. Em vez de reenviar o histórico inteiro:
+
+- cada prefixo do chat tem um hash encadeado (h_i = sha256(h_{i-1} + msg_i));
+- o último resultado do pedido fica gravado com o hash e o tamanho do prefixo
+  analisado, mais um resumo curto da conversa escrito pelo próprio LLM;
+- retry com o mesmo chat devolve o resultado gravado; chat com mensagens novas
+  manda ao LLM só o resumo anterior + as mensagens novas.
+
+Chats longos respeitam CHAT_TOKEN_BUDGET: as mensagens mais recentes vão na
+íntegra e as mais antigas viram um resumo local (contagens e sinais das regras).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from chat_rules import classify_chat
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CHAT_CACHE_PATH = os.getenv("CHAT_CACHE_PATH", os.path.join(SCRIPT_DIR, "chat_cache.db"))
+
+# Orçamento aproximado (tokens) para as mensagens enviadas em um prompt
+TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "1500"))
+
+
+def format_message(msg: dict) -> str:
+    return f"{msg.get('timestamp', 'N/A')} - {msg.get('sender', 'unknown')}: {msg.get('text', '')}"
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata (~4 caracteres por token), suficiente para o orçamento."""
+    return len(text) // 4 + 1
+
+
+def prefix_hashes(chat_history: list, seed: str) -> list:
+    """Hash encadeado de cada prefixo: hashes[k - 1] identifica as k primeiras mensagens."""
+    hashes = []
+    current = hashlib.sha256(seed.encode("utf-8")).hexdigest()
+    for msg in chat_history:
+        canonical = json.dumps(msg, sort_keys=True, ensure_ascii=False, default=str)
+        current = hashlib.sha256((current + canonical).encode("utf-8")).hexdigest()
+        hashes.append(current)
+    return hashes
+
+
+def summarize_locally(messages: list) -> str:
+    """Resumo sem LLM das mensagens que não cabem no orçamento."""
+    senders = {}
+    for msg in messages:
+        sender = msg.get("sender", "unknown")
+        senders[sender] = senders.get(sender, 0) + 1
+    counts = ", ".join(f"{count} de {sender}" for sender, count in senders.items())
+    signals = classify_chat(messages)
+    summary = (f"{len(messages)} mensagem(ns) anteriores ({counts}), "
+               f"de {messages[0].get('timestamp', 'N/A')} a {messages[-1].get('timestamp', 'N/A')}.")
+    if signals["findings"] or signals["red_flags"]:
+        summary += " Sinais: " + "; ".join(signals["findings"] + signals["red_flags"]) + "."
+    return summary
+
+
+def compact_history(messages: list, budget: int = TOKEN_BUDGET):
+    """
+    Cabe as mensagens no orçamento: as mais recentes na íntegra, as antigas resumidas.
+
+    Returns:
+        (resumo local das mensagens antigas ou "", texto das mensagens recentes)
+    """
+    recent = []
+    used = 0
+    for msg in reversed(messages):
+        line = format_message(msg)
+        cost = estimate_tokens(line)
+        # Sempre envia pelo menos a última mensagem
+        if recent and used + cost > budget:
+            break
+        recent.append(line)
+        used += cost
+    recent.reverse()
+    older = messages[:len(messages) - len(recent)]
+    return (summarize_locally(older) if older else ""), "\n".join(recent)
+
+
+class ChatAnalysisCache:
+    """Última análise de chat por pedido, em SQLite."""
+
+    def __init__(self, path: str = CHAT_CACHE_PATH):
+        self.path = path
+        self._init_db()
+
+    @contextmanager
+    def _db(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._db() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_analyses (
+                    order_id TEXT PRIMARY KEY,
+                    message_count INTEGER NOT NULL,
+                    prefix_hash TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    summary TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def lookup(self, order_id: str, hashes: list):
+        """
+        Análise gravada cujo chat é prefixo do chat atual.
+
+        Returns:
+            dict com message_count, result e summary, ou None
+        """
+        with self._db() as conn:
+            row = conn.execute(
+                "SELECT message_count, prefix_hash, result, summary FROM chat_analyses WHERE order_id = ?",
+                (str(order_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        count, prefix_hash, result, summary = row
+        # Chat editado ou encurtado não é prefixo: a análise é refeita do zero
+        if count == 0 or count > len(hashes) or hashes[count - 1] != prefix_hash:
+            return None
+        return {"message_count": count, "result": json.loads(result), "summary": summary or ""}
+
+    def store(self, order_id: str, hashes: list, result: dict, summary: str):
+        with self._db() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_analyses (order_id, message_count, prefix_hash, result, summary, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(order_id), len(hashes), hashes[-1], json.dumps(result, ensure_ascii=False), summary, time.time())
+            )
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_chat_cache() -> ChatAnalysisCache:
+    """Cache compartilhado do processo."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ChatAnalysisCache()
+        return _shared_cache
@@ -0,0 +1,241 @@
+"""
+Pré-classificador local do chat (regras e palavras-chave, sem LLM).
+
+Boa parte dos chats de entrega no prazo sem PIN tem sinal trivial:
+"deixa na portaria", tentativas de contato do entregador sem resposta
+("cliente não atende", "liguei 3 vezes"), ou uma
+reclamação que chega muito depois do "Entregue!". Este módulo extrai esses
+sinais localmente e devolve o mesmo formato de resultado do
+`analyze_chat_context` (informal_agreement, customer_absent,
+contact_attempts, sentiment, findings, red_flags), mais:
+
+- confidence: quão claro é o sinal encontrado (0.0 a 1.0);
+- complaint_latency_minutes: minutos entre a última mensagem do entregador
+  e a primeira reclamação do cliente;
+- engine: "rules".
+
+Abaixo de CHAT_RULES_MIN_CONFIDENCE o cérebro escala para o Gemini.
+"""
+
+import os
+import re
+import unicodedata
+from datetime import datetime
+
+MIN_CONFIDENCE = float(os.getenv("CHAT_RULES_MIN_CONFIDENCE", "0.8"))
+
+# Confiança de um pedido de local alternativo sem confirmação do entregador:
+# sempre abaixo do MIN_CONFIDENCE, para o chat ir ao Gemini
+UNCONFIRMED_AGREEMENT_CONFIDENCE = min(0.5, MIN_CONFIDENCE - 0.01)
+
+# Reclamação depois disso (em minutos) é sinal de fraude
+LATE_COMPLAINT_MINUTES = int(os.getenv("CHAT_LATE_COMPLAINT_MINUTES", "30"))
+
+# Cliente que responde com reclamação até esse tempo (min) depois das mensagens do entregador não estava ausente
+RESPONSIVE_COMPLAINT_MINUTES = 10
+
+DRIVER_SENDERS = {"driver", "entregador"}
+# Mensagens da loja não são tentativas de contato do entregador
+RESTAURANT_SENDERS = {"restaurant", "restaurante", "merchant", "loja"}
+CUSTOMER_SENDERS = {"customer", "cliente"}
+
+# Textos comparados sem acento e em minúsculas
+ALTERNATIVE_PLACE = re.compile(
+    r"\b(portaria|porteiro|vizinh[oa]|recepcao|guarita|zelador|sindico|caixa de correio|seguranca)\b"
+)
+# "entrega"/"entregue" ficam de fora: aparecem em reclamações ("não foi entregue na portaria")
+AGREEMENT_REQUEST = re.compile(r"\b(pode deixar|deixa|deixe|deixar|larga)\b")
+# "ok" sozinho não confirma nada ("ok, vou verificar")
+AGREEMENT_CONFIRMATION = re.compile(r"\b(deixei|vou deixar|deixado|entreguei|sem problemas?|combinado|beleza)\b")
+# Negação que não seja só o cliente dizendo que não pode receber ("não vou conseguir descer")
+NEGATION = re.compile(
+    r"\b(nao|nunca)\b(?!\s+(vou conseguir|consigo|posso|vou poder|estou|estarei|precisa))"
+)
+ABSENCE = re.compile(
+    r"(nao atend|nao respond|ninguem atend|nao consegui entregar|cliente ausente|sem resposta|onde (voce|vc) esta)"
+)
+MENTIONED_CALLS = re.compile(r"(?:liguei|ligar|tentei ligar)\D{0,20}(\d+)\s*vez")
+DELIVERED = re.compile(r"\b(entregue|entreguei|deixei|bom apetite)\b")
+# Status de rotina do entregador: não são tentativas de contato
+STATUS = re.compile(r"(sai para (a )?entrega|a caminho|saindo|chegando|to indo|estou indo)")
+COMPLAINT = re.compile(
+    r"(nao recebi|reembolso|horrivel|fri[oa]|errad[oa]|faltou|faltando|estragad|problema|reclam|pessim)"
+)
+CORDIAL = re.compile(r"\b(obrigad[oa]|valeu|por favor|bom apetite|agradec)")
+AGGRESSIVE = re.compile(r"\b(absurdo|lixo|palhacada|vergonha|ridiculo|processar|procon)\b")
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _minutes(start, end):
+    if start is None or end is None:
+        return None
+    return round((end - start).total_seconds() / 60)
+
+
+def _informal_agreement(messages: list):
+    """Pedido do cliente por local alternativo, confirmado (ou não) pelo entregador."""
+    for i, msg in enumerate(messages):
+        if msg["role"] != "customer":
+            continue
+        if not (ALTERNATIVE_PLACE.search(msg["norm"]) and AGREEMENT_REQUEST.search(msg["norm"])):
+            continue
+        # Reclamação que cita o local ("não deixaram na portaria") não é pedido
+        if NEGATION.search(msg["norm"]) or COMPLAINT.search(msg["norm"]):
+            continue
+        confirmed_by = next(
+            (later for later in messages[i + 1:]
+             if later["role"] == "driver" and AGREEMENT_CONFIRMATION.search(later["norm"])),
+            None
+        )
+        details = f"Cliente pediu: \"{msg['text']}\""
+        if confirmed_by:
+            details += f" / Entregador confirmou: \"{confirmed_by['text']}\""
+            return {"exists": True, "details": details}, 0.9
+        return {"exists": True, "details": details}, UNCONFIRMED_AGREEMENT_CONFIDENCE
+    return {"exists": False, "details": ""}, 0.0
+
+
+def _contact_attempts(messages: list):
+    """
+    Maior sequência de tentativas de contato do entregador sem resposta do cliente.
+
+    Mensagens da loja e status de rotina ("a caminho", "Entregue!") não contam.
+    A sequência encerrada por uma reclamação logo em seguida fica marcada
+    (answered_by_complaint): o cliente estava ali.
+    """
+    best = {"messages": 0, "calls": 0, "minutes": 0, "absence_text": None, "answered_by_complaint": False}
+    run = []
+    for msg in messages + [None]:
+        if msg is not None and msg["role"] == "driver":
+            if not (DELIVERED.search(msg["norm"]) or STATUS.search(msg["norm"])) or ABSENCE.search(msg["norm"]):
+                run.append(msg)
+            continue
+        if msg is not None and msg["role"] != "customer":
+            continue
+        if run and len(run) > best["messages"]:
+            calls = sum(int(m.group(1)) for r in run for m in MENTIONED_CALLS.finditer(r["norm"]))
+            absence = next((r["text"] for r in run if ABSENCE.search(r["norm"])), None)
+            reply_minutes = _minutes(run[-1]["time"], msg["time"]) if msg is not None else None
+            best = {
+                "messages": len(run),
+                "calls": calls,
+                "minutes": _minutes(run[0]["time"], run[-1]["time"]) or 0,
+                "absence_text": absence,
+                # Sem horário, a reclamação seguinte conta como imediata
+                "answered_by_complaint": bool(
+                    msg is not None and COMPLAINT.search(msg["norm"])
+                    and (reply_minutes is None or reply_minutes <= RESPONSIVE_COMPLAINT_MINUTES)
+                ),
+            }
+        run = []
+    return best
+
+
+def _complaint_latency(messages: list):
+    """Minutos entre a última mensagem do entregador e a primeira reclamação posterior do cliente."""
+    last_driver = None
+    for i, msg in enumerate(messages):
+        if msg["role"] == "driver":
+            last_driver = i
+        elif msg["role"] == "customer" and last_driver is not None and COMPLAINT.search(msg["norm"]):
+            return _minutes(messages[last_driver]["time"], msg["time"]), last_driver, i
+    return None, None, None
+
+
+def classify_chat(chat_history: list) -> dict:
+    """
+    Classifica o chat por regras.
+
+    Returns:
+        dict no formato do analyze_chat_context, com confidence,
+        complaint_latency_minutes e engine="rules"
+    """
+    messages = []
+    for raw in chat_history or []:
+        sender = _normalize(str(raw.get("sender", "")))
+        role = ("driver" if sender in DRIVER_SENDERS else "customer" if sender in CUSTOMER_SENDERS
+                else "restaurant" if sender in RESTAURANT_SENDERS else "other")
+        text = str(raw.get("text", ""))
+        messages.append({"role": role, "text": text, "norm": _normalize(text), "time": _parse_time(raw.get("timestamp"))})
+    # Ordena por horário quando todos têm timestamp; senão mantém a ordem recebida
+    if messages and all(m["time"] is not None for m in messages):
+        messages.sort(key=lambda m: m["time"])
+
+    findings = []
+    red_flags = []
+
+    agreement, agreement_confidence = _informal_agreement(messages)
+    if agreement["exists"]:
+        findings.append(f"Acordo informal de entrega: {agreement['details']}")
+
+    attempts = _contact_attempts(messages)
+    contact_attempts = min(attempts["messages"] + attempts["calls"], 10)
+    # Ausência só com texto explícito ou ligações citadas; volume de mensagens sozinho não basta
+    absent_confidence = 0.0
+    if attempts["answered_by_complaint"]:
+        absent_confidence = 0.0
+    elif attempts["messages"] >= 3 and (attempts["absence_text"] or attempts["calls"]):
+        absent_confidence = 0.9
+    elif attempts["messages"] >= 2 and attempts["absence_text"]:
+        absent_confidence = 0.75
+    customer_absent = {"likely": absent_confidence > 0, "evidence": ""}
+    if customer_absent["likely"]:
+        customer_absent["evidence"] = (
+            f"{attempts['messages']} mensagem(ns) do entregador sem resposta ao longo de {attempts['minutes']} min"
+            + (f"; \"{attempts['absence_text']}\"" if attempts["absence_text"] else "")
+        )
+        findings.append(f"Cliente ausente: {customer_absent['evidence']}")
+
+    latency, last_driver, complaint = _complaint_latency(messages)
+    if latency is not None and latency >= LATE_COMPLAINT_MINUTES:
+        red_flags.append(f"reclamacao_tardia ({latency} min após a última mensagem do entregador)")
+    if complaint is not None:
+        acknowledged = any(
+            m["role"] == "customer" and CORDIAL.search(m["norm"]) and not COMPLAINT.search(m["norm"])
+            for m in messages[last_driver + 1:complaint]
+        )
+        if acknowledged and DELIVERED.search(messages[last_driver]["norm"]):
+            red_flags.append("mudanca_de_comportamento (cliente agradeceu a entrega e reclamou depois)")
+
+    customer_text = " ".join(m["norm"] for m in messages if m["role"] == "customer")
+    if red_flags:
+        sentiment = "suspeito"
+    elif AGGRESSIVE.search(customer_text) or customer_text.count("!") >= 3:
+        sentiment = "agressivo"
+    elif CORDIAL.search(customer_text):
+        sentiment = "cordial"
+    else:
+        sentiment = "neutral"
+
+    # Confiança = sinal mais forte; só sinais de fraude (sem ausência/acordo) já bastam para revisão humana
+    fraud_confidence = 0.8 if len(red_flags) >= 2 else 0.5 if red_flags else 0.0
+    confidence = max(absent_confidence, agreement_confidence, fraud_confidence) or 0.3
+    if agreement["exists"] and agreement_confidence < MIN_CONFIDENCE:
+        # Acordo sem confirmação é ambíguo mesmo com outros sinais fortes: decide o Gemini
+        confidence = min(confidence, agreement_confidence)
+
+    return {
+        "has_chat": bool(messages),
+        "informal_agreement": agreement,
+        "customer_absent": customer_absent,
+        "contact_attempts": contact_attempts,
+        "complaint_latency_minutes": latency,
+        "sentiment": sentiment,
+        "findings": findings,
+        "red_flags": red_flags,
+        "confidence": confidence,
+        "engine": "rules",
+    }
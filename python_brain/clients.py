@@ -0,0 +1,138 @@
+"""
+Registro de clientes externos, criados sob demanda.
+
+Importar o cérebro não conecta em nada: cada cliente (LLM, modelo de visão,
+embeddings com cache em disco, Chroma, cadeia RAG, Google Sheets, sessão HTTP) é construído no
+primeiro `get()` e reaproveitado pelo resto do processo. Caminhos que nunca
+tocam um subsistema (JSON malformado, PENDING por falta de timestamps,
+defesa por template com regra em cache) também nunca importam a biblioteca
+correspondente.
+
+Como usar:
+    from clients import get_client
+    llm = get_client("llm")
+"""
+
+import os
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+VECTOR_DB_DIR = os.path.join(SCRIPT_DIR, "chroma_db_ifood")
+
+# Backend do índice da política: "chroma" (padrão) ou "numpy" (vector_index, memmap em processo)
+RAG_BACKEND = os.getenv("RAG_BACKEND", "chroma").lower()
+
+
+def require_google_api_key() -> str:
+    """Chave do Gemini, verificada só quando algum cliente do Google é criado."""
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        # Se a chave não estiver no .env, levanta um erro claro
+        raise ValueError("A chave GOOGLE_API_KEY não foi encontrada no arquivo .env")
+    return api_key
+
+
+class ClientRegistry:
+    """Fábricas por nome; cada instância é criada uma vez, no primeiro uso."""
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        # RLock: fábricas dependem de outros clientes (ex.: rag_chain -> llm, retriever)
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str):
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Cliente não registrado: {name}")
+                self._instances[name] = self._factories[name](self)
+            return self._instances[name]
+
+    def initialized(self) -> list:
+        """Clientes já criados neste processo."""
+        with self._lock:
+            return sorted(self._instances)
+
+
+# --- FÁBRICAS PADRÃO ---
+def _llm(registry):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    require_google_api_key()
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.0-flash",
+        temperature=0,
+        max_retries=2,
+    )
+
+
+def _vision(registry):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    require_google_api_key()
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.0-flash-exp",
+        temperature=0.1  # Baixa temperatura para análise objetiva
+    )
+
+
+def _embeddings(registry):
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from embedding_cache import CachedEmbeddings
+    require_google_api_key()
+    # Cache em disco (LRU): consultas repetidas e reingestões sem mudança não chamam a API
+    return CachedEmbeddings(GoogleGenerativeAIEmbeddings(model="models/text-embedding-004"))
+
+
+def _vector_db(registry):
+    if RAG_BACKEND == "numpy":
+        from vector_index import NumpyVectorStore
+        return NumpyVectorStore(embedding_function=registry.get("embeddings"))
+    from langchain_community.vectorstores import Chroma
+    return Chroma(persist_directory=VECTOR_DB_DIR, embedding_function=registry.get("embeddings"))
+
+
+def _retriever(registry):
+    return registry.get("vector_db").as_retriever()
+
+
+def _rag_chain(registry):
+    from policy_cache import build_rag_chain
+    return build_rag_chain(registry.get("llm"), registry.get("retriever"))
+
+
+def _sheets(registry):
+    from sheets_client import get_sheets_client
+    return get_sheets_client()
+
+
+def _http(registry):
+    import requests
+    return requests.Session()
+
+
+_registry = ClientRegistry()
+for _name, _factory in {
+    "llm": _llm,
+    "vision": _vision,
+    "embeddings": _embeddings,
+    "vector_db": _vector_db,
+    "retriever": _retriever,
+    "rag_chain": _rag_chain,
+    "sheets": _sheets,
+    "http": _http,
+}.items():
+    _registry.register(_name, _factory)
+
+
+def get_registry() -> ClientRegistry:
+    """Registro compartilhado do processo."""
+    return _registry
+
+
+def get_client(name: str):
+    return _registry.get(name)
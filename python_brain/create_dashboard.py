@@ -8,11 +8,11 @@ import gspread
 from datetime import datetime
 from dotenv import load_dotenv
 
+from sheets_client import ROI_HEADER, ROI_WORKSHEET, get_sheets_client
+
 # Configuração
 load_dotenv()
 SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-CREDS_FILE = os.path.join(SCRIPT_DIR, 'client_secret.json')
 
 # --- PALETA DE CORES IFOOD (Baseada na Referência) ---
 IFOOD_RED_PRIMARY = {'red': 0.917, 'green': 0.113, 'blue': 0.141} # #EA1D2C (Vermelho Vibrante)
@@ -28,8 +28,9 @@ def create_dashboard():
     if not SPREADSHEET_ID:
         raise ValueError("SPREADSHEET_ID não encontrado no arquivo .env")
 
-    gc = gspread.service_account(filename=CREDS_FILE)
-    spreadsheet = gc.open_by_key(SPREADSHEET_ID)
+    # Cliente compartilhado: todas as chamadas de formatação passam pela cota da API
+    sheets = get_sheets_client()
+    spreadsheet = sheets.spreadsheet(SPREADSHEET_ID)
     
     # --- 1. PREPARAÇÃO DAS ABAS ---
     try:
@@ -42,13 +43,8 @@ def create_dashboard():
         print("📊 Criando nova aba Dashboard...")
         dashboard = spreadsheet.add_worksheet(title="Dashboard", rows=60, cols=15)
     
-    # Garante aba de dados
-    try:
-        data_sheet = spreadsheet.worksheet("Relatório_ROI_iFood")
-    except gspread.exceptions.WorksheetNotFound:
-        print("📝 Criando aba de dados...")
-        data_sheet = spreadsheet.add_worksheet(title="Relatório_ROI_iFood", rows=1000, cols=10)
-        data_sheet.append_row(["Order ID", "Valor (R$)", "Data", "Defesa Gerada"])
+    # Garante aba de dados (cria com cabeçalho se não existir)
+    sheets.worksheet(ROI_WORKSHEET, SPREADSHEET_ID, create_header=ROI_HEADER)
 
     # --- 2. ESTRUTURA E FÓRMULAS ---
     print("🎨 Construindo layout premium iFood...")
@@ -267,6 +263,7 @@ def create_dashboard():
     dashboard.update_index(0)
     print("✅ Dashboard Premium iFood Style criado com sucesso!")
     print(f"🔗 Acesse: https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}")
+    print(f"📊 Chamadas à API do Sheets: {sheets.counters()}")
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Risco do cliente: estatísticas de reembolso por cliente, em SQLite indexado.
+
+O payload pode trazer `customer_history` (total_orders, refund_requests,
+refund_rate) e `customer_id`. Este módulo guarda, por cliente:
+- o último histórico informado pela plataforma (snapshot);
+- os pedidos decididos por este motor e a ação de cada um (incremental,
+  idempotente por order_id: retry não conta duas vezes, e a troca de ação
+  de um pedido só move o contador correspondente).
+
+As consultas são por chave primária (O(1) por pedido). O score é a taxa de
+reembolso suavizada ((reembolsos + 1) / (pedidos + 2)), para que poucos
+pedidos não virem risco extremo; sem o snapshot da plataforma não há total de
+pedidos, e o risco fica "desconhecido". Cliente com pelo menos
+CUSTOMER_RISK_MIN_REFUNDS reembolsos e score >= CUSTOMER_RISK_HIGH_RATE é
+"alto": o cérebro manda para revisão humana antes de qualquer chamada ao Gemini.
+
+Como usar:
+    python customer_risk.py --stats
+    python customer_risk.py --customer CLIENTE-123
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CUSTOMER_RISK_PATH = os.getenv("CUSTOMER_RISK_PATH", os.path.join(SCRIPT_DIR, "customer_risk.db"))
+
+# Limiares do risco alto: mínimo de reembolsos e taxa suavizada
+MIN_REFUNDS = int(os.getenv("CUSTOMER_RISK_MIN_REFUNDS", "3"))
+HIGH_RATE = float(os.getenv("CUSTOMER_RISK_HIGH_RATE", "0.4"))
+MEDIUM_RATE = float(os.getenv("CUSTOMER_RISK_MEDIUM_RATE", "0.2"))
+
+RISK_HIGH = "alto"
+RISK_MEDIUM = "medio"
+RISK_LOW = "baixo"
+RISK_UNKNOWN = "desconhecido"
+
+# Ações que contam como reembolso concedido ou contestado
+ACCEPTED_ACTIONS = {"ACEITAR_CANCELAMENTO"}
+CONTESTED_ACTIONS = {"CONTESTAR"}
+
+
+def _counter_for(action):
+    if action in ACCEPTED_ACTIONS:
+        return "accepted"
+    if action in CONTESTED_ACTIONS:
+        return "contested"
+    return None
+
+
+def _as_int(value) -> int:
+    try:
+        return max(int(value or 0), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def score(total_orders: int, refund_requests: int, accepted: int = 0, contested: int = 0,
+          customer_id=None, source: str = "payload") -> dict:
+    """Nível de risco a partir das contagens (sem I/O); sem total de pedidos, risco desconhecido."""
+    if total_orders > 0:
+        total_orders = max(total_orders, refund_requests)
+    if total_orders == 0:
+        level, rate = RISK_UNKNOWN, None
+    else:
+        rate = round((refund_requests + 1) / (total_orders + 2), 3)
+        if refund_requests >= MIN_REFUNDS and rate >= HIGH_RATE:
+            level = RISK_HIGH
+        elif rate >= MEDIUM_RATE:
+            level = RISK_MEDIUM
+        else:
+            level = RISK_LOW
+    return {
+        "customer_id": customer_id,
+        "level": level,
+        "score": rate,
+        "total_orders": total_orders,
+        "refund_requests": refund_requests,
+        "accepted": accepted,
+        "contested": contested,
+        "source": source,
+    }
+
+
+def _store_score(snapshot_orders: int, snapshot_refunds: int, requests: int, accepted: int, contested: int,
+                 customer_id) -> dict:
+    """
+    Risco pelas contagens do store. Só o snapshot da plataforma traz o total de
+    pedidos: sem ele, os pedidos vistos aqui (todos pedidos de reembolso) não
+    formam uma taxa, e o risco fica desconhecido.
+    """
+    if snapshot_orders <= 0:
+        return score(0, requests, accepted, contested, customer_id=customer_id, source="store")
+    # O snapshot pode não incluir os reembolsos vistos aqui depois dele: vale o maior dos dois
+    return score(snapshot_orders, max(snapshot_refunds, requests), accepted, contested,
+                 customer_id=customer_id, source="store")
+
+
+class CustomerRiskStore:
+    """Estatísticas de reembolso por cliente."""
+
+    def __init__(self, path: str = CUSTOMER_RISK_PATH):
+        self.path = path
+        self._init_db()
+
+    @contextmanager
+    def _db(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._db() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS customers (
+                    customer_id TEXT PRIMARY KEY,
+                    snapshot_orders INTEGER NOT NULL DEFAULT 0,
+                    snapshot_refunds INTEGER NOT NULL DEFAULT 0,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    accepted INTEGER NOT NULL DEFAULT 0,
+                    contested INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS customer_orders (
+                    order_id TEXT PRIMARY KEY,
+                    customer_id TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def assess(self, customer_id: str, order_id: str, history: dict = None) -> dict:
+        """
+        Atualiza o snapshot da plataforma (se veio no payload) e devolve o risco.
+
+        O pedido atual não entra nas contagens: um retry do mesmo pedido não
+        aumenta o risco do próprio pedido.
+        """
+        history = history or {}
+        customer_id = str(customer_id)
+        with self._db() as conn:
+            if history:
+                conn.execute(
+                    "INSERT INTO customers (customer_id, snapshot_orders, snapshot_refunds, updated_at) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT(customer_id) DO UPDATE SET "
+                    "snapshot_orders = excluded.snapshot_orders, snapshot_refunds = excluded.snapshot_refunds, "
+                    "updated_at = excluded.updated_at",
+                    (customer_id, _as_int(history.get("total_orders")),
+                     _as_int(history.get("refund_requests")), time.time())
+                )
+            row = conn.execute(
+                "SELECT snapshot_orders, snapshot_refunds, requests, accepted, contested "
+                "FROM customers WHERE customer_id = ?",
+                (customer_id,)
+            ).fetchone()
+            current = conn.execute(
+                "SELECT action FROM customer_orders WHERE order_id = ? AND customer_id = ?",
+                (str(order_id), customer_id)
+            ).fetchone()
+        if row is None:
+            return score(0, 0, customer_id=customer_id, source="store")
+
+        snapshot_orders, snapshot_refunds, requests, accepted, contested = row
+        if current is not None:
+            requests -= 1
+            counter = _counter_for(current[0])
+            if counter == "accepted":
+                accepted -= 1
+            elif counter == "contested":
+                contested -= 1
+        return _store_score(snapshot_orders, snapshot_refunds, requests, accepted, contested, customer_id)
+
+    def record(self, customer_id: str, order_id: str, action: str):
+        """Registra (ou atualiza) a ação de um pedido, ajustando os contadores do cliente."""
+        customer_id, order_id = str(customer_id), str(order_id)
+        now = time.time()
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            previous = conn.execute(
+                "SELECT customer_id, action FROM customer_orders WHERE order_id = ?", (order_id,)
+            ).fetchone()
+            if previous == (customer_id, action):
+                return
+            conn.execute(
+                "INSERT INTO customers (customer_id, updated_at) VALUES (?, ?) ON CONFLICT(customer_id) DO NOTHING",
+                (customer_id, now)
+            )
+            if previous is not None:
+                old_customer, old_action = previous
+                old_counter = _counter_for(old_action)
+                conn.execute(
+                    "UPDATE customers SET requests = requests - 1, updated_at = ? WHERE customer_id = ?",
+                    (now, old_customer)
+                )
+                if old_counter:
+                    conn.execute(
+                        f"UPDATE customers SET {old_counter} = {old_counter} - 1 WHERE customer_id = ?",
+                        (old_customer,)
+                    )
+            counter = _counter_for(action)
+            conn.execute(
+                "UPDATE customers SET requests = requests + 1, updated_at = ? WHERE customer_id = ?",
+                (now, customer_id)
+            )
+            if counter:
+                conn.execute(f"UPDATE customers SET {counter} = {counter} + 1 WHERE customer_id = ?", (customer_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO customer_orders (order_id, customer_id, action, updated_at) VALUES (?, ?, ?, ?)",
+                (order_id, customer_id, action, now)
+            )
+
+    def stats(self) -> dict:
+        with self._db() as conn:
+            customers, requests = conn.execute("SELECT COUNT(*), COALESCE(SUM(requests), 0) FROM customers").fetchone()
+            rows = conn.execute(
+                "SELECT customer_id, snapshot_orders, snapshot_refunds, requests, accepted, contested FROM customers"
+            ).fetchall()
+        high = sum(
+            1 for cid, orders, refunds, req, acc, con in rows
+            if _store_score(orders, refunds, req, acc, con, cid)["level"] == RISK_HIGH
+        )
+        return {"customers": customers, "requests": requests, "high_risk": high}
+
+
+def assess_order(customer_id, order_id: str, history: dict = None) -> dict:
+    """
+    Risco do cliente de um pedido.
+
+    Com customer_id, usa (e alimenta) o store; sem ele, só o customer_history do payload.
+    Returns None quando não há nenhuma informação do cliente.
+    """
+    if customer_id:
+        return get_customer_risk_store().assess(customer_id, order_id, history)
+    if history:
+        return score(_as_int(history.get("total_orders")), _as_int(history.get("refund_requests")))
+    return None
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_customer_risk_store() -> CustomerRiskStore:
+    """Store compartilhado do processo."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = CustomerRiskStore()
+        return _shared_store
+
+
+if __name__ == "__main__":
+    if "--stats" in sys.argv:
+        stats = get_customer_risk_store().stats()
+        print(f"👤 {stats['customers']} cliente(s), {stats['requests']} pedido(s) decididos, "
+              f"{stats['high_risk']} cliente(s) com risco alto.")
+    elif "--customer" in sys.argv and sys.argv.index("--customer") + 1 < len(sys.argv):
+        customer = sys.argv[sys.argv.index("--customer") + 1]
+        print(get_customer_risk_store().assess(customer, order_id=""))
+    else:
+        print("Uso: python customer_risk.py --stats | --customer CUSTOMER_ID")
+        sys.exit(1)
@@ -1,16 +1,9 @@
-import gspread
 import pandas as pd
-import os
 
-# Caminho para as credenciais
-creds_path = 'client_secret.json'
-if not os.path.exists(creds_path):
-    creds_path = os.path.join('python_brain', 'client_secret.json')
+from sheets_client import DEFAULT_SPREADSHEET_ID, ROI_WORKSHEET, find_credentials, get_sheets_client
 
-print(f"Lendo credenciais de: {creds_path}")
-gc = gspread.service_account(filename=creds_path)
-sh = gc.open_by_key("14qM34cpPSK8rPcIfjQhY1kI1ysJBAdkaGa_xGX3TKao")
-ws = sh.worksheet("Relatório_ROI_iFood")
+print(f"Lendo credenciais de: {find_credentials()}")
+ws = get_sheets_client().worksheet(ROI_WORKSHEET, DEFAULT_SPREADSHEET_ID)
 
 data = ws.get_all_records()
 df = pd.DataFrame(data)
@@ -0,0 +1,95 @@
+"""
+Templates parametrizados para a comunicação ao restaurante.
+
+Nos ramos determinísticos (PIN validado, atraso acima da tolerância e GPS
+comprovando a espera) a decisão, a situação e a evidência já estão fechadas;
+não há julgamento para o LLM fazer. Nesses casos (e com o orçamento de tokens
+esgotado) a defesa é montada aqui, sem chamada ao Gemini.
+
+O fechamento da CONTESTAR acompanha a evidência que decidiu o pedido,
+identificada pela consulta da política do ramo (`rag_query`).
+
+O modo de renderização é configurável por ação via variável de ambiente:
+    DEFENSE_RENDER_MODE_CONTESTAR=llm
+    DEFENSE_RENDER_MODE_ACEITAR_CANCELAMENTO=template
+"""
+
+import os
+
+from policy_cache import QUERY_CUSTOMER_ABSENT, QUERY_INFORMAL_AGREEMENT, QUERY_PIN, QUERY_QUALITY_UNPROVEN
+
+RENDER_MODE_TEMPLATE = "template"
+RENDER_MODE_LLM = "llm"
+
+# Padrão: templates para todas as ações com ramo determinístico
+DEFAULT_RENDER_MODES = {
+    "CONTESTAR": RENDER_MODE_TEMPLATE,
+    "ACEITAR_CANCELAMENTO": RENDER_MODE_TEMPLATE,
+}
+
+DEFENSE_TEMPLATES = {
+    "CONTESTAR": (
+        "Prezado Parceiro,\n\n"
+        "Referente ao pedido {order_id}, o cliente alegou \"{customer_claim}\". "
+        "Após análise, a contestação do cliente foi NEGADA e o valor permanece com o restaurante. "
+        "{situation} {evidence}\n\n"
+        "Regra oficial aplicada: {rule_official}\n\n"
+        "{closing}"
+    ),
+    "ACEITAR_CANCELAMENTO": (
+        "Prezado Parceiro,\n\n"
+        "Referente ao pedido {order_id}, o cliente alegou \"{customer_claim}\". "
+        "Após análise, a contestação do cliente foi ACATADA e o cancelamento foi aceito. "
+        "{situation} {evidence}\n\n"
+        "Regra oficial aplicada: {rule_official}\n\n"
+        "Sugerimos revisar os processos internos de preparo e logística "
+        "para evitar novas perdas em situações semelhantes."
+    ),
+}
+
+
+# Fechamento da CONTESTAR por evidência (consulta da política do ramo)
+CONTESTAR_CLOSINGS = {
+    QUERY_PIN: (
+        "Reforçamos a importância de sempre solicitar o código PIN na entrega: "
+        "ele é a prova mais forte de que o pedido foi recebido pelo titular da conta."
+    ),
+    QUERY_CUSTOMER_ABSENT: (
+        "Reforçamos a importância de o entregador aguardar no endereço e registrar as tentativas "
+        "de contato: esses registros comprovam a ausência do cliente."
+    ),
+    QUERY_INFORMAL_AGREEMENT: (
+        "Recomendamos registrar no chat toda combinação de entrega em local alternativo "
+        "(portaria, vizinho): ela comprova que o cliente autorizou a entrega."
+    ),
+    QUERY_QUALITY_UNPROVEN: (
+        "Recomendamos manter o padrão de preparo e embalagem do pedido: "
+        "ele sustenta a contestação de reclamações de qualidade sem evidência."
+    ),
+}
+DEFAULT_CONTESTAR_CLOSING = (
+    "Recomendamos manter registradas as evidências de cada entrega "
+    "para sustentar futuras contestações."
+)
+
+
+def render_mode_for(action: str) -> str:
+    """Modo de renderização configurado para a ação ('template' ou 'llm')."""
+    mode = os.getenv(f"DEFENSE_RENDER_MODE_{action}", DEFAULT_RENDER_MODES.get(action, RENDER_MODE_LLM))
+    mode = mode.strip().lower()
+    if mode not in (RENDER_MODE_TEMPLATE, RENDER_MODE_LLM) or action not in DEFENSE_TEMPLATES:
+        return RENDER_MODE_LLM
+    return mode
+
+
+def render_defense(action: str, rag_query: str = None, **fields) -> str:
+    """
+    Monta a comunicação a partir do template da ação.
+
+    Args:
+        action: CONTESTAR ou ACEITAR_CANCELAMENTO
+        rag_query: consulta da política do ramo; escolhe o fechamento da CONTESTAR
+        fields: situation, evidence, rule_official, order_id, customer_claim
+    """
+    closing = CONTESTAR_CLOSINGS.get(rag_query, DEFAULT_CONTESTAR_CLOSING)
+    return DEFENSE_TEMPLATES[action].format(closing=closing, **fields).strip()
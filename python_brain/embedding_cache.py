@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Cache persistente de embeddings (SQLite, com despejo LRU).
+
+Envolve o objeto de embeddings do LangChain usado pelo Chroma, tanto no
+cérebro (retriever) quanto no ingest_policy.py. A chave é o hash de
+modelo + tipo (query ou documento, que o Gemini embeda com task_type
+diferentes) + texto, e o vetor fica gravado em float32.
+
+- consultas repetidas do retriever não chamam a API de embeddings;
+- reingerir texto sem mudança não paga embedding de novo;
+- acima de EMBEDDING_CACHE_MAX_ENTRIES, os vetores usados há mais tempo saem.
+
+Como usar:
+    python embedding_cache.py --warmup   # embeda as consultas fixas e os chunks da política
+    python embedding_cache.py --stats
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from contextlib import contextmanager
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(SCRIPT_DIR, "embedding_cache.db"))
+
+# Máximo de vetores guardados; o excedente sai por ordem de último uso
+MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+
+KIND_QUERY = "query"
+KIND_DOCUMENT = "document"
+
+
+def cache_key(model: str, kind: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x1f{kind}\x1f{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Vetores por chave, com último uso para o LRU."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._init_db()
+
+    @contextmanager
+    def _db(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._db() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+
+    def get_many(self, keys: list) -> dict:
+        """Vetores encontrados, por chave; marca os encontrados como usados agora."""
+        if not keys:
+            return {}
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._db() as conn:
+            # Lotes abaixo do limite de parâmetros do SQLite
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                for key, blob in conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", batch):
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+        return found
+
+    def put_many(self, entries: list):
+        """Grava [(key, model, kind, vetor)] e aplica o despejo LRU."""
+        if not entries:
+            return
+        now = time.time()
+        with self._db() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, kind, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(key, model, kind, array("f", vector).tobytes(), now) for key, model, kind, vector in entries]
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+
+    def stats(self) -> dict:
+        with self._db() as conn:
+            rows = conn.execute("SELECT model, kind, COUNT(*) FROM embeddings GROUP BY model, kind").fetchall()
+        return {
+            "entries": sum(count for _, _, count in rows),
+            "max_entries": self.max_entries,
+            "by_model": {f"{model} ({kind})": count for model, kind, count in rows},
+        }
+
+
+class CachedEmbeddings:
+    """
+    Mesmo contrato de embeddings do LangChain (embed_documents / embed_query),
+    consultando o cache antes de chamar o modelo.
+    """
+
+    def __init__(self, embeddings, cache: EmbeddingCache = None, model: str = None):
+        self.embeddings = embeddings
+        self.cache = cache or get_embedding_cache()
+        self.model = model or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.hits = 0
+        self.misses = 0
+
+    def _embed(self, texts: list, kind: str, compute) -> list:
+        keys = [cache_key(self.model, kind, text) for text in texts]
+        found = self.cache.get_many(keys)
+        missing = list(dict.fromkeys(
+            text for text, key in zip(texts, keys) if key not in found
+        ))
+        self.hits += len(texts) - sum(1 for key in keys if key not in found)
+        self.misses += len(missing)
+        if missing:
+            # Uma única chamada ao modelo para todos os textos que faltam
+            vectors = compute(missing)
+            entries = []
+            for text, vector in zip(missing, vectors):
+                key = cache_key(self.model, kind, text)
+                found[key] = list(vector)
+                entries.append((key, self.model, kind, vector))
+            self.cache.put_many(entries)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: list) -> list:
+        return self._embed(list(texts), KIND_DOCUMENT, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> list:
+        return self._embed([text], KIND_QUERY, lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Cache compartilhado do processo."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
+
+
+def warm_up(embeddings) -> dict:
+    """Embeda (via cache) as consultas fixas do cérebro e os chunks da política."""
+    from policy_cache import POLICY_QUERIES
+    from policy_corpus import load_chunks
+
+    for query in POLICY_QUERIES:
+        embeddings.embed_query(query)
+    chunks = load_chunks()
+    embeddings.embed_documents([chunk["text"] for chunk in chunks])
+    return {"queries": len(POLICY_QUERIES), "chunks": len(chunks)}
+
+
+if __name__ == "__main__":
+    if "--warmup" in sys.argv:
+        from dotenv import load_dotenv
+        from clients import get_client
+
+        load_dotenv()
+        embeddings = get_client("embeddings")
+        counts = warm_up(embeddings)
+        print(f"🔥 {counts['queries']} consulta(s) e {counts['chunks']} chunk(s) no cache: "
+              f"{embeddings.hits} já estavam, {embeddings.misses} embedado(s) agora.")
+    elif "--stats" in sys.argv:
+        stats = get_embedding_cache().stats()
+        print(f"🧮 {stats['entries']}/{stats['max_entries']} vetor(es) em cache.")
+        for name, count in stats["by_model"].items():
+            print(f"   {name}: {count}")
+    else:
+        print("Uso: python embedding_cache.py --warmup | --stats")
+        sys.exit(1)
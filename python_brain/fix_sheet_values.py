@@ -1,15 +1,8 @@
-import gspread
-import os
-
-# Caminho para as credenciais
-creds_path = 'client_secret.json'
-if not os.path.exists(creds_path):
-    creds_path = os.path.join('python_brain', 'client_secret.json')
+from sheets_client import DEFAULT_SPREADSHEET_ID, ROI_WORKSHEET, get_sheets_client
 
 print("🔄 Conectando ao Google Sheets...")
-gc = gspread.service_account(filename=creds_path)
-sh = gc.open_by_key("14qM34cpPSK8rPcIfjQhY1kI1ysJBAdkaGa_xGX3TKao")
-ws = sh.worksheet("Relatório_ROI_iFood")
+sheets = get_sheets_client()
+ws = sheets.worksheet(ROI_WORKSHEET, DEFAULT_SPREADSHEET_ID)
 
 # Dados corretos para corrigir a bagunça
 updates = [
@@ -42,3 +35,4 @@ for i, record in enumerate(records):
             ws.update_cell(row_num, 2, update['val'])
 
 print("✅ Valores corrigidos na planilha!")
+print(f"📊 Chamadas à API do Sheets: {sheets.counters()}")
@@ -0,0 +1,280 @@
+"""
+Evidência de GPS do entregador (delivery_evidence.gps_logs), vetorizada com NumPy.
+
+A partir do trajeto calcula, sem laços em Python:
+- distância de cada ponto ao endereço (haversine, se as coordenadas do endereço
+  vierem no pedido; senão o distance_to_address_meters informado pela telemetria);
+- chegada: primeiro ponto dentro de GPS_ARRIVAL_RADIUS_M, comparado ao eta_max;
+- permanência (dwell) dentro do raio;
+- anomalias: saltos acima de GPS_MAX_SPEED_KMH (teleporte) e pontos com
+  horário repetido em posições diferentes.
+
+Vereditos:
+- WAITED_AT_ADDRESS: chegou ao endereço e permaneceu ao menos GPS_MIN_DWELL_SECONDS;
+- REACHED_ADDRESS: chegou ao endereço, sem permanência comprovada;
+- NOT_AT_ADDRESS: nenhum ponto dentro do raio;
+- ANOMALOUS: trajeto com anomalias (não serve como prova);
+- NO_DATA: sem pontos utilizáveis.
+
+Armazenamento compacto:
+`GpsTrace` guarda o trajeto em arrays tipados (epoch int64, lat/lon float64,
+distância float32) em vez de uma lista de dicts, e pode simplificar o caminho
+(Douglas-Peucker com distância sincronizada no tempo, que preserva paradas)
+com tolerância GPS_SIMPLIFY_TOLERANCE_M (0 = desligado). O `OrderData`
+converte `gps_logs` para `GpsTrace` já no parse do pedido.
+"""
+
+import os
+from array import array
+from datetime import datetime, timezone
+
+EARTH_RADIUS_M = 6371008.8
+
+ARRIVAL_RADIUS_M = float(os.getenv("GPS_ARRIVAL_RADIUS_M", "50"))
+MIN_DWELL_SECONDS = float(os.getenv("GPS_MIN_DWELL_SECONDS", "300"))
+MAX_SPEED_KMH = float(os.getenv("GPS_MAX_SPEED_KMH", "150"))
+SIMPLIFY_TOLERANCE_M = float(os.getenv("GPS_SIMPLIFY_TOLERANCE_M", "0"))
+
+VERDICT_WAITED = "WAITED_AT_ADDRESS"
+VERDICT_REACHED = "REACHED_ADDRESS"
+VERDICT_NOT_AT_ADDRESS = "NOT_AT_ADDRESS"
+VERDICT_ANOMALOUS = "ANOMALOUS"
+VERDICT_NO_DATA = "NO_DATA"
+
+
+def _epoch(value):
+    """Timestamp ISO (ou datetime) -> segundos; None se inválido."""
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distância em metros entre arrays de coordenadas (graus)."""
+    import numpy as np
+
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value) if value is not None else float("nan")
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class GpsTrace:
+    """Trajeto em arrays tipados, ordenado por tempo (pontos sem horário válido são descartados)."""
+
+    __slots__ = ("t", "lat", "lon", "distance")
+
+    def __init__(self, t: array = None, lat: array = None, lon: array = None, distance: array = None):
+        self.t = t if t is not None else array("q")                      # epoch em segundos
+        self.lat = lat if lat is not None else array("d")
+        self.lon = lon if lon is not None else array("d")
+        self.distance = distance if distance is not None else array("f")  # distance_to_address_meters
+
+    @classmethod
+    def from_logs(cls, gps_logs, simplify_tolerance_m: float = None) -> "GpsTrace":
+        """
+        Converte a lista de pontos do pedido.
+
+        Args:
+            gps_logs: Lista de dicts (timestamp, latitude, longitude, distance_to_address_meters)
+            simplify_tolerance_m: Tolerância do Douglas-Peucker (padrão: GPS_SIMPLIFY_TOLERANCE_M)
+        """
+        if isinstance(gps_logs, GpsTrace):
+            return gps_logs
+        if not isinstance(gps_logs, (list, tuple)):
+            raise ValueError("gps_logs deve ser uma lista de pontos")
+
+        rows = []
+        for log in gps_logs:
+            if not isinstance(log, dict):
+                raise ValueError("cada ponto de gps_logs deve ser um objeto")
+            epoch = _epoch(log.get("timestamp"))
+            if epoch is None:
+                continue
+            rows.append((int(epoch), _to_float(log.get("latitude")), _to_float(log.get("longitude")),
+                         _to_float(log.get("distance_to_address_meters"))))
+        rows.sort(key=lambda row: row[0])
+
+        # array a partir de lista aloca o tamanho exato (de gerador, cresce com sobra)
+        trace = cls(array("q", [r[0] for r in rows]), array("d", [r[1] for r in rows]),
+                    array("d", [r[2] for r in rows]), array("f", [r[3] for r in rows]))
+        tolerance = SIMPLIFY_TOLERANCE_M if simplify_tolerance_m is None else simplify_tolerance_m
+        if tolerance > 0:
+            trace = trace.simplify(tolerance)
+        return trace
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def nbytes(self) -> int:
+        """Bytes ocupados pelos dados do trajeto."""
+        return sum(a.itemsize * len(a) for a in (self.t, self.lat, self.lon, self.distance))
+
+    def arrays(self):
+        """Visões NumPy (sem cópia): t, lat, lon, distance."""
+        import numpy as np
+        return (np.frombuffer(self.t, dtype=np.int64), np.frombuffer(self.lat, dtype=np.float64),
+                np.frombuffer(self.lon, dtype=np.float64), np.frombuffer(self.distance, dtype=np.float32))
+
+    def to_logs(self) -> list:
+        return [
+            {
+                "timestamp": datetime.fromtimestamp(t, tz=timezone.utc).isoformat().replace("+00:00", "Z"),
+                "latitude": lat, "longitude": lon, "distance_to_address_meters": dist,
+            }
+            for t, lat, lon, dist in zip(self.t, self.lat, self.lon, self.distance)
+        ]
+
+    def simplify(self, tolerance_m: float) -> "GpsTrace":
+        """
+        Douglas-Peucker com distância sincronizada no tempo (SED).
+
+        Cada ponto é comparado à posição interpolada no mesmo instante entre as
+        extremidades do segmento, então paradas (mesma posição, tempo passando)
+        não são colapsadas e a permanência no endereço continua mensurável.
+        """
+        import numpy as np
+
+        n = len(self)
+        t, lat, lon, _ = self.arrays()
+        if n <= 2 or np.isnan(lat).any() or np.isnan(lon).any():
+            return self
+
+        # Projeção local em metros (equiretangular): suficiente para a escala de uma entrega
+        lat0 = np.radians(lat.mean())
+        x = np.radians(lon) * EARTH_RADIUS_M * np.cos(lat0)
+        y = np.radians(lat) * EARTH_RADIUS_M
+        tf = t.astype(np.float64)
+
+        keep = np.zeros(n, dtype=bool)
+        keep[0] = keep[-1] = True
+        stack = [(0, n - 1)]
+        while stack:
+            start, end = stack.pop()
+            if end - start < 2:
+                continue
+            span = tf[end] - tf[start]
+            inner = slice(start + 1, end)
+            ratio = (tf[inner] - tf[start]) / span if span > 0 else np.zeros(end - start - 1)
+            dx = x[inner] - (x[start] + ratio * (x[end] - x[start]))
+            dy = y[inner] - (y[start] + ratio * (y[end] - y[start]))
+            errors = np.hypot(dx, dy)
+            worst = int(np.argmax(errors))
+            if errors[worst] > tolerance_m:
+                split = start + 1 + worst
+                keep[split] = True
+                stack.append((start, split))
+                stack.append((split, end))
+
+        index = np.flatnonzero(keep)
+        return GpsTrace(*(array(a.typecode, np.frombuffer(a, dtype=dtype)[index].tobytes())
+                          for a, dtype in ((self.t, np.int64), (self.lat, np.float64),
+                                           (self.lon, np.float64), (self.distance, np.float32))))
+
+
+def _empty_result(points: int = 0) -> dict:
+    return {
+        "verdict": VERDICT_NO_DATA,
+        "points": points,
+        "distance_source": None,
+        "min_distance_m": None,
+        "arrived_at": None,
+        "minutes_vs_eta": None,
+        "dwell_seconds": 0.0,
+        "max_speed_kmh": None,
+        "anomalies": [],
+    }
+
+
+def analyze_gps(gps_logs, eta_max=None, address: tuple = None,
+                radius_m: float = ARRIVAL_RADIUS_M, min_dwell_seconds: float = MIN_DWELL_SECONDS,
+                max_speed_kmh: float = MAX_SPEED_KMH) -> dict:
+    """
+    Analisa o trajeto do entregador.
+
+    Args:
+        gps_logs: GpsTrace ou lista de pontos com timestamp, latitude, longitude e/ou distance_to_address_meters
+        eta_max: Horário máximo prometido (datetime ou ISO)
+        address: (latitude, longitude) do endereço de entrega, se conhecido
+
+    Returns:
+        dict com verdict, arrived_at, minutes_vs_eta, dwell_seconds,
+        min_distance_m, max_speed_kmh e anomalies
+    """
+    trace = GpsTrace.from_logs(gps_logs, simplify_tolerance_m=0)
+    if not len(trace):
+        return _empty_result()
+
+    import numpy as np
+
+    t, lat, lon, reported = trace.arrays()
+    t = t.astype(np.float64)
+    reported = reported.astype(np.float64)
+
+    result = _empty_result(int(t.size))
+
+    # Distância ao endereço: haversine quando há coordenadas; telemetria como fallback por ponto
+    if address is not None and None not in address:
+        distance = haversine_m(lat, lon, address[0], address[1])
+        distance = np.where(np.isnan(distance), reported, distance)
+        result["distance_source"] = "haversine"
+    else:
+        distance = reported
+        result["distance_source"] = "reported"
+
+    if np.all(np.isnan(distance)):
+        return result
+    result["min_distance_m"] = round(float(np.nanmin(distance)), 1)
+
+    # Anomalias entre pontos consecutivos
+    anomalies = []
+    if t.size > 1:
+        dt = np.diff(t)
+        step = haversine_m(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        moved = np.nan_to_num(step) > radius_m
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed_kmh = np.where(dt > 0, step / dt * 3.6, np.nan)
+        if np.any(~np.isnan(speed_kmh)):
+            result["max_speed_kmh"] = round(float(np.nanmax(speed_kmh)), 1)
+        teleports = int(np.count_nonzero(np.nan_to_num(speed_kmh) > max_speed_kmh))
+        if teleports:
+            anomalies.append(f"teleporte: {teleports} salto(s) acima de {max_speed_kmh:.0f} km/h")
+        same_time = int(np.count_nonzero((dt == 0) & moved))
+        if same_time:
+            anomalies.append(f"{same_time} ponto(s) com o mesmo horário em posições diferentes")
+    result["anomalies"] = anomalies
+
+    # Chegada e permanência dentro do raio
+    inside = np.nan_to_num(distance, nan=np.inf) <= radius_m
+    if inside.any():
+        first = int(np.argmax(inside))
+        arrived = t[first]
+        result["arrived_at"] = datetime.fromtimestamp(arrived, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+        eta = _epoch(eta_max) if eta_max is not None else None
+        if eta is not None:
+            result["minutes_vs_eta"] = round(float(arrived - eta) / 60, 1)
+        if t.size > 1:
+            result["dwell_seconds"] = float(np.sum(np.diff(t) * (inside[:-1] & inside[1:])))
+
+    if anomalies:
+        result["verdict"] = VERDICT_ANOMALOUS
+    elif not inside.any():
+        result["verdict"] = VERDICT_NOT_AT_ADDRESS
+    elif result["dwell_seconds"] >= min_dwell_seconds:
+        result["verdict"] = VERDICT_WAITED
+    else:
+        result["verdict"] = VERDICT_REACHED
+    return result
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Índice de fotos de evidência: cache de vereditos e detecção de reuso.
+
+Cada foto analisada recebe duas impressões digitais:
+- sha256 do conteúdo (cópia exata);
+- dHash de 64 bits (perceptual: sobrevive a recompressão e redimensionamento).
+
+Com isso:
+- Uma foto já julgada (ou uma cópia recomprimida dela, até
+  IMAGE_DHASH_MAX_DISTANCE bits de diferença) reaproveita o veredito salvo
+  e não chama o Gemini Vision de novo.
+- A mesma foto enviada em pedidos diferentes é sinalizada como reuso,
+  padrão comum de fraude.
+
+Os dHashes ficam em memória para a busca por vizinhos; o SQLite guarda o
+índice e os vereditos entre execuções.
+
+Como usar (estatísticas do índice):
+    python image_index.py --stats
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_INDEX_PATH = os.getenv("IMAGE_INDEX_PATH", os.path.join(SCRIPT_DIR, "image_index.db"))
+
+# Distância de Hamming máxima (em 64 bits) para considerar duas fotos a mesma imagem
+DHASH_MAX_DISTANCE = int(os.getenv("IMAGE_DHASH_MAX_DISTANCE", "6"))
+
+# Só vereditos conclusivos vão para o cache; ANALISE_HUMANA e erros são refeitos
+CACHEABLE_VERDICTS = {"ACEITAR_REEMBOLSO", "NEGAR_REEMBOLSO"}
+
+
+def dhash(source, size: int = 8):
+    """
+    Difference hash: compara pixels vizinhos de uma miniatura em tons de cinza.
+
+    Args:
+        source: bytes da imagem ou caminho do arquivo
+
+    Returns:
+        int de 64 bits, ou None se o Pillow não conseguir abrir a imagem
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            # JPEG grande decodifica em escala reduzida: a miniatura 9x8 não precisa da resolução cheia
+            img.draft("L", (64, 64))
+            # Modo L: um byte por pixel, indexável direto
+            pixels = img.convert("L").resize((size + 1, size)).tobytes()
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def sha256_of(source) -> str:
+    """sha256 dos bytes ou do arquivo (lido em blocos, sem carregar tudo na memória)."""
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(source) -> dict:
+    """Impressões digitais da foto (bytes ou caminho): {"sha256": hex, "dhash": int ou None}."""
+    return {"sha256": sha256_of(source), "dhash": dhash(source)}
+
+
+class ImageIndex:
+    """Índice SQLite de fotos, vereditos por tipo de reclamação e uso por pedido."""
+
+    def __init__(self, path: str = IMAGE_INDEX_PATH, max_distance: int = DHASH_MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._dhashes = None  # sha256 -> dhash, carregado sob demanda
+        self._init_db()
+
+    # --- Armazenamento ---
+    @contextmanager
+    def _db(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._db() as conn:
+            # dHash guardado em hex: o INTEGER do SQLite é com sinal e não cabe 64 bits sem sinal
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS images (
+                    sha256 TEXT PRIMARY KEY,
+                    dhash TEXT,
+                    first_seen REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS verdicts (
+                    sha256 TEXT NOT NULL,
+                    claim_type TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (sha256, claim_type)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS image_orders (
+                    sha256 TEXT NOT NULL,
+                    order_id TEXT NOT NULL,
+                    seen_at REAL NOT NULL,
+                    PRIMARY KEY (sha256, order_id)
+                )
+            """)
+
+    def _load_dhashes(self) -> dict:
+        if self._dhashes is None:
+            with self._db() as conn:
+                rows = conn.execute("SELECT sha256, dhash FROM images WHERE dhash IS NOT NULL").fetchall()
+            self._dhashes = {sha: int(value, 16) for sha, value in rows}
+        return self._dhashes
+
+    # --- Consulta ---
+    def similar(self, fp: dict) -> list:
+        """sha256 da própria foto e das quase-duplicatas conhecidas, mais próximas primeiro."""
+        with self._lock:
+            known = self._load_dhashes()
+            matches = [(0, fp["sha256"])]
+            if fp["dhash"] is not None:
+                for sha, value in known.items():
+                    if sha == fp["sha256"]:
+                        continue
+                    distance = (value ^ fp["dhash"]).bit_count()
+                    if distance <= self.max_distance:
+                        matches.append((distance, sha))
+        return [sha for _, sha in sorted(matches)]
+
+    def get_verdict(self, fp: dict, claim_type: str):
+        """Veredito salvo para a foto (ou quase-duplicata) e tipo de reclamação, ou None."""
+        candidates = self.similar(fp)
+        placeholders = ", ".join("?" * len(candidates))
+        with self._db() as conn:
+            rows = dict(conn.execute(
+                f"SELECT sha256, result FROM verdicts WHERE claim_type = ? AND sha256 IN ({placeholders})",
+                [claim_type] + candidates
+            ).fetchall())
+        for sha in candidates:
+            if sha in rows:
+                return json.loads(rows[sha])
+        return None
+
+    # --- Registro ---
+    def _remember(self, conn, fp: dict):
+        dhash_hex = f"{fp['dhash']:016x}" if fp["dhash"] is not None else None
+        conn.execute(
+            "INSERT OR IGNORE INTO images (sha256, dhash, first_seen) VALUES (?, ?, ?)",
+            (fp["sha256"], dhash_hex, time.time())
+        )
+        with self._lock:
+            if self._dhashes is not None and fp["dhash"] is not None:
+                self._dhashes[fp["sha256"]] = fp["dhash"]
+
+    def put_verdict(self, fp: dict, claim_type: str, result: dict) -> bool:
+        """Salva o veredito da análise. Returns: False se o veredito não é cacheável."""
+        if result.get("verdict") not in CACHEABLE_VERDICTS:
+            return False
+        with self._db() as conn:
+            self._remember(conn, fp)
+            conn.execute(
+                "INSERT OR REPLACE INTO verdicts (sha256, claim_type, result, created_at) VALUES (?, ?, ?, ?)",
+                (fp["sha256"], claim_type, json.dumps(result, ensure_ascii=False), time.time())
+            )
+        return True
+
+    def record_use(self, fp: dict, order_id: str) -> list:
+        """
+        Registra a foto no pedido.
+
+        Returns:
+            Outros pedidos que já usaram a mesma foto (ou quase-duplicata)
+        """
+        candidates = self.similar(fp)
+        placeholders = ", ".join("?" * len(candidates))
+        with self._db() as conn:
+            self._remember(conn, fp)
+            other_orders = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT order_id FROM image_orders WHERE sha256 IN ({placeholders}) AND order_id != ? "
+                "ORDER BY order_id",
+                candidates + [str(order_id)]
+            ).fetchall()]
+            conn.execute(
+                "INSERT OR IGNORE INTO image_orders (sha256, order_id, seen_at) VALUES (?, ?, ?)",
+                (fp["sha256"], str(order_id), time.time())
+            )
+        return other_orders
+
+    def stats(self) -> dict:
+        with self._db() as conn:
+            return {
+                "images": conn.execute("SELECT COUNT(*) FROM images").fetchone()[0],
+                "verdicts": conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0],
+                "reused_images": conn.execute(
+                    "SELECT COUNT(*) FROM (SELECT sha256 FROM image_orders GROUP BY sha256 HAVING COUNT(*) > 1)"
+                ).fetchone()[0],
+            }
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+def get_image_index() -> ImageIndex:
+    """Índice compartilhado do processo."""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = ImageIndex()
+        return _shared_index
+
+
+if __name__ == "__main__":
+    if "--stats" not in sys.argv:
+        print("Uso: python image_index.py --stats")
+        sys.exit(1)
+
+    stats = get_image_index().stats()
+    print(f"🖼️ {stats['images']} foto(s) indexadas, {stats['verdicts']} veredito(s) em cache, "
+          f"{stats['reused_images']} foto(s) reutilizadas em mais de um pedido.")
@@ -0,0 +1,88 @@
+"""
+Pré-processamento das fotos de evidência antes do envio ao Gemini Vision.
+
+Fotos de celular chegam com 3-12 MB, resolução bem acima do que o modelo
+usa e metadados (EXIF com GPS, modelo do aparelho). Antes do upload:
+
+1. valida o formato pelo conteúdo (não pela extensão);
+2. decodifica já reduzido quando o formato permite (`draft` do JPEG), sem
+   carregar a resolução cheia na memória;
+3. corrige a orientação do EXIF e reduz a maior borda para IMAGE_MAX_EDGE;
+4. recodifica em JPEG com IMAGE_JPEG_QUALITY, sem metadados;
+5. gera o base64 em blocos, abortando se passar de IMAGE_MAX_UPLOAD_BYTES.
+"""
+
+import io
+import os
+import base64
+
+MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1536"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(4 * 1024 * 1024)))
+
+SUPPORTED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "BMP", "MPO"}
+
+# Múltiplo de 3 bytes: cada bloco vira base64 sem padding no meio do texto
+_B64_CHUNK = 3 * 64 * 1024
+
+
+def encode_base64_capped(stream, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """Codifica o stream em base64 bloco a bloco; ValueError se o texto passar de max_bytes."""
+    parts = []
+    size = 0
+    while True:
+        chunk = stream.read(_B64_CHUNK)
+        if not chunk:
+            return "".join(parts)
+        encoded = base64.b64encode(chunk).decode("ascii")
+        size += len(encoded)
+        if size > max_bytes:
+            raise ValueError(f"Imagem excede o limite de upload ({max_bytes} bytes em base64).")
+        parts.append(encoded)
+
+
+def prepare_image(path: str, max_edge: int = MAX_EDGE, quality: int = JPEG_QUALITY,
+                  max_upload_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """
+    Valida, reduz e recodifica a foto para o upload.
+
+    Returns:
+        dict com data_url (JPEG em base64) e as estatísticas:
+        original_bytes, sent_bytes, bytes_saved, width, height
+    """
+    from PIL import Image, ImageOps
+
+    original_bytes = os.path.getsize(path)
+    with Image.open(path) as img:
+        if img.format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Formato de imagem não suportado: {img.format}")
+
+        # JPEG: decodifica direto em escala reduzida (1/2, 1/4, 1/8) se couber na borda máxima
+        img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge))
+
+        if img.mode in ("RGBA", "LA", "P"):
+            # Transparência vira fundo branco (JPEG não tem canal alfa)
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        # Sem exif/icc_profile no save: os metadados ficam para trás
+        encoded = io.BytesIO()
+        img.save(encoded, format="JPEG", quality=quality, optimize=True)
+        width, height = img.size
+
+    sent_bytes = encoded.tell()
+    encoded.seek(0)
+    data = encode_base64_capped(encoded, max_upload_bytes)
+    return {
+        "data_url": f"data:image/jpeg;base64,{data}",
+        "original_bytes": original_bytes,
+        "sent_bytes": sent_bytes,
+        "bytes_saved": original_bytes - sent_bytes,
+        "width": width,
+        "height": height,
+    }
@@ -1,45 +1,103 @@
-from langchain_community.document_loaders import TextLoader
-from langchain_community.vectorstores import Chroma
-from langchain_core.documents import Document
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from dotenv import load_dotenv
+"""
+Ingestão incremental da política no índice vetorial (ChromaDB ou NumPy, via RAG_BACKEND).
+
+A política (arquivo ou diretório de .txt/.md) é quebrada em chunks por seção
+(policy_corpus). Cada chunk tem id derivado do hash do conteúdo, então:
+- chunks já indexados são reaproveitados (sem embedding);
+- chunks novos ou alterados são embedados em lotes de POLICY_EMBED_BATCH_SIZE;
+- chunks que sumiram da política são removidos do índice (inclusive os
+  documentos inteiros das ingestões antigas, sem id estável).
+
+Como usar:
+    python ingest_policy.py                      # POLICY_PATH (padrão: politica_ifood_reembolso.txt)
+    python ingest_policy.py caminho/politicas/   # diretório com vários arquivos
+"""
+
 import os
+import sys
+
+from dotenv import load_dotenv
+
+from clients import RAG_BACKEND, VECTOR_DB_DIR, get_client, require_google_api_key
+from vector_index import NUMPY_INDEX_DIR
+from policy_cache import answers_up_to_date, precompute_answers
+from policy_corpus import POLICY_PATH, load_chunks
 
 load_dotenv()
 
-# Caminho do documento que criamos
-POLICY_PATH = "politica_ifood_reembolso.txt"
-# Nome da pasta onde o ChromaDB irá salvar os vetores
-VECTOR_DB_DIR = "chroma_db_ifood" 
-
-def ingest_data():
-    """Carrega o documento e o indexa no ChromaDB."""
-    print("--- 1. Carregando e Separando Documento (Chunking) ---")
-    
-    # Carrega o documento de texto
-    loader = TextLoader(POLICY_PATH)
-    documents = loader.load()
-    
-    # Simplesmente usamos o documento inteiro para este teste, 
-    # mas em produção usaríamos um TextSplitter.
-    docs = documents
+# Textos por chamada de embedding (limite do batchEmbedContents do Gemini: 100)
+EMBED_BATCH_SIZE = int(os.getenv("POLICY_EMBED_BATCH_SIZE", "100"))
+
+
+def sync_chunks(db, chunks: list, batch_size: int = EMBED_BATCH_SIZE) -> dict:
+    """
+    Deixa a coleção com exatamente os chunks informados.
+
+    Returns:
+        dict com reused, embedded, removed e embedding_calls
+    """
+    existing = set(db.get(include=[])["ids"])
+    wanted = {chunk["id"] for chunk in chunks}
+
+    removed = sorted(existing - wanted)
+    if removed:
+        db.delete(ids=removed)
+
+    new_chunks = [chunk for chunk in chunks if chunk["id"] not in existing]
+    calls = 0
+    for start in range(0, len(new_chunks), batch_size):
+        # Cada add_texts faz uma única chamada de embed_documents para o lote
+        batch = new_chunks[start:start + batch_size]
+        db.add_texts(
+            [chunk["text"] for chunk in batch],
+            metadatas=[chunk["metadata"] for chunk in batch],
+            ids=[chunk["id"] for chunk in batch],
+        )
+        calls += 1
+
+    return {
+        "reused": len(wanted) - len(new_chunks),
+        "embedded": len(new_chunks),
+        "removed": len(removed),
+        "embedding_calls": calls,
+    }
+
+
+def ingest_data(policy_path: str = POLICY_PATH) -> dict:
+    """Sincroniza o índice vetorial com a política e atualiza o cache de respostas."""
+    print(f"--- 1. Carregando e Separando Documentos (Chunking): {policy_path} ---")
+    chunks = load_chunks(policy_path)
+    sources = sorted({chunk["metadata"]["source"] for chunk in chunks})
+    print(f"📄 {len(chunks)} chunk(s) em {len(sources)} arquivo(s).")
 
     # O embedding do Google é necessário para transformar texto em vetores
-    if not os.getenv("GOOGLE_API_KEY"):
-         raise ValueError("GOOGLE_API_KEY não encontrada no .env. RAG precisa dela.")
-         
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-    
-    print("--- 2. Criando o Banco Vetorial (ChromaDB) ---")
-    
-    # Cria a instância do ChromaDB e popula com os documentos e embeddings
-    db = Chroma.from_documents(
-        docs, 
-        embeddings, 
-        persist_directory=VECTOR_DB_DIR
-    )
-    db.persist()
-    print(f"✅ Sucesso! {len(docs)} documento(s) indexado(s) em {VECTOR_DB_DIR}")
+    require_google_api_key()
+
+    if RAG_BACKEND == "numpy":
+        print(f"--- 2. Sincronizando o Banco Vetorial (NumPy em {NUMPY_INDEX_DIR}) ---")
+    else:
+        print(f"--- 2. Sincronizando o Banco Vetorial (ChromaDB em {VECTOR_DB_DIR}) ---")
+    db = get_client("vector_db")
+    report = sync_chunks(db, chunks)
+    if report["embedded"] or report["removed"]:
+        db.persist()
+    print(f"✅ {report['reused']} chunk(s) reaproveitado(s), {report['embedded']} embedado(s) "
+          f"em {report['embedding_calls']} chamada(s), {report['removed']} removido(s).")
+
+    print("--- 3. Pré-calculando respostas das consultas fixas (cache da política) ---")
+
+    # O cérebro passa a servir essas respostas da memória, sem RAG por pedido
+    if not (report["embedded"] or report["removed"]) and answers_up_to_date(policy_path):
+        print("✅ Política sem mudanças: cache de respostas já está atualizado.")
+        report["answers"] = 0
+    else:
+        report["answers"] = precompute_answers(get_client("rag_chain"), policy_path=policy_path)
+        print(f"✅ {report['answers']} resposta(s) da política gravada(s) no cache.")
+    if os.path.abspath(policy_path) != os.path.abspath(POLICY_PATH):
+        print(f"⚠️ O cérebro lê POLICY_PATH={POLICY_PATH}. Defina POLICY_PATH={policy_path} no .env "
+              "para ele usar esta política.")
+    return report
+
 
 if __name__ == "__main__":
-    ingest_data()
\ No newline at end of file
+    ingest_data(sys.argv[1] if len(sys.argv) > 1 else POLICY_PATH)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Consumo de tokens do Gemini por pedido e por etapa, com orçamento.
+
+Cada pedido pode chamar o Gemini até quatro vezes (vision, chat, policy/RAG e
+defense). O cérebro registra o `usage_metadata` de cada resposta aqui:
+- no uso do pedido atual (ContextVar, como o trace do tracing.py), que vira o
+  bloco `llm_usage` do resultado;
+- no SQLite (llm_usage.db), uma linha por chamada com order_id e etapa, para
+  relatórios e para o orçamento por hora (compartilhado entre processos).
+
+Antes de cada chamada, `allow(stage)` confere os orçamentos em tokens
+(LLM_ORDER_TOKEN_BUDGET por pedido, LLM_HOURLY_TOKEN_BUDGET na última hora;
+0 desliga). Estourado, o cérebro segue pelo caminho barato e seguro da etapa:
+revisão humana no chat (as regras locais já não bastaram) e no Vision,
+trechos da política sem geração no RAG e template na defesa.
+
+O custo (USD) é estimado pelos preços por milhão de tokens de
+LLM_PRICE_INPUT_PER_1M e LLM_PRICE_OUTPUT_PER_1M.
+
+Como usar:
+    python llm_usage.py --report            # consumo da última hora, por etapa
+    python llm_usage.py --report --hours 24
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+import contextvars
+from contextlib import contextmanager
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LLM_USAGE_PATH = os.getenv("LLM_USAGE_PATH", os.path.join(SCRIPT_DIR, "llm_usage.db"))
+
+# Orçamentos em tokens (entrada + saída); 0 = sem limite
+ORDER_TOKEN_BUDGET = int(os.getenv("LLM_ORDER_TOKEN_BUDGET", "0"))
+HOURLY_TOKEN_BUDGET = int(os.getenv("LLM_HOURLY_TOKEN_BUDGET", "0"))
+
+# Preço (USD) por milhão de tokens do gemini-2.0-flash
+PRICE_INPUT_PER_1M = float(os.getenv("LLM_PRICE_INPUT_PER_1M", "0.10"))
+PRICE_OUTPUT_PER_1M = float(os.getenv("LLM_PRICE_OUTPUT_PER_1M", "0.40"))
+
+STAGE_VISION = "vision"
+STAGE_CHAT = "chat"
+STAGE_POLICY = "policy"
+STAGE_DEFENSE = "defense"
+
+_current = contextvars.ContextVar("llm_usage", default=None)
+
+
+def cost_usd(input_tokens: int, output_tokens: int) -> float:
+    return (input_tokens * PRICE_INPUT_PER_1M + output_tokens * PRICE_OUTPUT_PER_1M) / 1_000_000
+
+
+def usage_from_message(message) -> dict:
+    """Tokens de uma resposta do LangChain (AIMessage.usage_metadata); zeros se ausente."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if not usage:
+        # Versões antigas do langchain-google-genai só preenchem response_metadata
+        raw = (getattr(message, "response_metadata", None) or {}).get("usage_metadata") or {}
+        usage = {
+            "input_tokens": raw.get("prompt_token_count", 0),
+            "output_tokens": raw.get("candidates_token_count", 0),
+        }
+    return {
+        "input_tokens": int(usage.get("input_tokens") or 0),
+        "output_tokens": int(usage.get("output_tokens") or 0),
+    }
+
+
+_handler_cls = None
+
+
+def usage_callback():
+    """
+    Callback que soma os tokens das chamadas internas de uma cadeia (ex.: rag_chain),
+    ou None se o langchain_core instalado não tiver o UsageMetadataCallbackHandler.
+    """
+    global _handler_cls
+    if _handler_cls is None:
+        # Import resolvido uma vez: import que falha não é cacheado pelo Python
+        try:
+            from langchain_core.callbacks import UsageMetadataCallbackHandler
+            _handler_cls = UsageMetadataCallbackHandler
+        except ImportError:
+            _handler_cls = False
+    return _handler_cls() if _handler_cls else None
+
+
+def usage_from_callback(handler) -> dict:
+    """Soma, entre modelos, do que o UsageMetadataCallbackHandler coletou."""
+    totals = {"input_tokens": 0, "output_tokens": 0}
+    for usage in (getattr(handler, "usage_metadata", None) or {}).values():
+        totals["input_tokens"] += int(usage.get("input_tokens") or 0)
+        totals["output_tokens"] += int(usage.get("output_tokens") or 0)
+    return totals
+
+
+class UsageStore:
+    """Uma linha por chamada ao LLM, indexada por horário para o orçamento por hora."""
+
+    def __init__(self, path: str = LLM_USAGE_PATH):
+        self.path = path
+        self._init_db()
+
+    @contextmanager
+    def _db(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Contabilidade, não registro financeiro: sem fsync a cada chamada (WAL continua íntegro)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._db() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_calls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    order_id TEXT,
+                    stage TEXT NOT NULL,
+                    input_tokens INTEGER NOT NULL,
+                    output_tokens INTEGER NOT NULL,
+                    cost_usd REAL NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_created_at ON llm_calls (created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_order ON llm_calls (order_id)")
+
+    def add(self, order_id, stage: str, input_tokens: int, output_tokens: int, cost: float):
+        with self._db() as conn:
+            conn.execute(
+                "INSERT INTO llm_calls (order_id, stage, input_tokens, output_tokens, cost_usd, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (order_id, stage, input_tokens, output_tokens, cost, time.time())
+            )
+
+    def tokens_since(self, since: float) -> int:
+        with self._db() as conn:
+            row = conn.execute(
+                "SELECT COALESCE(SUM(input_tokens + output_tokens), 0) FROM llm_calls WHERE created_at >= ?",
+                (since,)
+            ).fetchone()
+        return int(row[0])
+
+    def report(self, since: float) -> dict:
+        with self._db() as conn:
+            rows = conn.execute(
+                "SELECT stage, COUNT(*), SUM(input_tokens), SUM(output_tokens), SUM(cost_usd), "
+                "COUNT(DISTINCT order_id) FROM llm_calls WHERE created_at >= ? GROUP BY stage ORDER BY stage",
+                (since,)
+            ).fetchall()
+            orders = conn.execute(
+                "SELECT COUNT(DISTINCT order_id) FROM llm_calls WHERE created_at >= ?", (since,)
+            ).fetchone()[0]
+        return {
+            "orders": orders,
+            "by_stage": {
+                stage: {"calls": calls, "input_tokens": tin, "output_tokens": tout,
+                        "cost_usd": round(cost, 6), "orders": n_orders}
+                for stage, calls, tin, tout, cost, n_orders in rows
+            },
+        }
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_usage_store() -> UsageStore:
+    """Store compartilhado do processo."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = UsageStore()
+        return _shared_store
+
+
+class OrderUsage:
+    """Tokens de um pedido, por etapa, e as etapas rebaixadas por orçamento."""
+
+    def __init__(self):
+        self.order_id = None
+        self.stages = {}
+        self.downgraded = []
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(s["input_tokens"] + s["output_tokens"] for s in self.stages.values())
+
+    def add(self, stage: str, input_tokens: int, output_tokens: int):
+        totals = self.stages.setdefault(stage, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+        totals["calls"] += 1
+        totals["input_tokens"] += input_tokens
+        totals["output_tokens"] += output_tokens
+
+    def as_dict(self) -> dict:
+        input_tokens = sum(s["input_tokens"] for s in self.stages.values())
+        output_tokens = sum(s["output_tokens"] for s in self.stages.values())
+        return {
+            "calls": sum(s["calls"] for s in self.stages.values()),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "cost_usd": round(cost_usd(input_tokens, output_tokens), 6),
+            "by_stage": {
+                stage: dict(s, cost_usd=round(cost_usd(s["input_tokens"], s["output_tokens"]), 6))
+                for stage, s in self.stages.items()
+            },
+            "downgraded": list(self.downgraded),
+        }
+
+
+@contextmanager
+def track_order():
+    """Abre a contabilidade de um pedido (o cérebro define order_id após o parse)."""
+    usage = OrderUsage()
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+
+
+def set_order_id(order_id: str):
+    usage = _current.get()
+    if usage is not None:
+        usage.order_id = order_id
+
+
+def record(stage: str, usage: dict):
+    """Registra uma chamada ao LLM no pedido atual e no SQLite."""
+    input_tokens, output_tokens = usage["input_tokens"], usage["output_tokens"]
+    order = _current.get()
+    order_id = None
+    if order is not None:
+        order.add(stage, input_tokens, output_tokens)
+        order_id = order.order_id
+    try:
+        get_usage_store().add(order_id, stage, input_tokens, output_tokens, cost_usd(input_tokens, output_tokens))
+    except sqlite3.Error as e:
+        # Falha na contabilidade não derruba a decisão do pedido
+        print(f"⚠️ Não foi possível gravar o consumo de tokens: {e}", file=sys.stderr)
+
+
+def allow(stage: str) -> bool:
+    """
+    True se a etapa ainda pode chamar o LLM; com orçamento estourado, registra
+    a etapa como rebaixada no pedido atual e retorna False.
+    """
+    order = _current.get()
+    reason = None
+    if ORDER_TOKEN_BUDGET and order is not None and order.total_tokens >= ORDER_TOKEN_BUDGET:
+        reason = f"pedido já usou {order.total_tokens} de {ORDER_TOKEN_BUDGET} tokens"
+    elif HOURLY_TOKEN_BUDGET:
+        spent = get_usage_store().tokens_since(time.time() - 3600)
+        if spent >= HOURLY_TOKEN_BUDGET:
+            reason = f"última hora já usou {spent} de {HOURLY_TOKEN_BUDGET} tokens"
+    if reason is None:
+        return True
+    print(f"💸 Orçamento de LLM esgotado ({reason}). Etapa '{stage}' segue pelo caminho sem LLM.", file=sys.stderr)
+    if order is not None and stage not in order.downgraded:
+        order.downgraded.append(stage)
+    return False
+
+
+if __name__ == "__main__":
+    if "--report" in sys.argv:
+        hours = 1.0
+        if "--hours" in sys.argv and sys.argv.index("--hours") + 1 < len(sys.argv):
+            hours = float(sys.argv[sys.argv.index("--hours") + 1])
+        report = get_usage_store().report(time.time() - hours * 3600)
+        stages = report["by_stage"].values()
+        total_tokens = sum(s["input_tokens"] + s["output_tokens"] for s in stages)
+        total_cost = sum(s["cost_usd"] for s in stages)
+        print(f"💰 Últimas {hours:g} h: {report['orders']} pedido(s), {total_tokens} tokens, US$ {total_cost:.4f}")
+        for stage, s in report["by_stage"].items():
+            print(f"   {stage}: {s['calls']} chamada(s) em {s['orders']} pedido(s), "
+                  f"{s['input_tokens']} entrada + {s['output_tokens']} saída, US$ {s['cost_usd']:.4f}")
+    else:
+        print("Uso: python llm_usage.py --report [--hours N]")
+        sys.exit(1)
@@ -0,0 +1,170 @@
+"""
+Cache versionado das respostas da política para as consultas RAG fixas.
+
+Todas as `rag_query` do cérebro são frases fixas. Em vez de pagar embedding +
+busca no Chroma + geração no Gemini a cada pedido, as respostas são
+pré-calculadas pelo `ingest_policy.py` e gravadas em disco, indexadas por um
+hash da política (arquivo ou diretório, veja policy_corpus) + prompt do
+sistema + pergunta.
+
+Se a política mudar (ou for reindexada), o hash muda e as entradas antigas
+deixam de valer automaticamente.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import threading
+from typing import Optional
+
+from policy_corpus import POLICY_PATH, corpus_fingerprint, corpus_stamp
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(SCRIPT_DIR, "policy_answers.json")
+
+# Prompt do Sistema para o RAG (Define como ele usa o contexto)
+RAG_SYSTEM_PROMPT = (
+    "Você é um especialista em políticas de reembolso do iFood. "
+    "Use o contexto recuperado abaixo para responder à pergunta sobre regras e procedimentos. "
+    "Se a resposta não estiver no contexto, diga que não encontrou a informação oficial."
+    "\n\n"
+    "Contexto Oficial:\n{context}"
+)
+
+# --- CONSULTAS FIXAS USADAS PELO CÉREBRO ---
+QUERY_PIN = "Regra de comprovação de entrega e uso do PIN"
+QUERY_QUALITY_UNPROVEN = "Regra sobre reclamações de qualidade sem evidência comprovada"
+QUERY_QUALITY_PROVEN = "Regra sobre vícios de qualidade comprovados"
+QUERY_LATE_DELIVERY = "Qual a regra oficial sobre o cancelamento durante a entrega por atraso?"
+QUERY_CUSTOMER_ABSENT = "Regra sobre responsabilidade quando o cliente não atende o entregador"
+QUERY_INFORMAL_AGREEMENT = "Regra sobre acordos de entrega em local alternativo"
+
+POLICY_QUERIES = [
+    QUERY_PIN,
+    QUERY_QUALITY_UNPROVEN,
+    QUERY_QUALITY_PROVEN,
+    QUERY_LATE_DELIVERY,
+    QUERY_CUSTOMER_ABSENT,
+    QUERY_INFORMAL_AGREEMENT,
+]
+
+
+def build_rag_chain(llm, retriever):
+    """Monta a cadeia Retriever -> Documentos -> LLM usada pelo cérebro e pela ingestão."""
+    from langchain.chains import create_retrieval_chain
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from langchain_core.prompts import ChatPromptTemplate
+
+    rag_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", RAG_SYSTEM_PROMPT),
+            ("human", "{input}"),
+        ]
+    )
+    question_answer_chain = create_stuff_documents_chain(llm, rag_prompt)
+    return create_retrieval_chain(retriever, question_answer_chain)
+
+
+def policy_fingerprint(policy_path: str = POLICY_PATH) -> str:
+    """Hash SHA-256 da política (conteúdo do arquivo, ou nomes + conteúdos do diretório)."""
+    return corpus_fingerprint(policy_path)
+
+
+def cache_key(fingerprint: str, query: str) -> str:
+    """Chave de uma resposta: política + prompt do sistema + pergunta."""
+    raw = "\x1f".join([fingerprint, RAG_SYSTEM_PROMPT, query])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def precompute_answers(rag_chain, policy_path: str = POLICY_PATH, cache_path: str = CACHE_PATH) -> int:
+    """
+    Executa cada consulta fixa no RAG e grava as respostas em disco.
+
+    Returns:
+        Quantidade de respostas gravadas
+    """
+    fingerprint = policy_fingerprint(policy_path)
+    answers = {}
+    for query in POLICY_QUERIES:
+        response = rag_chain.invoke({"input": query})
+        answers[cache_key(fingerprint, query)] = {"query": query, "answer": response["answer"]}
+
+    # Escrita atômica: o cérebro em modo serviço pode estar lendo o arquivo
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"policy_hash": fingerprint, "answers": answers}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, cache_path)
+    return len(answers)
+
+
+def answers_up_to_date(policy_path: str = POLICY_PATH, cache_path: str = CACHE_PATH) -> bool:
+    """Se o cache em disco já tem a resposta de todas as consultas fixas para a política atual."""
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return False
+    fingerprint = policy_fingerprint(policy_path)
+    answers = stored.get("answers", {})
+    return (stored.get("policy_hash") == fingerprint
+            and all(cache_key(fingerprint, query) in answers for query in POLICY_QUERIES))
+
+
+class PolicyAnswerCache:
+    """
+    Respostas da política em memória, recarregadas quando o cache em disco
+    ou o arquivo de política mudam (detectado por mtime, sem reler a cada pedido).
+    """
+
+    def __init__(self, policy_path: str = POLICY_PATH, cache_path: str = CACHE_PATH):
+        self.policy_path = policy_path
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._fingerprint = None
+        self._answers = {}
+
+    def _current_stamp(self):
+        try:
+            cache_mtime = os.stat(self.cache_path).st_mtime_ns
+        except OSError:
+            cache_mtime = None
+        return corpus_stamp(self.policy_path), cache_mtime
+
+    def _refresh(self):
+        stamp = self._current_stamp()
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+        self._answers = {}
+        try:
+            self._fingerprint = policy_fingerprint(self.policy_path)
+        except OSError:
+            self._fingerprint = None
+            return
+
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if stored.get("policy_hash") != self._fingerprint:
+            print("⚠️ Cache de respostas da política desatualizado. Rode ingest_policy.py novamente.", file=sys.stderr)
+            return
+        self._answers = {key: entry["answer"] for key, entry in stored.get("answers", {}).items()}
+
+    def get(self, query: str) -> Optional[str]:
+        with self._lock:
+            self._refresh()
+            if self._fingerprint is None:
+                return None
+            return self._answers.get(cache_key(self._fingerprint, query))
+
+    def put(self, query: str, answer: str):
+        """Guarda em memória uma resposta obtida ao vivo (cache miss)."""
+        with self._lock:
+            self._refresh()
+            if self._fingerprint is not None:
+                self._answers[cache_key(self._fingerprint, query)] = answer
@@ -0,0 +1,141 @@
+"""
+Corpus da política: arquivos, chunks e impressões digitais (sem LangChain).
+
+A política pode ser um arquivo ou um diretório de arquivos (.txt/.md). Cada
+arquivo é quebrado por seção (blocos separados por linha em branco): o título
+da seção acompanha cada chunk e as cláusulas são agrupadas até
+POLICY_CHUNK_SIZE caracteres. Editar uma cláusula só muda os chunks da
+própria seção.
+
+O id de cada chunk é o hash do arquivo de origem + texto, então reingerir
+um corpus sem mudanças não gera nenhum embedding novo.
+"""
+
+import os
+import hashlib
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+POLICY_PATH = os.getenv("POLICY_PATH", os.path.join(SCRIPT_DIR, "politica_ifood_reembolso.txt"))
+
+# Tamanho máximo (caracteres) de um chunk, título da seção incluído
+CHUNK_SIZE = int(os.getenv("POLICY_CHUNK_SIZE", "800"))
+
+POLICY_EXTENSIONS = (".txt", ".md")
+
+
+def policy_files(path: str = POLICY_PATH) -> list:
+    """Arquivos da política, em ordem estável: o próprio arquivo ou os .txt/.md do diretório (recursivo)."""
+    if os.path.isfile(path):
+        return [path]
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        files.extend(
+            os.path.join(root, name) for name in sorted(names)
+            if name.endswith(POLICY_EXTENSIONS) and not name.startswith(".")
+        )
+    if not files:
+        raise FileNotFoundError(f"Nenhum arquivo de política (.txt/.md) encontrado em {path}")
+    return files
+
+
+def _source_name(file_path: str, path: str) -> str:
+    if os.path.isfile(path):
+        return os.path.basename(file_path)
+    return os.path.relpath(file_path, path).replace(os.sep, "/")
+
+
+def corpus_fingerprint(path: str = POLICY_PATH) -> str:
+    """SHA-256 do corpus: nome relativo + conteúdo de cada arquivo."""
+    files = policy_files(path)
+    if len(files) == 1 and files[0] == path:
+        # Arquivo único: mesmo hash de antes (hash do conteúdo), caches existentes continuam válidos
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    digest = hashlib.sha256()
+    for file_path in files:
+        with open(file_path, "rb") as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        digest.update(f"{_source_name(file_path, path)}\x1f{content_hash}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def corpus_stamp(path: str = POLICY_PATH):
+    """Carimbo barato (mtimes) para detectar mudança no corpus sem reler os arquivos."""
+    try:
+        return tuple((f, os.stat(f).st_mtime_ns) for f in policy_files(path))
+    except OSError:
+        return None
+
+
+def _split_long(text: str, size: int) -> list:
+    """Quebra uma cláusula maior que o chunk em frases (ou, no limite, em janelas de caracteres)."""
+    pieces, current = [], ""
+    for sentence in text.replace(". ", ".\n").splitlines():
+        if current and len(current) + 1 + len(sentence) > size:
+            pieces.append(current)
+            current = ""
+        while len(sentence) > size:
+            pieces.append(sentence[:size])
+            sentence = sentence[size:]
+        current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_sections(text: str) -> list:
+    """Seções do texto: (título, [cláusulas]), separadas por linha em branco."""
+    sections = []
+    for block in text.replace("\r\n", "\n").split("\n\n"):
+        lines = [line.strip() for line in block.splitlines() if line.strip()]
+        if lines:
+            sections.append((lines[0], lines[1:]))
+    return sections
+
+
+def chunk_text(text: str, size: int = CHUNK_SIZE) -> list:
+    """Chunks de um arquivo: [(título da seção, texto do chunk)]."""
+    chunks = []
+    for title, clauses in split_sections(text):
+        if not clauses:
+            chunks.append((title, title))
+            continue
+        # O título vai em todo chunk da seção: o trecho recuperado continua autoexplicativo
+        room = max(size - len(title) - 1, 1)
+        current = []
+        for clause in clauses:
+            for piece in (_split_long(clause, room) if len(clause) > room else [clause]):
+                if current and len("\n".join(current + [piece])) > room:
+                    chunks.append((title, "\n".join([title] + current)))
+                    current = []
+                current.append(piece)
+        if current:
+            chunks.append((title, "\n".join([title] + current)))
+    return chunks
+
+
+def chunk_id(source: str, text: str) -> str:
+    """Id estável do chunk: muda só se o texto (ou o arquivo de origem) mudar."""
+    return hashlib.sha256(f"{source}\x1f{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def load_chunks(path: str = POLICY_PATH, size: int = CHUNK_SIZE) -> list:
+    """
+    Chunks de todo o corpus, sem duplicatas.
+
+    Returns:
+        lista de dicts com id, text e metadata (source, section)
+    """
+    chunks, seen = [], set()
+    for file_path in policy_files(path):
+        source = _source_name(file_path, path)
+        with open(file_path, encoding="utf-8") as f:
+            text = f.read()
+        for section, chunk in chunk_text(text, size):
+            cid = chunk_id(source, chunk)
+            if cid in seen:
+                continue
+            seen.add(cid)
+            chunks.append({"id": cid, "text": chunk, "metadata": {"source": source, "section": section}})
+    return chunks
@@ -1,23 +1,15 @@
-import gspread
-import os
 import random
 from datetime import datetime, timedelta
 
+from sheets_client import DEFAULT_SPREADSHEET_ID, ROI_WORKSHEET, get_sheets_client
+
 # Configuração
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-CREDS_FILE = os.path.join(SCRIPT_DIR, 'client_secret.json')
-SPREADSHEET_ID = "14qM34cpPSK8rPcIfjQhY1kI1ysJBAdkaGa_xGX3TKao"
+SPREADSHEET_ID = DEFAULT_SPREADSHEET_ID
 
 def populate():
     print("🔐 Autenticando...")
-    gc = gspread.service_account(filename=CREDS_FILE)
-    sh = gc.open_by_key(SPREADSHEET_ID)
-    
-    # Tenta pegar a aba correta
-    try:
-        ws = sh.worksheet('Relatório_ROI_iFood')
-    except:
-        ws = sh.sheet1
+    # Tenta pegar a aba correta (cai na primeira aba se não existir)
+    ws = get_sheets_client().worksheet(ROI_WORKSHEET, SPREADSHEET_ID, fallback_first=True)
         
     print(f"📝 Escrevendo na aba: {ws.title}")
 
@@ -32,8 +24,9 @@ def populate():
         ['IF-22331', 67.80, (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d'), 'Atraso justificado por chuva intensa.']
     ]
 
+    # Uma única chamada à API para todas as linhas
+    ws.append_rows(data)
     for row in data:
-        ws.append_row(row)
         print(f'✅ Adicionado: {row[0]} - R$ {row[1]}')
 
 if __name__ == "__main__":
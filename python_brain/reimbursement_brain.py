@@ -2,46 +2,73 @@ import os
 import json
 import sys # Importa para ler argumentos de linha de comando (n8n)
 import time # Para data
-import gspread # Para Google Sheets
+import threading
 import traceback # Para debug de erros
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Annotated
 
-# Bibliotecas (Google e LangChain)
-from pydantic import BaseModel, Field
+# Bibliotecas (Google e LangChain são importadas sob demanda pelo registro de clientes)
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
+
+from clients import get_client
+from policy_cache import (
+    PolicyAnswerCache,
+    QUERY_PIN,
+    QUERY_QUALITY_UNPROVEN,
+    QUERY_QUALITY_PROVEN,
+    QUERY_LATE_DELIVERY,
+    QUERY_CUSTOMER_ABSENT,
+    QUERY_INFORMAL_AGREEMENT,
+)
+from roi_spool import RoiSpool, SheetsRoiSink
+from defense_templates import RENDER_MODE_LLM, RENDER_MODE_TEMPLATE, render_defense, render_mode_for
+from image_index import fingerprint, get_image_index
+from image_preprocess import prepare_image
+from chat_rules import MIN_CONFIDENCE as CHAT_RULES_MIN_CONFIDENCE, classify_chat
+from chat_cache import compact_history, get_chat_cache, prefix_hashes
+from gps_evidence import ARRIVAL_RADIUS_M, VERDICT_ANOMALOUS, VERDICT_WAITED, GpsTrace, analyze_gps
+from customer_risk import RISK_HIGH, assess_order, get_customer_risk_store
+from tracing import INCLUDE_TIMINGS, finish_order, span, trace_order, traced
+from llm_usage import (
+    STAGE_CHAT,
+    STAGE_DEFENSE,
+    STAGE_POLICY,
+    STAGE_VISION,
+    allow as llm_allowed,
+    record as record_llm_usage,
+    set_order_id,
+    track_order,
+    usage_callback,
+    usage_from_callback,
+    usage_from_message,
+)
 
 # --- NOVO: FUNÇÃO DE ESCRITA DE ROI ---
+# Spool durável (SQLite) com envio em lote para o Sheets; criado no primeiro registro
+_roi_spool = None
+_roi_spool_lock = threading.Lock()
+
+
+def _get_roi_spool(spreadsheet_id: str) -> RoiSpool:
+    global _roi_spool
+    with _roi_spool_lock:
+        if _roi_spool is None:
+            _roi_spool = RoiSpool(SheetsRoiSink(spreadsheet_id))
+    return _roi_spool
+
+
+@traced("sheets")
 def log_roi_to_sheet(data):
-    """Autentica e anexa uma linha de dados à planilha."""
+    """Grava a linha de ROI no spool local; o envio ao Sheets acontece em lote, em segundo plano."""
     try:
-        # 1. Autenticação (usa o client_secret.json na pasta)
-        # O arquivo client_secret.json deve estar na mesma pasta do script
-        json_creds = os.path.join(os.path.dirname(__file__), 'client_secret.json')
-        gc = gspread.service_account(filename=json_creds)
-        
-        # 2. Abre a planilha pelo ID (mais seguro que nome)
+        # 1. Planilha pelo ID (mais seguro que nome)
         spreadsheet_id = os.getenv("SPREADSHEET_ID")
         if not spreadsheet_id:
             print("⚠️ SPREADSHEET_ID não configurado no .env. Pulando registro no Sheets.", file=sys.stderr)
             return False
-            
-        spreadsheet = gc.open_by_key(spreadsheet_id)
-        
-        # 3. Seleciona a aba correta de DADOS (e não o Dashboard)
-        try:
-            worksheet = spreadsheet.worksheet("Relatório_ROI_iFood")
-        except:
-            # Se não existir, cria a aba
-            worksheet = spreadsheet.add_worksheet(title="Relatório_ROI_iFood", rows=1000, cols=10)
-            worksheet.append_row(["Order ID", "Valor (R$)", "Data", "Defesa Gerada"])
-        
-        # 4. Dados para anexar (Append Row)
+
+        # 2. Dados para anexar (Append Row)
         # Garante que o valor financeiro seja enviado como STRING com VÍRGULA (Padrão BR)
         # Isso evita que o Google Sheets engula o ponto decimal (ex: 125.5 -> 1255)
         try:
@@ -56,17 +83,32 @@ def log_roi_to_sheet(data):
             time.strftime("%Y-%m-%d"),
             data.get("generated_defense")[:500]
         ]
-        
-        worksheet.append_row(row)
-        print("✅ Dados de ROI registrados com sucesso via Gspread!", file=sys.stderr)
+
+        # 3. Commit imediato no spool; o flusher envia via append_rows
+        if _get_roi_spool(spreadsheet_id).enqueue(row):
+            print("✅ Dados de ROI gravados no spool (envio ao Sheets em lote).", file=sys.stderr)
+        else:
+            print("ℹ️ Pedido já registrado no spool de ROI. Ignorando duplicata.", file=sys.stderr)
         return True
-        
+
     except Exception as e:
-        print(f"❌ ERRO GRAVE NO GSHEETS: {str(e)}", file=sys.stderr)
+        print(f"❌ ERRO GRAVE NO SPOOL DE ROI: {str(e)}", file=sys.stderr)
         print(traceback.format_exc(), file=sys.stderr)
         return False
 
 # --- NOVO: ANÁLISE DE IMAGENS COM GEMINI VISION ---
+def build_vision_message(prompt: str, image_url: str):
+    """Mensagem do Gemini Vision: texto + imagem (URL ou data URL em base64)."""
+    from langchain_core.messages import HumanMessage
+    return HumanMessage(
+        content=[
+            {"type": "text", "text": prompt},
+            {"type": "image_url", "image_url": image_url}
+        ]
+    )
+
+
+@traced("vision")
 def analyze_image_evidence(image_path: str, claim_type: str, order_details: dict) -> dict:
     """
     Analisa evidência fotográfica usando Gemini 2.0 Flash Vision.
@@ -77,16 +119,44 @@ def analyze_image_evidence(image_path: str, claim_type: str, order_details: dict
         order_details: Detalhes do pedido para contexto
     
     Returns:
-        dict com verdict, confidence e reasoning
+        dict com verdict, confidence e reasoning (e photo_reused_in, se a foto já apareceu em outro pedido)
     """
     try:
         print(f"🔍 Analisando evidência fotográfica para {claim_type}...", file=sys.stderr)
-        
-        # Inicializa o modelo com capacidade de visão
-        vision_model = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-exp",
-            temperature=0.1  # Baixa temperatura para análise objetiva
-        )
+
+        # Fotos locais passam pelo índice: veredito em cache e detecção de reuso entre pedidos
+        prepared = None
+        fp = None
+        reused_in = []
+        if os.path.exists(image_path):
+            image_index = get_image_index()
+            fp = fingerprint(image_path)
+            reused_in = image_index.record_use(fp, order_details.get('order_id', 'N/A'))
+            cached = image_index.get_verdict(fp, claim_type)
+            if cached:
+                print(f"♻️ Foto já analisada anteriormente. Veredito em cache: {cached['verdict']}", file=sys.stderr)
+                original_bytes = os.path.getsize(image_path)
+                cached["image_preprocessing"] = {
+                    "cached": True, "original_bytes": original_bytes, "sent_bytes": 0, "bytes_saved": original_bytes
+                }
+                return _flag_photo_reuse(cached, reused_in)
+
+            # Valida, reduz e remove metadados antes do upload
+            prepared = prepare_image(image_path)
+            print(f"🗜️ Imagem preparada: {prepared['width']}x{prepared['height']}, "
+                  f"{prepared['bytes_saved']} bytes economizados.", file=sys.stderr)
+
+        # Orçamento de tokens estourado: a foto vai para revisão humana sem chamar o Gemini
+        if not llm_allowed(STAGE_VISION):
+            return _flag_photo_reuse({
+                "verdict": "ANALISE_HUMANA",
+                "confidence": 0.0,
+                "reasoning": "Orçamento de LLM esgotado. Análise da foto fica para revisão humana.",
+                "red_flags": []
+            }, reused_in)
+
+        # Modelo com capacidade de visão (criado uma vez por processo)
+        vision_model = get_client("vision")
         
         # Monta o prompt de análise forense
         analysis_prompt = f"""
@@ -115,41 +185,23 @@ RESPONDA EM JSON:
 SEJA RIGOROSO: Fraudes são comuns. Busque inconsistências.
 """
         
-        # Se for caminho local, lê a imagem
-        if os.path.exists(image_path):
-            import base64
-            from langchain_core.messages import HumanMessage
-            
-            with open(image_path, "rb") as img_file:
-                image_data = base64.b64encode(img_file.read()).decode('utf-8')
-                
-            # Gemini aceita imagens em base64 via HumanMessage
-            message = HumanMessage(
-                content=[
-                    {"type": "text", "text": analysis_prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": f"data:image/jpeg;base64,{image_data}"
-                    }
-                ]
-            )
-            response = vision_model.invoke([message])
-        else:
-            # Se for URL, passa direto
-            from langchain_core.messages import HumanMessage
-            
-            message = HumanMessage(
-                content=[
-                    {"type": "text", "text": analysis_prompt},
-                    {"type": "image_url", "image_url": image_path}
-                ]
-            )
-            response = vision_model.invoke([message])
+        # Se for caminho local, envia a versão pré-processada; se for URL, passa direto
+        image_url = prepared["data_url"] if prepared is not None else image_path
+        with span("vision_model"):
+            response = vision_model.invoke([build_vision_message(analysis_prompt, image_url)])
         
+        record_llm_usage(STAGE_VISION, usage_from_message(response))
+
         # Parse da resposta JSON
         result = json.loads(response.content)
         print(f"✅ Análise de imagem concluída: {result['verdict']}", file=sys.stderr)
-        return result
+        if fp is not None:
+            get_image_index().put_verdict(fp, claim_type, result)
+        if prepared is not None:
+            result["image_preprocessing"] = {
+                key: prepared[key] for key in ("original_bytes", "sent_bytes", "bytes_saved", "width", "height")
+            }
+        return _flag_photo_reuse(result, reused_in)
         
     except Exception as e:
         print(f"❌ ERRO na análise de imagem: {str(e)}", file=sys.stderr)
@@ -162,7 +214,23 @@ SEJA RIGOROSO: Fraudes são comuns. Busque inconsistências.
             "red_flags": ["erro_sistema"]
         }
 
+def _flag_photo_reuse(result: dict, reused_in: list) -> dict:
+    """Acrescenta o sinal de fraude quando a mesma foto já apareceu em outros pedidos."""
+    if not reused_in:
+        return result
+    print(f"🚨 Foto reutilizada! Já enviada nos pedidos: {', '.join(reused_in)}", file=sys.stderr)
+    result = dict(result)
+    result["photo_reused_in"] = reused_in
+    result["red_flags"] = list(result.get("red_flags", [])) + [
+        f"foto_reutilizada (mesma imagem nos pedidos {', '.join(reused_in)})"
+    ]
+    return result
+
 # --- NOVO: ANÁLISE DE SENTIMENTO E CONTEXTO DO CHAT ---
+# Versão do prompt de chat: entra no hash do cache, então mudar o prompt invalida as análises gravadas
+CHAT_PROMPT_VERSION = "2"
+
+@traced("chat")
 def analyze_chat_context(chat_history: List[dict], order_details: dict) -> dict:
     """
     Analisa o histórico de chat para detectar nuances importantes.
@@ -172,7 +240,7 @@ def analyze_chat_context(chat_history: List[dict], order_details: dict) -> dict:
         order_details: Detalhes do pedido para contexto
     
     Returns:
-        dict com findings, sentiment, e red_flags
+        dict com findings, sentiment, red_flags e engine ("rules" ou "llm")
     """
     try:
         if not chat_history or len(chat_history) == 0:
@@ -180,16 +248,49 @@ def analyze_chat_context(chat_history: List[dict], order_details: dict) -> dict:
                 "has_chat": False,
                 "findings": [],
                 "sentiment": "neutral",
-                "red_flags": []
+                "red_flags": [],
+                "engine": "rules"
             }
+
+        # Pré-classificação local: sinais claros não precisam do Gemini
+        rules_result = classify_chat(chat_history)
+        if rules_result["confidence"] >= CHAT_RULES_MIN_CONFIDENCE:
+            print(f"⚡ Chat classificado por regras locais (confiança {rules_result['confidence']:.2f}).", file=sys.stderr)
+            return rules_result
         
-        print(f"💬 Analisando {len(chat_history)} mensagens do chat...", file=sys.stderr)
+        # Cache por pedido + hash do prefixo do chat: retry não chama o LLM, mensagens novas vão sozinhas
+        order_id = order_details.get('order_id', 'N/A')
+        chat_cache = get_chat_cache()
+        hashes = prefix_hashes(chat_history, f"{CHAT_PROMPT_VERSION}|{order_id}|{order_details.get('reason_code', 'N/A')}")
+        previous = chat_cache.lookup(order_id, hashes)
+        if previous and previous["message_count"] == len(chat_history):
+            print("♻️ Chat já analisado para este pedido. Resultado servido do cache.", file=sys.stderr)
+            return previous["result"]
+
+        # Orçamento de tokens estourado: as regras locais ficaram abaixo do MIN_CONFIDENCE,
+        # então o chat não decide sozinho (o cérebro manda para revisão humana)
+        if not llm_allowed(STAGE_CHAT):
+            return dict(rules_result, budget_downgrade=True)
+
+        new_messages = chat_history[previous["message_count"]:] if previous else chat_history
+        print(f"💬 Analisando {len(new_messages)} mensagem(ns) do chat com o Gemini "
+              f"(regras com confiança {rules_result['confidence']:.2f})...", file=sys.stderr)
         
-        # Formata o chat para análise
-        chat_text = "\n".join([
-            f"{msg.get('timestamp', 'N/A')} - {msg.get('sender', 'unknown')}: {msg.get('text', '')}"
-            for msg in chat_history
-        ])
+        # Formata o chat para análise (mensagens antigas além do orçamento de tokens viram resumo)
+        older_summary, chat_text = compact_history(new_messages)
+        context_sections = ""
+        if previous:
+            context_sections += f"""
+ANÁLISE ANTERIOR (mensagens 1 a {previous['message_count']}):
+Resumo: {previous['summary']}
+Resultado: {json.dumps({k: v for k, v in previous['result'].items() if k not in ('engine', 'rules_confidence')}, ensure_ascii=False)}
+"""
+        if older_summary:
+            context_sections += f"""
+RESUMO DAS MENSAGENS MAIS ANTIGAS:
+{older_summary}
+"""
+        chat_title = "NOVAS MENSAGENS DO CHAT" if previous else "HISTÓRICO DO CHAT"
         
         # Prompt de análise
         analysis_prompt = f"""
@@ -198,12 +299,12 @@ Você é um analista especializado em comunicação de delivery e detecção de
 CONTEXTO DO PEDIDO:
 - Order ID: {order_details.get('order_id', 'N/A')}
 - Motivo da Reclamação: {order_details.get('reason_code', 'N/A')}
-
-HISTÓRICO DO CHAT:
+{context_sections}
+{chat_title}:
 {chat_text}
 
 TAREFA:
-Analise o chat e identifique:
+Analise o chat (considerando a análise anterior e os resumos, se houver) e identifique:
 
 1. **Acordos Informais**: O cliente fez algum acordo sobre local de entrega? (ex: "deixa na portaria", "deixa com o vizinho")
 2. **Cliente Ausente**: Há evidências de que o cliente não respondeu tentativas de contato?
@@ -225,14 +326,17 @@ RESPONDA EM JSON:
     "contact_attempts": 0-10,
     "sentiment": "cordial" ou "neutral" ou "agressivo" ou "suspeito",
     "findings": ["lista de descobertas importantes"],
-    "red_flags": ["lista de sinais suspeitos"]
+    "red_flags": ["lista de sinais suspeitos"],
+    "summary": "resumo de toda a conversa até aqui, em no máximo 3 frases"
 }}
 
 SEJA OBJETIVO E BASEADO EM FATOS.
 """
         
         # Chama o LLM para análise
-        response = llm.invoke(analysis_prompt)
+        with span("chat_llm"):
+            response = get_client("llm").invoke(analysis_prompt)
+        record_llm_usage(STAGE_CHAT, usage_from_message(response))
         
         # Parse da resposta JSON (pode vir dentro de ```json```)
         response_text = response.content.strip()
@@ -245,6 +349,10 @@ SEJA OBJETIVO E BASEADO EM FATOS.
                 response_text = response_text[4:].strip()
         
         result = json.loads(response_text)
+        summary = result.pop("summary", "")
+        result["engine"] = "llm"
+        result["rules_confidence"] = rules_result["confidence"]
+        chat_cache.store(order_id, hashes, result, summary)
         print(f"✅ Análise de chat concluída: {len(result.get('findings', []))} descobertas", file=sys.stderr)
         return result
         
@@ -256,10 +364,12 @@ SEJA OBJETIVO E BASEADO EM FATOS.
             "findings": [],
             "sentiment": "unknown",
             "red_flags": ["erro_analise"],
+            "engine": "llm",
             "error": str(e)
         }
 
 # --- NOVO: NOTIFICAÇÃO VIA TELEGRAM PARA APROVAÇÃO HUMANA ---
+@traced("telegram")
 def send_telegram_approval(contestation_data: dict) -> dict:
     """
     Envia notificação no Telegram para aprovação humana.
@@ -271,8 +381,6 @@ def send_telegram_approval(contestation_data: dict) -> dict:
         dict com status do envio
     """
     try:
-        import requests
-        
         # Carrega credenciais do Telegram do .env
         telegram_token = os.getenv("TELEGRAM_BOT_TOKEN")
         telegram_chat_id = os.getenv("TELEGRAM_CHAT_ID")
@@ -305,7 +413,7 @@ def send_telegram_approval(contestation_data: dict) -> dict:
             "parse_mode": "Markdown"
         }
         
-        response = requests.post(url, json=payload, timeout=10)
+        response = get_client("http").post(url, json=payload, timeout=10)
         
         if response.status_code == 200:
             print("✅ Notificação enviada no Telegram!", file=sys.stderr)
@@ -319,55 +427,56 @@ def send_telegram_approval(contestation_data: dict) -> dict:
         print(traceback.format_exc(), file=sys.stderr)
         return {"sent": False, "error": str(e)}
 
-# (Imports do RAG já realizados no topo do arquivo)
-
 # Carregar variáveis de ambiente (.env)
 load_dotenv()
 
-# === 1. CONFIGURAÇÃO DO LLM ===
-if not os.getenv("GOOGLE_API_KEY"):
-    # Se a chave não estiver no .env, levanta um erro claro
-    raise ValueError("A chave GOOGLE_API_KEY não foi encontrada no arquivo .env")
-
-# O modelo Gemini 2.0 Flash é o que está funcionando para você
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash", 
-    temperature=0,
-    max_retries=2,
-)
-
-# --- CONFIGURAÇÃO DO RAG ---
-VECTOR_DB_DIR = os.path.join(os.path.dirname(__file__), "chroma_db_ifood")
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004") 
-
-# Carrega o banco vetorial persistente
-rag_db = Chroma(persist_directory=VECTOR_DB_DIR, embedding_function=embeddings)
-
-# Cria a Cadeia de Recuperação (Retrieval Chain)
-# O Gemini agora pode consultar a política de reembolso
-retriever = rag_db.as_retriever()
-
-# 1. Prompt do Sistema para o RAG (Define como ele usa o contexto)
-system_prompt = (
-    "Você é um especialista em políticas de reembolso do iFood. "
-    "Use o contexto recuperado abaixo para responder à pergunta sobre regras e procedimentos. "
-    "Se a resposta não estiver no contexto, diga que não encontrou a informação oficial."
-    "\n\n"
-    "Contexto Oficial:\n{context}"
-)
-
-rag_prompt = ChatPromptTemplate.from_messages(
-    [
-        ("system", system_prompt),
-        ("human", "{input}"),
-    ]
-)
-
-# 2. Chain de Documentos (Processa o contexto)
-question_answer_chain = create_stuff_documents_chain(llm, rag_prompt)
-
-# 3. Chain Final (Conecta Retriever -> Documentos -> LLM)
-rag_chain = create_retrieval_chain(retriever, question_answer_chain)
+# === 1. CONFIGURAÇÃO DO LLM E DO RAG ===
+# LLM (Gemini 2.0 Flash), embeddings, Chroma, retriever e cadeia RAG ficam no
+# registro de clientes (clients.py) e só são criados no primeiro uso. A checagem
+# da GOOGLE_API_KEY acontece nesse momento, não na importação.
+
+# Nomes antigos do módulo (llm, rag_chain, ...) continuam acessíveis, agora sob demanda
+_LAZY_CLIENTS = {
+    "llm": "llm",
+    "embeddings": "embeddings",
+    "rag_db": "vector_db",
+    "retriever": "retriever",
+    "rag_chain": "rag_chain",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_CLIENTS:
+        return get_client(_LAZY_CLIENTS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Respostas pré-calculadas das consultas fixas (geradas pelo ingest_policy.py)
+policy_answers = PolicyAnswerCache()
+
+
+@traced("policy")
+def get_policy_answer(rag_query: str) -> str:
+    """Busca a regra oficial no cache versionado; só consulta o RAG em caso de miss."""
+    answer = policy_answers.get(rag_query)
+    if answer is None and not llm_allowed(STAGE_POLICY):
+        # Orçamento de tokens estourado: trechos recuperados da política, sem geração (nem cache)
+        with span("retriever"):
+            documents = get_client("retriever").invoke(rag_query)
+        answer = "\n".join(doc.page_content for doc in documents[:2])
+    elif answer is None:
+        print("🧠 Consultando base de política para obter texto oficial...", file=sys.stderr)
+        # O método retorna um dict com 'answer' e 'context'
+        usage = usage_callback()
+        with span("rag_chain"):
+            answer = get_client("rag_chain").invoke(
+                {"input": rag_query}, config={"callbacks": [usage] if usage else []}
+            )["answer"]
+        record_llm_usage(STAGE_POLICY, usage_from_callback(usage))
+        policy_answers.put(rag_query, answer)
+    else:
+        print("📚 Regra oficial servida do cache da política.", file=sys.stderr)
+    return answer
 # --- FIM CONFIGURAÇÃO DO RAG ---
 
 # === 2. ESTRUTURAS DE DADOS (MODELOS Pydantic) ===
@@ -377,9 +486,15 @@ class Timestamps(BaseModel):
     actual_arrival_at: Optional[datetime] = None
 
 class DeliveryEvidence(BaseModel):
-    gps_logs: List[dict]
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # Convertido no parse para arrays tipados (e simplificado, se GPS_SIMPLIFY_TOLERANCE_M > 0)
+    gps_logs: Annotated[GpsTrace, BeforeValidator(GpsTrace.from_logs)]
     delivery_pin_validated: bool = False 
     pin_validated_at: Optional[datetime] = None
+    # Coordenadas do endereço de entrega (opcional): habilita o haversine na análise de GPS
+    address_latitude: Optional[float] = None
+    address_longitude: Optional[float] = None
 
 class OrderData(BaseModel):
     order_id: str
@@ -389,10 +504,13 @@ class OrderData(BaseModel):
     delivery_evidence: DeliveryEvidence
     chat_history: List[dict]
     photo_evidence_url: Optional[str] = None  # URL ou caminho da foto de evidência
+    # Cliente (opcional): com customer_id o histórico fica no store de risco entre pedidos
+    customer_id: Optional[str] = None
+    customer_history: Optional[dict] = None  # total_orders, refund_requests, refund_rate
 
 # === 3. PROMPT DO CONSULTOR (Didático e Transparente) ===
 # O LLM será usado para gerar a comunicação, não apenas a decisão
-communication_prompt = ChatPromptTemplate.from_template("""
+COMMUNICATION_TEMPLATE = """
 Você é um **Consultor de Conciliação Financeira do iFood** e especialista em Políticas de Cancelamento, focado em educação e transparência para o Parceiro (Restaurante).
 
 OBJETIVO DA RESPOSTA: Gerar a comunicação oficial que será enviada para o restaurante.
@@ -411,27 +529,117 @@ TAREFA:
 4. Se a ação é ACEITAR CANCELAMENTO (ou seja, PERDIDA para o parceiro), termine sugerindo a revisão dos processos internos (logística/preparo) para evitar futuras perdas.
 
 Resposta:
-""")
+"""
+
+_communication_prompt = None
+
+
+def get_communication_prompt():
+    """Prompt da comunicação (langchain_core só é importado quando o LLM escreve a defesa)."""
+    global _communication_prompt
+    if _communication_prompt is None:
+        from langchain_core.prompts import ChatPromptTemplate
+        _communication_prompt = ChatPromptTemplate.from_template(COMMUNICATION_TEMPLATE)
+    return _communication_prompt
 
 
 # === 4. MOTOR HÍBRIDO (Estrutura Corrigida para RAG) ===
-def process_refund_request(json_data: str):
+def process_refund_request(json_data: str, include_timings: bool = INCLUDE_TIMINGS):
+    """
+    Decide um pedido e mede cada etapa (parse, GPS, Vision, chat, política, defesa,
+    Telegram, Sheets). Com include_timings, o resultado traz o bloco `timings`;
+    se o pedido chamou o Gemini (ou foi rebaixado por orçamento), traz `llm_usage`.
+    """
+    with trace_order() as trace, track_order() as usage:
+        order_info = {}
+        result = _decide_refund(json_data, order_info)
+        if order_info.get("customer_id") and result.get("action") != "ERROR":
+            # Estatísticas do cliente só com a decisão final (PENDING incluído); erro não conta
+            with span("customer_risk"):
+                get_customer_risk_store().record(order_info["customer_id"], result["order_id"], result["action"])
+    finish_order(trace, result.get("action"))
+    if usage.stages or usage.downgraded:
+        result["llm_usage"] = usage.as_dict()
+    if include_timings:
+        result["timings"] = trace.as_dict()
+    return result
+
+
+def _decide_refund(json_data: str, order_info: dict):
     try:
-        order = OrderData(**json.loads(json_data))
+        with span("parse"):
+            order = OrderData(**json.loads(json_data))
+        set_order_id(order.order_id)
+        order_info["customer_id"] = order.customer_id
         print(f"Gemini 🤖 analisando Pedido: {order.order_id}...", file=sys.stderr)
         
         action = "PENDING"
+        # Ramos determinísticos (PIN, atraso) podem gerar a defesa por template, sem LLM
+        deterministic = False
+        # Preenchido quando a decisão vem do chat (registra se foram as regras locais ou o LLM)
+        chat_analysis = None
+        # Preenchido quando a decisão passa pelo Vision (veredito e bytes economizados no upload)
+        image_analysis = None
+        # Evidência de GPS (NumPy, local): calculada só nos ramos que precisam dela
+        gps_analysis = None
+
+        def gps():
+            nonlocal gps_analysis
+            if gps_analysis is None:
+                evidence_data = order.delivery_evidence
+                with span("gps"):
+                    gps_analysis = analyze_gps(
+                        evidence_data.gps_logs,
+                        eta_max=order.timestamps.eta_max,
+                        address=(evidence_data.address_latitude, evidence_data.address_longitude),
+                    )
+            return gps_analysis
+
+        def arrival():
+            # Horário de chegada: timestamp informado ou, na falta dele, a chegada medida pelo GPS
+            if order.timestamps.actual_arrival_at:
+                return order.timestamps.actual_arrival_at
+            # Trajeto anômalo (ex.: teleporte) não serve como prova, nem do horário de chegada
+            if not gps()["arrived_at"] or gps()["verdict"] == VERDICT_ANOMALOUS:
+                return None
+            arrived_at = datetime.fromisoformat(gps()["arrived_at"].replace("Z", "+00:00"))
+            if order.timestamps.eta_max.tzinfo is None:
+                # eta_max sem fuso é tratado como UTC pela análise de GPS
+                arrived_at = arrived_at.replace(tzinfo=None)
+            return arrived_at
+
+        tolerance_limit = order.timestamps.eta_max + timedelta(minutes=15)
+
+        # Risco do cliente (SQLite local, consulta por chave): decidido antes de qualquer LLM
+        with span("customer_risk"):
+            customer_risk = assess_order(order.customer_id, order.order_id, order.customer_history)
         
         # --- LÓGICA DE TRATAMENTO DE REGRAS RÍGIDAS (HARD RULES) ---
         
         # REGRA A: Validação do PIN (Caso Ganho do Parceiro - Prioridade Máxima)
         if order.delivery_evidence.delivery_pin_validated:
             action = "CONTESTAR"
+            deterministic = True
             
             # Buscamos a regra oficial do PIN no RAG para justificar
-            rag_query = "Regra de comprovação de entrega e uso do PIN"
+            rag_query = QUERY_PIN
             situation = "A contestação do cliente é improcedente, pois o pedido foi recebido pelo titular da conta."
             evidence = f"Código PIN validado com sucesso às {order.delivery_evidence.pin_validated_at}."
+
+        # REGRA E: Cliente com reembolsos recorrentes vai para revisão humana sem Vision/chat
+        # O atraso comprovado (REGRA B) continua valendo: a perda é do parceiro independente do cliente
+        elif (customer_risk and customer_risk["level"] == RISK_HIGH
+              and not (arrival() and arrival() > tolerance_limit)):
+            print(f"👤 Cliente com risco alto ({customer_risk['score']:.0%} de reembolsos). "
+                  "Enviando para revisão humana...", file=sys.stderr)
+            return {
+                "action": "PENDING",
+                "order_id": order.order_id,
+                "financial_impact": order.financial_impact,
+                "customer_risk": customer_risk,
+                "gps_analysis": gps_analysis,
+                "error": "Cliente com histórico de reembolsos recorrentes. Requer revisão humana."
+            }
         
         # REGRA C: Análise de Imagem para Reclamações de Qualidade (ANTES da Regra B)
         elif order.reason_code == "QUALITY_ISSUE" and hasattr(order, 'photo_evidence_url') and order.photo_evidence_url:
@@ -450,13 +658,14 @@ def process_refund_request(json_data: str):
             # Decide com base no veredito da IA
             if image_analysis["verdict"] == "NEGAR_REEMBOLSO":
                 action = "CONTESTAR"
-                rag_query = "Regra sobre reclamações de qualidade sem evidência comprovada"
+                rag_query = QUERY_QUALITY_UNPROVEN
                 situation = f"A contestação do cliente foi NEGADA. Análise da imagem: {image_analysis['reasoning']}"
                 evidence = f"Confiança da análise: {image_analysis['confidence']*100:.0f}%. Red flags: {', '.join(image_analysis.get('red_flags', []))}"
             
-            elif image_analysis["verdict"] == "ACEITAR_REEMBOLSO":
+            # Foto reutilizada de outro pedido não libera reembolso automaticamente
+            elif image_analysis["verdict"] == "ACEITAR_REEMBOLSO" and not image_analysis.get("photo_reused_in"):
                 action = "ACEITAR_CANCELAMENTO"
-                rag_query = "Regra sobre vícios de qualidade comprovados"
+                rag_query = QUERY_QUALITY_PROVEN
                 situation = f"A contestação do cliente foi ACATADA. Problema de qualidade confirmado visualmente."
                 evidence = f"Análise da imagem: {image_analysis['reasoning']}"
             
@@ -466,21 +675,35 @@ def process_refund_request(json_data: str):
                     "order_id": order.order_id,
                     "financial_impact": order.financial_impact,
                     "image_analysis": image_analysis,
-                    "error": "Análise de imagem inconclusiva. Requer revisão humana."
+                    "error": ("Foto de evidência já usada em outro pedido. Requer revisão humana."
+                              if image_analysis.get("photo_reused_in")
+                              else "Análise de imagem inconclusiva. Requer revisão humana.")
                 }
             
         # REGRA B: Tolerância de Atraso (Caso Perdido do Parceiro)
         # Verifica se há tempo de chegada e se o PIN não foi validado (caso contrário, a REGRA A já teria resolvido)
-        elif order.timestamps.actual_arrival_at:
-            tolerance_limit = order.timestamps.eta_max + timedelta(minutes=15)
+        # Sem actual_arrival_at, a chegada ao endereço medida pelo GPS serve de horário de chegada
+        elif arrival():
+            actual_arrival_at = arrival()
             
-            if order.timestamps.actual_arrival_at > tolerance_limit:
+            if actual_arrival_at > tolerance_limit:
                 action = "ACEITAR_CANCELAMENTO"
+                deterministic = True
                 
                 # Buscamos a regra oficial de atraso no RAG para justificar
-                rag_query = "Qual a regra oficial sobre o cancelamento durante a entrega por atraso?"
+                rag_query = QUERY_LATE_DELIVERY
                 situation = "A contestação do cliente foi acatada. O atraso logístico excedeu o limite máximo de 15 minutos."
-                evidence = f"A entrega ocorreu em {order.timestamps.actual_arrival_at.time()}, excedendo o limite de {tolerance_limit.time()}."
+                evidence = f"A entrega ocorreu em {actual_arrival_at.time()}, excedendo o limite de {tolerance_limit.time()}."
+
+            # REGRA D: GPS comprova que o entregador chegou no prazo e aguardou no endereço
+            elif order.reason_code == "ITEM_NOT_RECEIVED" and gps()["verdict"] == VERDICT_WAITED:
+                action = "CONTESTAR"
+                deterministic = True
+                rag_query = QUERY_CUSTOMER_ABSENT
+                situation = ("A contestação do cliente foi NEGADA. O entregador chegou ao endereço no prazo "
+                             "e aguardou no local.")
+                evidence = (f"GPS: chegada às {gps_analysis['arrived_at']} e {gps_analysis['dwell_seconds'] / 60:.0f} "
+                            f"minuto(s) a até {ARRIVAL_RADIUS_M:.0f} m do endereço, sem anomalias no trajeto.")
 
             else:
                 # Se chegou a tempo, mas não tem PIN, analisa o chat para entender o contexto
@@ -494,10 +717,21 @@ def process_refund_request(json_data: str):
                     }
                 )
                 
+                # Sem Gemini (orçamento) e regras inconclusivas: revisão humana, como no Vision
+                if chat_analysis.get("budget_downgrade"):
+                    return {
+                        "action": "PENDING",
+                        "order_id": order.order_id,
+                        "financial_impact": order.financial_impact,
+                        "chat_analysis": chat_analysis,
+                        "gps_analysis": gps_analysis,
+                        "error": "Orçamento de LLM esgotado e chat inconclusivo pelas regras locais. Requer revisão humana."
+                    }
+
                 # Se o cliente estava ausente (não respondeu), o restaurante pode contestar
-                if chat_analysis.get("customer_absent", {}).get("likely", False):
+                elif chat_analysis.get("customer_absent", {}).get("likely", False):
                     action = "CONTESTAR"
-                    rag_query = "Regra sobre responsabilidade quando o cliente não atende o entregador"
+                    rag_query = QUERY_CUSTOMER_ABSENT
                     situation = f"A contestação do cliente foi NEGADA. O cliente estava ausente no momento da entrega."
                     evidence = f"Análise do chat: {chat_analysis.get('customer_absent', {}).get('evidence', 'Cliente não respondeu')}. Tentativas de contato: {chat_analysis.get('contact_attempts', 0)}"
                 
@@ -506,7 +740,7 @@ def process_refund_request(json_data: str):
                     # Se o cliente fez acordo informal E reclama que não recebeu, é suspeito
                     if order.reason_code == "ITEM_NOT_RECEIVED":
                         action = "CONTESTAR"
-                        rag_query = "Regra sobre acordos de entrega em local alternativo"
+                        rag_query = QUERY_INFORMAL_AGREEMENT
                         situation = f"A contestação do cliente foi NEGADA. Houve acordo informal de entrega."
                         evidence = f"Acordo detectado: {chat_analysis.get('informal_agreement', {}).get('details', 'N/A')}"
                     else:
@@ -516,6 +750,7 @@ def process_refund_request(json_data: str):
                             "order_id": order.order_id,
                             "financial_impact": order.financial_impact,
                             "chat_analysis": chat_analysis,
+                            "gps_analysis": gps_analysis,
                             "error": "Acordo informal detectado. Requer análise humana."
                         }
                 
@@ -526,6 +761,7 @@ def process_refund_request(json_data: str):
                         "order_id": order.order_id,
                         "financial_impact": order.financial_impact,
                         "chat_analysis": chat_analysis,
+                        "gps_analysis": gps_analysis,
                         "error": "Análise de chat inconclusiva. Requer revisão humana."
                     }
 
@@ -535,31 +771,42 @@ def process_refund_request(json_data: str):
                 "action": "PENDING",
                 "order_id": order.order_id,
                 "financial_impact": order.financial_impact,
+                "gps_analysis": gps_analysis,
                 "error": "Dados de timestamp incompletos."
             }
 
         
         # --- EXECUÇÃO DA CADEIA RAG/GEMINI PARA COMUNICAÇÃO ---
         if action != "PENDING":
-            print("🧠 Consultando base de política para obter texto oficial...", file=sys.stderr)
-            # Chamada principal do RAG com a query específica
-            # O novo método retorna um dict com 'answer' e 'context'
-            response = rag_chain.invoke({"input": rag_query})
-            rag_response = response["answer"]
+            # Regra oficial da política (cache versionado, RAG apenas em caso de miss)
+            rag_response = get_policy_answer(rag_query)
             
             print(f"⚡ Regra detectada: {action}. Gerando Comunicação...", file=sys.stderr)
-            
-            # Formatamos o prompt com os dados e a resposta do RAG
-            final_communication = communication_prompt.format(
-                situation=situation,
-                evidence=evidence,
-                rule_official=rag_response, # Usamos o texto recuperado do RAG
-                order_id=order.order_id,
-                customer_claim=order.reason_code
-            )
-            
-            # Chamamos o LLM final para escrever o texto didático
-            defense_text = llm.invoke(final_communication)
+
+            defense_fields = {
+                "situation": situation,
+                "evidence": evidence,
+                "rule_official": rag_response, # Usamos o texto recuperado do RAG
+                "order_id": order.order_id,
+                "customer_claim": order.reason_code
+            }
+
+            with span("defense"):
+                # Caminho rápido: decisão fechada, texto montado por template (sem Gemini);
+                # com o orçamento de tokens estourado, o template vale para qualquer ramo
+                if ((deterministic and render_mode_for(action) == RENDER_MODE_TEMPLATE)
+                        or not llm_allowed(STAGE_DEFENSE)):
+                    defense_renderer = RENDER_MODE_TEMPLATE
+                    defense_content = render_defense(action, rag_query, **defense_fields)
+                else:
+                    # Formatamos o prompt com os dados e a resposta do RAG
+                    final_communication = get_communication_prompt().format(**defense_fields)
+
+                    # Chamamos o LLM final para escrever o texto didático
+                    defense_renderer = RENDER_MODE_LLM
+                    response = get_client("llm").invoke(final_communication)
+                    record_llm_usage(STAGE_DEFENSE, usage_from_message(response))
+                    defense_content = response.content
 
             if action == "CONTESTAR":
                 # Se a ação for CONTESTAR, envia notificação no Telegram para aprovação
@@ -568,7 +815,7 @@ def process_refund_request(json_data: str):
                     "financial_impact": order.financial_impact,
                     "action": action,
                     "confidence": 1.0,
-                    "generated_defense": defense_text.content
+                    "generated_defense": defense_content
                 })
                 
                 # Se houver sucesso, registra a linha na planilha
@@ -576,19 +823,29 @@ def process_refund_request(json_data: str):
                 data_to_log = {
                     "order_id": order.order_id,
                     "financial_impact": order.financial_impact,
-                    "generated_defense": defense_text.content
+                    "generated_defense": defense_content
                 }
                 log_roi_to_sheet(data_to_log)
 
             # Retorna o resultado final
-            return {
+            result = {
                 "action": action,
                 "order_id": order.order_id,
                 "financial_impact": order.financial_impact,
                 "confidence": 1.0,
                 "model_used": "Gemini 2.0 Flash (RAG Ativo)",
-                "generated_defense": defense_text.content
+                "defense_renderer": defense_renderer,
+                "generated_defense": defense_content
             }
+            if chat_analysis is not None:
+                result["chat_engine"] = chat_analysis.get("engine")
+            if image_analysis is not None:
+                result["image_analysis"] = image_analysis
+            if gps_analysis is not None:
+                result["gps_analysis"] = gps_analysis
+            if customer_risk is not None:
+                result["customer_risk"] = customer_risk
+            return result
         
         # Se action for PENDING (que só acontece se a lógica 'else' falhar)
         return {
@@ -604,9 +861,93 @@ def process_refund_request(json_data: str):
         # Se houver erro de Pydantic ou JSON malformado
         return {"action": "ERROR", "error": str(e)}
 
+# --- MODO LOTE (JSONL): REPROCESSAMENTO DE BACKLOG EM UM ÚNICO PROCESSO ---
+def _process_jsonl_line(line: str) -> dict:
+    """Processa uma linha do stream e garante o order_id no resultado."""
+    result = process_refund_request(line)
+    if not result.get("order_id"):
+        # Resultados de ERROR não trazem order_id; recupera da entrada se possível
+        try:
+            result["order_id"] = json.loads(line).get("order_id")
+        except Exception:
+            result["order_id"] = None
+    return result
+
+
+def process_jsonl_stream(stream, max_in_flight: int = 4, out=sys.stdout) -> int:
+    """
+    Lê documentos OrderData (um JSON por linha) e escreve um resultado por linha
+    à medida que cada pedido termina (ordem de conclusão, não de entrada).
+
+    Args:
+        stream: Iterável de linhas (arquivo ou stdin)
+        max_in_flight: Máximo de pedidos processados simultaneamente
+        out: Destino das linhas de resultado
+
+    Returns:
+        Quantidade de pedidos processados
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if max_in_flight < 1:
+        raise ValueError(f"max_in_flight deve ser >= 1 (recebido: {max_in_flight})")
+
+    processed = 0
+    write_lock = threading.Lock()
+    # Janela limitada: só lê a próxima linha quando houver vaga
+    slots = threading.BoundedSemaphore(max_in_flight)
+
+    def emit(future):
+        # Roda na thread que terminou o pedido: o resultado sai na hora,
+        # mesmo que a leitura da próxima linha esteja bloqueada no stream
+        nonlocal processed
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"action": "ERROR", "error": str(e), "order_id": None}
+        try:
+            with write_lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                processed += 1
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            slots.acquire()
+            executor.submit(_process_jsonl_line, line).add_done_callback(emit)
+        # O with espera os pedidos restantes (e seus callbacks) antes de sair
+
+    print(f"✅ Lote concluído: {processed} pedido(s) processado(s).", file=sys.stderr)
+    return processed
+
 # === 5. EXECUÇÃO (MODO HÍBRIDO: LOCAL OU VIA N8N) ===
 if __name__ == "__main__":
-    
+
+    # Modo lote: python reimbursement_brain.py --jsonl [arquivo|-] [--workers N]
+    if len(sys.argv) > 1 and sys.argv[1] == "--jsonl":
+        args = sys.argv[2:]
+        workers = int(os.getenv("BRAIN_JSONL_WORKERS", "4"))
+        if "--workers" in args:
+            idx = args.index("--workers")
+            workers = int(args[idx + 1]) if idx + 1 < len(args) and args[idx + 1].lstrip("-").isdigit() else 0
+            del args[idx:idx + 2]
+        if workers < 1:
+            print("❌ --workers (ou BRAIN_JSONL_WORKERS) deve ser um inteiro >= 1.", file=sys.stderr)
+            sys.exit(1)
+        source = args[0] if args else "-"
+
+        if source == "-":
+            process_jsonl_stream(sys.stdin, max_in_flight=workers)
+        else:
+            with open(source, encoding="utf-8") as f:
+                process_jsonl_stream(f, max_in_flight=workers)
+        sys.exit(0)
+
     # Este bloco lê o input que vem do n8n (sys.argv[1]) ou usa o JSON de teste
     # Verifica se foi passado argumento E se não é uma string vazia
     use_mock = True
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Espelho local (SQLite) da aba "Relatório_ROI_iFood".
+
+Os dashboards deixam de usar o Google Sheets como motor de consulta: a
+planilha é copiada incrementalmente para um SQLite indexado por data e valor,
+e as métricas saem de consultas SQL filtradas pelo período pedido. Assim o
+custo de cada render depende do intervalo de datas, não do histórico total.
+
+Sincronização:
+- depois de ROI_CACHE_TTL segundos, busca só as linhas anexadas desde a última
+  sincronização;
+- a cada ROI_CACHE_FULL_REFRESH segundos refaz a cópia completa, para capturar
+  edições em linhas antigas (ex.: fix_sheet_values.py).
+
+KPIs materializados:
+- `roi_daily` guarda soma, contagem (total e só das linhas com valor) e maior valor por dia e `roi_top` um heap
+  limitado (ROLLUP_TOP_N) dos maiores valores. Ambos são atualizados no mesmo
+  commit em que as linhas novas entram no espelho (e reconstruídos na cópia
+  completa), então os cards leem O(dias) em vez de O(linhas).
+
+Como usar (sincronização manual):
+    python roi_mirror.py --sync
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from sheets_client import ROI_WORKSHEET, get_sheets_client
+from roi_normalize import normalize_roi_frame
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MIRROR_PATH = os.getenv("ROI_MIRROR_PATH", os.path.join(SCRIPT_DIR, "roi_mirror.db"))
+
+SYNC_TTL = float(os.getenv("ROI_CACHE_TTL", "30"))
+ROLLUP_TOP_N = int(os.getenv("ROLLUP_TOP_N", "20"))
+FULL_REFRESH_INTERVAL = float(os.getenv("ROI_CACHE_FULL_REFRESH", "600"))
+
+# O espelho é um cache: se o esquema mudar, as tabelas são recriadas e recopiadas
+SCHEMA_VERSION = 3
+
+# Números como números e datas como texto (mesmos tipos que a limpeza espera)
+READ_OPTIONS = {"value_render_option": "UNFORMATTED_VALUE", "date_time_render_option": "FORMATTED_STRING"}
+
+
+def _column_letter(index: int) -> str:
+    """1 -> A, 4 -> D, 27 -> AA."""
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _to_records(header: list, rows: list, row_nums: list) -> list:
+    """Linhas cruas da planilha -> tuplas prontas para o SQLite (normalização vetorizada)."""
+    width = len(header)
+    padded = [(list(row) + [""] * width)[:width] for row in rows]
+    df = pd.DataFrame(padded, columns=header)
+    if df.empty:
+        return []
+
+    df = normalize_roi_frame(df)
+
+    def text(name):
+        return df[name].astype(str) if name in df.columns else ""
+
+    out = pd.DataFrame({
+        "row_num": row_nums,
+        "order_id": text('Order ID'),
+        "valor": df['Valor_Clean'],
+        "data": df['Data_Clean'].dt.strftime('%Y-%m-%d'),
+        "defesa": text('Defesa Gerada'),
+        "valor_ambiguo": df['Valor_Ambiguo'].astype(int),
+    })
+    out = out.astype(object).where(out.notna(), None)
+    return list(out.itertuples(index=False, name=None))
+
+
+class RoiMirror:
+    """Cópia local indexada da planilha de ROI, com consultas SQL por período."""
+
+    def __init__(self, path: str = MIRROR_PATH, ttl: float = SYNC_TTL,
+                 full_refresh_interval: float = FULL_REFRESH_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.full_refresh_interval = full_refresh_interval
+        self._sync_lock = threading.Lock()
+        self._synced_at = 0.0
+        self._init_db()
+
+    # --- Armazenamento ---
+    @contextmanager
+    def _db(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._db() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            if self._meta(conn, "schema_version") != str(SCHEMA_VERSION):
+                for table in ("roi", "roi_daily", "roi_top"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute("DELETE FROM meta")
+                self._set_meta(conn, "schema_version", SCHEMA_VERSION)
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS roi (
+                    row_num INTEGER PRIMARY KEY,
+                    order_id TEXT,
+                    valor REAL,
+                    data TEXT,
+                    defesa TEXT,
+                    valor_ambiguo INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_roi_data ON roi(data)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_roi_valor ON roi(valor)")
+
+            # Rollups: dia '' agrupa linhas sem data válida
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS roi_daily (
+                    day TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    valued INTEGER NOT NULL DEFAULT 0,
+                    total REAL NOT NULL,
+                    max_valor REAL,
+                    ambiguous INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS roi_top (
+                    row_num INTEGER PRIMARY KEY,
+                    order_id TEXT,
+                    valor REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_roi_top_valor ON roi_top(valor)")
+
+            # Espelho criado antes dos rollups: materializa a partir das linhas existentes
+            has_rows = conn.execute("SELECT EXISTS(SELECT 1 FROM roi)").fetchone()[0]
+            has_rollups = conn.execute("SELECT EXISTS(SELECT 1 FROM roi_daily)").fetchone()[0]
+            if has_rows and not has_rollups:
+                self._rebuild_rollups(conn)
+
+    def _meta(self, conn, key: str, default=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, conn, key: str, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    # --- Rollups ---
+    def _apply_rollups(self, conn, records: list):
+        """Soma as linhas novas nos agregados diários e no heap do top-N."""
+        conn.executemany("""
+            INSERT INTO roi_daily (day, count, valued, total, max_valor, ambiguous) VALUES (?, 1, ?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                count = count + 1,
+                valued = valued + excluded.valued,
+                total = total + excluded.total,
+                max_valor = MAX(COALESCE(max_valor, excluded.max_valor), COALESCE(excluded.max_valor, max_valor)),
+                ambiguous = ambiguous + excluded.ambiguous
+        """, [(data or '', int(valor is not None), valor or 0.0, valor, ambiguo)
+              for _, _, valor, data, _, ambiguo in records])
+
+        conn.executemany(
+            "INSERT OR REPLACE INTO roi_top (row_num, order_id, valor) VALUES (?, ?, ?)",
+            [(row_num, order_id, valor) for row_num, order_id, valor, _, _, _ in records if valor is not None]
+        )
+        # Mantém o heap limitado: descarta tudo abaixo dos N maiores
+        conn.execute(
+            "DELETE FROM roi_top WHERE row_num NOT IN (SELECT row_num FROM roi_top ORDER BY valor DESC LIMIT ?)",
+            (ROLLUP_TOP_N,)
+        )
+
+    def _rebuild_rollups(self, conn):
+        conn.execute("DELETE FROM roi_daily")
+        conn.execute("""
+            INSERT INTO roi_daily (day, count, valued, total, max_valor, ambiguous)
+            SELECT COALESCE(data, ''), COUNT(*), COUNT(valor), COALESCE(SUM(valor), 0), MAX(valor), SUM(valor_ambiguo)
+            FROM roi GROUP BY COALESCE(data, '')
+        """)
+        conn.execute("DELETE FROM roi_top")
+        conn.execute(
+            "INSERT INTO roi_top SELECT row_num, order_id, valor FROM roi WHERE valor IS NOT NULL ORDER BY valor DESC LIMIT ?",
+            (ROLLUP_TOP_N,)
+        )
+
+    # --- Sincronização ---
+    def full_sync(self, ws) -> int:
+        """Recopia a planilha inteira. Returns: linhas espelhadas."""
+        values = ws.get(**READ_OPTIONS)
+        header = [str(col) for col in values[0]] if values else []
+        rows = values[1:] if values else []
+        records = _to_records(header, rows, list(range(2, len(rows) + 2)))
+        with self._db() as conn:
+            conn.execute("DELETE FROM roi")
+            conn.executemany("INSERT INTO roi VALUES (?, ?, ?, ?, ?, ?)", records)
+            self._rebuild_rollups(conn)
+            self._set_meta(conn, "header", "\x1f".join(header))
+            self._set_meta(conn, "digest", hashlib.sha1(repr(values).encode("utf-8")).hexdigest())
+            self._set_meta(conn, "full_synced_at", time.time())
+        return len(records)
+
+    def incremental_sync(self, ws) -> int:
+        """Copia apenas as linhas anexadas. Returns: linhas novas."""
+        with self._db() as conn:
+            header = self._meta(conn, "header", "").split("\x1f")
+            digest = self._meta(conn, "digest", "")
+            last_row = conn.execute("SELECT COALESCE(MAX(row_num), 1) FROM roi").fetchone()[0]
+
+        # Linha 1 é o cabeçalho; a próxima linha nova vem logo após a última espelhada
+        next_row = last_row + 1
+        new_rows = ws.get(f"A{next_row}:{_column_letter(len(header))}", **READ_OPTIONS)
+        # Ignora linhas em branco, mas preserva o número real de cada linha na planilha
+        numbered = [(next_row + i, row) for i, row in enumerate(new_rows) if any(cell != "" for cell in row)]
+        if not numbered:
+            return 0
+
+        records = _to_records(header, [row for _, row in numbered], [num for num, _ in numbered])
+        with self._db() as conn:
+            conn.executemany("INSERT INTO roi VALUES (?, ?, ?, ?, ?, ?)", records)
+            self._apply_rollups(conn, records)
+            self._set_meta(conn, "digest", hashlib.sha1((digest + repr(new_rows)).encode("utf-8")).hexdigest())
+        return len(records)
+
+    def sync_if_stale(self, force_full: bool = False) -> bool:
+        """
+        Sincroniza com a planilha se o TTL expirou.
+
+        Returns:
+            True se houve consulta à planilha
+        """
+        with self._sync_lock:
+            now = time.monotonic()
+            if not force_full and self._synced_at and now - self._synced_at < self.ttl:
+                return False
+
+            with self._db() as conn:
+                full_synced_at = float(self._meta(conn, "full_synced_at", 0))
+                has_header = bool(self._meta(conn, "header"))
+
+            ws = get_sheets_client().worksheet(ROI_WORKSHEET, fallback_first=True)
+            if force_full or not has_header or time.time() - full_synced_at >= self.full_refresh_interval:
+                self.full_sync(ws)
+            else:
+                self.incremental_sync(ws)
+            self._synced_at = now
+            return True
+
+    def digest(self) -> str:
+        """Identifica o conteúdo espelhado (base para ETags)."""
+        with self._db() as conn:
+            return self._meta(conn, "digest", "")
+
+    # --- Consultas (filtradas por período; datas em 'YYYY-MM-DD') ---
+    @staticmethod
+    def _where(start: str = None, end: str = None, column: str = "data"):
+        clauses, params = [], []
+        if start:
+            clauses.append(f"{column} >= ?")
+            params.append(start)
+        if end:
+            clauses.append(f"{column} <= ?")
+            params.append(end)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _day_where(self, start: str = None, end: str = None, dated_only: bool = False):
+        """Filtro sobre roi_daily; com período (ou dated_only) ignora o dia '' (sem data)."""
+        where, params = self._where(start, end, column="day")
+        if start or end or dated_only:
+            where = where + (" AND" if where else " WHERE") + " day != ''"
+        return where, params
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        with self._db() as conn:
+            return pd.read_sql_query(sql, conn, params=list(params))
+
+    def date_bounds(self):
+        """(data mínima, data máxima) ou (None, None) se o espelho estiver vazio."""
+        with self._db() as conn:
+            return conn.execute("SELECT MIN(day), MAX(day) FROM roi_daily WHERE day != ''").fetchone()
+
+    def kpis(self, start: str = None, end: str = None) -> dict:
+        """Cards principais a partir dos agregados diários (O(dias))."""
+        where, params = self._day_where(start, end)
+        with self._db() as conn:
+            total, valued, valor_total, maior_valor, ambiguos = conn.execute(
+                "SELECT COALESCE(SUM(count), 0), COALESCE(SUM(valued), 0), COALESCE(SUM(total), 0), "
+                "COALESCE(MAX(max_valor), 0), "
+                f"COALESCE(SUM(ambiguous), 0) FROM roi_daily{where}",
+                params
+            ).fetchone()
+        # Linhas sem valor (vazias/ambíguas) contam no total, mas não na média
+        ticket_medio = valor_total / valued if valued else 0.0
+        return {"total": total, "valor_total": valor_total, "ticket_medio": ticket_medio,
+                "maior_valor": maior_valor, "ambiguos": ambiguos}
+
+    def daily(self, start: str = None, end: str = None) -> pd.DataFrame:
+        where, params = self._day_where(start, end, dated_only=True)
+        return self.query(
+            f'SELECT day AS "Data", total AS "Valor (R$)" FROM roi_daily{where} ORDER BY day', params
+        )
+
+    def top(self, n: int = 5, start: str = None, end: str = None) -> pd.DataFrame:
+        """Maiores valores: do heap materializado; com período, pelo índice de valor."""
+        if not start and not end and n <= ROLLUP_TOP_N:
+            return self.query(
+                'SELECT order_id AS "Order ID", valor AS "Valor (R$)" FROM roi_top ORDER BY valor DESC LIMIT ?', [n]
+            )
+        where, params = self._where(start, end)
+        return self.query(
+            f'SELECT order_id AS "Order ID", valor AS "Valor (R$)" FROM roi{where} ORDER BY valor DESC LIMIT ?',
+            params + [n]
+        )
+
+    def rows(self, start: str = None, end: str = None, limit: int = None) -> pd.DataFrame:
+        """Linhas do período, mais recentes primeiro."""
+        where, params = self._where(start, end)
+        sql = (f'SELECT order_id AS "Order ID", data AS "Data", valor AS "Valor (R$)", defesa AS "Defesa Gerada" '
+               f'FROM roi{where} ORDER BY data DESC, row_num DESC')
+        if limit:
+            sql += " LIMIT ?"
+            params = params + [limit]
+        return self.query(sql, params)
+
+
+_shared_mirror = None
+_shared_lock = threading.Lock()
+
+
+def get_roi_mirror() -> RoiMirror:
+    """Espelho compartilhado do processo."""
+    global _shared_mirror
+    with _shared_lock:
+        if _shared_mirror is None:
+            _shared_mirror = RoiMirror()
+        return _shared_mirror
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if "--sync" not in sys.argv:
+        print("Uso: python roi_mirror.py --sync")
+        sys.exit(1)
+
+    mirror = get_roi_mirror()
+    mirror.sync_if_stale(force_full=True)
+    print(f"✅ Espelho atualizado em {mirror.path}: {mirror.kpis()['total']} linha(s).")
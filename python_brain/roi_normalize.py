@@ -0,0 +1,93 @@
+"""
+Normalização vetorizada das colunas de valor e data da planilha de ROI.
+
+Substitui o `clean_currency` aplicado linha a linha (com a heurística de
+"dividir por 10 se for inteiro > 100") por uma etapa única com operações de
+string do pandas, usada pelo espelho que abastece os dois dashboards.
+
+Regras de valor:
+- Células numéricas são usadas como estão (nunca alteradas).
+- Texto em padrão BR ("R$ 1.234,56", "125,50"): pontos de milhar, vírgula decimal.
+- Texto com ponto decimal ("125.5") ou vários pontos de milhar ("1.234.567").
+- Casos ambíguos são sinalizados em vez de adivinhados:
+  * inteiro numérico > 100 (pode ser 125,5 que o Sheets gravou como 1255);
+  * texto "1.234" (milhar ou decimal?) -> valor fica NaN;
+  * texto em padrão americano ("R$ 1,234.56", "12,345") -> valor fica NaN;
+  * qualquer outro texto não vazio que não vira número ("abc") -> NaN.
+"""
+
+import numpy as np
+import pandas as pd
+
+# "1.234" / "-12.500": um único ponto seguido de exatamente 3 dígitos
+_AMBIGUOUS_DOT = r"-?\d{1,3}\.\d{3}"
+# "1,234.56" / "12,345": vírgula de milhar (padrão americano), com ou sem ponto decimal
+_US_THOUSANDS = r"-?\d{1,3}(?:,\d{3})+(?:\.\d+)?"
+
+
+def normalize_currency(values: pd.Series):
+    """
+    Converte a coluna de valores em float64.
+
+    Returns:
+        (Series float64 com NaN para vazios/ilegíveis/ambíguos de texto,
+         Series bool marcando valores ambíguos)
+    """
+    kinds = values.map(type)
+    is_int = kinds == int
+    is_numeric = is_int | (kinds == float)
+    is_text = kinds == str
+
+    result = pd.Series(np.nan, index=values.index, dtype="float64")
+    result[is_numeric] = values[is_numeric].astype("float64")
+
+    text = (values.where(is_text, "")
+            .astype(str)
+            .str.replace("R$", "", regex=False)
+            .str.replace(r"\s+", "", regex=True))
+    has_comma = text.str.contains(",", regex=False)
+    dots = text.str.count(r"\.")
+
+    # BR (1.234,56): remove milhar e troca a vírgula; vários pontos sem vírgula: só milhar
+    thousands_only = ~has_comma & (dots > 1)
+    normalized = text.where(~(has_comma | thousands_only), text.str.replace(".", "", regex=False))
+    normalized = normalized.str.replace(",", ".", regex=False)
+    parsed = pd.to_numeric(normalized.where(normalized != ""), errors="coerce")
+
+    # "1,234" com três casas decimais também cai aqui: centavos não têm três dígitos
+    us_format = is_text & text.str.fullmatch(_US_THOUSANDS)
+    ambiguous_text = is_text & ((~has_comma & text.str.fullmatch(_AMBIGUOUS_DOT)) | us_format)
+    result[is_text] = parsed[is_text].where(~ambiguous_text[is_text])
+    # Texto preenchido que não virou número também é sinalizado (não some como vazio)
+    ambiguous_text |= is_text & (text != "") & result.isna()
+
+    ambiguous = (is_int & (result > 100)) | ambiguous_text
+    return result, ambiguous.astype(bool)
+
+
+def normalize_dates(values: pd.Series) -> pd.Series:
+    """Datas ISO (2025-11-20) ou BR (20/11/2025) -> datetime64; inválidas viram NaT."""
+    text = values.astype(str).str.strip()
+    iso = pd.to_datetime(text, errors="coerce", format="%Y-%m-%d")
+    br = pd.to_datetime(text.where(iso.isna()), errors="coerce", format="%d/%m/%Y")
+    return iso.fillna(br)
+
+
+def normalize_roi_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adiciona as colunas tipadas ao DataFrame cru da planilha.
+
+    Colunas criadas: Valor_Clean (float64), Valor_Ambiguo (bool), Data_Clean (datetime64)
+    """
+    out = df.copy()
+    if 'Valor (R$)' in out.columns:
+        out['Valor_Clean'], out['Valor_Ambiguo'] = normalize_currency(out['Valor (R$)'])
+    else:
+        out['Valor_Clean'] = np.nan
+        out['Valor_Ambiguo'] = False
+
+    if 'Data' in out.columns:
+        out['Data_Clean'] = normalize_dates(out['Data'])
+    else:
+        out['Data_Clean'] = pd.NaT
+    return out
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Registro de ROI com write-behind (spool local durável + envio em lote).
+
+`log_roi_to_sheet` apenas grava a linha em um SQLite local (commit imediato,
+sobrevive a queda do processo). Uma thread de fundo envia as linhas pendentes
+para o Google Sheets em lotes (`append_rows`) quando o lote enche ou o tempo
+limite estoura, com retry e backoff em caso de falha.
+
+Entrega exatamente-uma-vez:
+- Cada pedido entra no spool uma única vez (order_id é chave única).
+- Antes de enviar, o lote é marcado como 'inflight' com um lease. Se o envio
+  falhar (ou o processo cair no meio), o lote é reconciliado contra a coluna
+  "Order ID" da planilha: o que já chegou é marcado como enviado, o resto volta
+  para a fila. Vários processos podem compartilhar o mesmo spool.
+
+Como usar (drenar o spool manualmente):
+    python roi_spool.py --flush
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import sqlite3
+import threading
+import traceback
+from contextlib import contextmanager
+
+from sheets_client import ROI_HEADER, ROI_WORKSHEET, get_sheets_client
+from tracing import span
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SPOOL_PATH = os.path.join(SCRIPT_DIR, "roi_spool.db")
+
+STATUS_PENDING = "pending"
+STATUS_INFLIGHT = "inflight"
+STATUS_SENT = "sent"
+
+# Lote 'inflight' mais antigo que isso é considerado abandonado (falha ou queda)
+LEASE_SECONDS = 120
+
+
+class SheetsRoiSink:
+    """Destino do spool: a aba de dados do ROI no Google Sheets."""
+
+    def __init__(self, spreadsheet_id: str):
+        self.spreadsheet_id = spreadsheet_id
+
+    def worksheet(self):
+        # Cliente compartilhado: aba em cache + cota da API respeitada; cria a aba se não existir
+        return get_sheets_client().worksheet(ROI_WORKSHEET, self.spreadsheet_id, create_header=ROI_HEADER)
+
+    def append_rows(self, rows):
+        self.worksheet().append_rows(rows)
+
+    def existing_order_ids(self) -> set:
+        return set(self.worksheet().col_values(1)[1:])
+
+
+class RoiSpool:
+    """Fila durável em SQLite com flusher em lote para o Google Sheets."""
+
+    def __init__(self, sink, path: str = SPOOL_PATH, batch_size: int = None, flush_interval: float = None):
+        self.sink = sink
+        self.path = path
+        self.batch_size = batch_size or int(os.getenv("ROI_FLUSH_BATCH_SIZE", "50"))
+        self.flush_interval = flush_interval or float(os.getenv("ROI_FLUSH_INTERVAL", "5"))
+        # Serializa apenas os envios; gravações no spool não esperam a rede
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._backoff = 0.0
+        self._init_db()
+
+    # --- Armazenamento ---
+    @contextmanager
+    def _db(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._db() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS roi_rows (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    order_id TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    batch_id TEXT,
+                    leased_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    sent_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_roi_rows_status ON roi_rows(status, id)")
+
+    def enqueue(self, row: list) -> bool:
+        """
+        Grava a linha no spool (commit imediato) e agenda o envio.
+
+        Returns:
+            True se a linha foi aceita, False se o pedido já estava no spool
+        """
+        with self._db() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO roi_rows (order_id, payload, created_at) VALUES (?, ?, ?)",
+                (str(row[0]), json.dumps(row, ensure_ascii=False), time.time())
+            )
+            accepted = cursor.rowcount == 1
+            pending = conn.execute("SELECT COUNT(*) FROM roi_rows WHERE status = ?", (STATUS_PENDING,)).fetchone()[0]
+
+        self.start()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        return accepted
+
+    def pending_count(self) -> int:
+        with self._db() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM roi_rows WHERE status != ?", (STATUS_SENT,)
+            ).fetchone()[0]
+
+    # --- Envio ---
+    def _reconcile_expired(self):
+        """Resolve lotes cujo envio falhou ou foi interrompido, sem duplicar linhas."""
+        expired_before = time.time() - LEASE_SECONDS
+        with self._db() as conn:
+            expired = conn.execute(
+                "SELECT id, order_id FROM roi_rows WHERE status = ? AND leased_at < ?",
+                (STATUS_INFLIGHT, expired_before)
+            ).fetchall()
+        if not expired:
+            return
+
+        # Leitura feita fora da transação para não travar o spool durante a rede
+        delivered = self.sink.existing_order_ids()
+        now = time.time()
+        with self._db() as conn:
+            for row_id, order_id in expired:
+                if order_id in delivered:
+                    conn.execute(
+                        "UPDATE roi_rows SET status = ?, sent_at = ? WHERE id = ? AND status = ? AND leased_at < ?",
+                        (STATUS_SENT, now, row_id, STATUS_INFLIGHT, expired_before)
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE roi_rows SET status = ?, batch_id = NULL, leased_at = NULL "
+                        "WHERE id = ? AND status = ? AND leased_at < ?",
+                        (STATUS_PENDING, row_id, STATUS_INFLIGHT, expired_before)
+                    )
+
+    def _lease_batch(self):
+        """Reserva atomicamente um lote pendente (seguro entre processos)."""
+        batch_id = uuid.uuid4().hex
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            batch = conn.execute(
+                "SELECT id, payload FROM roi_rows WHERE status = ? ORDER BY id LIMIT ?",
+                (STATUS_PENDING, self.batch_size)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE roi_rows SET status = ?, batch_id = ?, leased_at = ?, attempts = attempts + 1 WHERE id = ?",
+                [(STATUS_INFLIGHT, batch_id, time.time(), row_id) for row_id, _ in batch]
+            )
+        return batch_id, [json.loads(payload) for _, payload in batch]
+
+    def flush_once(self) -> int:
+        """
+        Envia um lote de linhas pendentes.
+
+        Returns:
+            Quantidade de linhas entregues neste lote
+        """
+        with self._flush_lock:
+            self._reconcile_expired()
+
+            batch_id, rows = self._lease_batch()
+            if not rows:
+                return 0
+
+            # Se falhar aqui, o lote fica 'inflight' e é reconciliado quando o lease expirar
+            with span("sheets_flush"):
+                self.sink.append_rows(rows)
+
+            with self._db() as conn:
+                conn.execute(
+                    "UPDATE roi_rows SET status = ?, sent_at = ? WHERE batch_id = ?",
+                    (STATUS_SENT, time.time(), batch_id)
+                )
+
+        print(f"✅ {len(rows)} linha(s) de ROI enviadas ao Google Sheets em lote.", file=sys.stderr)
+        return len(rows)
+
+    def flush_all(self) -> int:
+        """Drena o spool (usado no encerramento e pelo comando --flush)."""
+        total = 0
+        while True:
+            sent = self.flush_once()
+            if not sent:
+                return total
+            total += sent
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(timeout=max(self.flush_interval, self._backoff))
+            self._wakeup.clear()
+            try:
+                self.flush_all()
+                self._backoff = 0.0
+            except Exception as e:
+                # Backoff exponencial até 5 minutos; as linhas continuam seguras no spool
+                self._backoff = min(max(self._backoff * 2, self.flush_interval), 300.0)
+                print(f"❌ Falha ao enviar lote de ROI (nova tentativa em {self._backoff:.0f}s): {str(e)}", file=sys.stderr)
+                print(traceback.format_exc(), file=sys.stderr)
+
+    def start(self):
+        """Inicia o flusher de fundo (idempotente)."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="roi-spool-flusher", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def close(self):
+        """Para o flusher e tenta uma última drenagem; o que falhar fica no spool."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self.flush_all()
+        except Exception as e:
+            print(f"⚠️ {self.pending_count()} linha(s) de ROI continuam no spool: {str(e)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if "--flush" not in sys.argv:
+        print("Uso: python roi_spool.py --flush")
+        sys.exit(1)
+
+    spreadsheet_id = os.getenv("SPREADSHEET_ID")
+    if not spreadsheet_id:
+        print("❌ SPREADSHEET_ID não configurado no .env")
+        sys.exit(1)
+
+    spool = RoiSpool(SheetsRoiSink(spreadsheet_id))
+    print(f"📤 {spool.flush_all()} linha(s) enviadas. Pendentes: {spool.pending_count()}")
@@ -0,0 +1,201 @@
+"""
+Acesso compartilhado ao Google Sheets (planilha de ROI).
+
+Todos os componentes que tocam a planilha (cérebro, dashboards e scripts de
+manutenção) usam este módulo em vez de criar o próprio cliente gspread:
+
+- O cliente autenticado, as planilhas e as abas ficam em cache no processo,
+  reaproveitando a mesma sessão HTTP.
+- Toda requisição HTTP do gspread passa por um token bucket de
+  SHEETS_REQUESTS_PER_MINUTE. O bucket é do processo: cérebro, dashboard Flask
+  e Streamlit têm cada um o seu, então a soma deles pode passar da cota da
+  API. Para dividir a cota, configure um valor menor em cada processo; os 429
+  que escaparem ainda são repetidos.
+- 429 é repetido com backoff exponencial em qualquer requisição (o Sheets
+  rejeita antes de executar). 5xx só é repetido em leituras (GET): um POST
+  como o `values:append` do append_rows pode ter sido gravado antes do erro,
+  e repetir duplicaria linhas. A falha volta ao chamador (o spool de ROI
+  reconcilia o lote pela coluna "Order ID").
+- Contadores de chamadas, esperas por cota e retries ficam em `counters()`.
+
+Como usar:
+    from sheets_client import get_sheets_client
+    ws = get_sheets_client().worksheet()
+"""
+
+import os
+import sys
+import time
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Fallback usado pelos dashboards e scripts quando SPREADSHEET_ID não está no .env
+DEFAULT_SPREADSHEET_ID = "14qM34cpPSK8rPcIfjQhY1kI1ysJBAdkaGa_xGX3TKao"
+ROI_WORKSHEET = "Relatório_ROI_iFood"
+ROI_HEADER = ["Order ID", "Valor (R$)", "Data", "Defesa Gerada"]
+
+# Cota padrão da API do Sheets: 60 requisições por minuto por usuário
+REQUESTS_PER_MINUTE = int(os.getenv("SHEETS_REQUESTS_PER_MINUTE", "60"))
+MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "5"))
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Métodos seguros de repetir após um 5xx (sem efeito colateral no servidor)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def find_credentials() -> str:
+    """Procura o client_secret.json nos locais usados pelo projeto."""
+    possible_paths = [
+        os.path.join(SCRIPT_DIR, 'client_secret.json'),
+        'client_secret.json',
+        os.path.join('python_brain', 'client_secret.json'),
+        '../python_brain/client_secret.json'
+    ]
+    for path in possible_paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def should_retry(method: str, status_code: int) -> bool:
+    """429 sempre (requisição não executada); 5xx só em métodos idempotentes."""
+    if status_code == 429:
+        return True
+    return status_code in RETRY_STATUS and method.upper() in IDEMPOTENT_METHODS
+
+
+class TokenBucket:
+    """Token bucket simples (por processo): `rate_per_minute` fichas, reposição contínua."""
+
+    def __init__(self, rate_per_minute: int):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.fill_rate = rate_per_minute / 60.0
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """
+        Consome uma ficha, bloqueando até haver cota.
+
+        Returns:
+            True se precisou esperar (chamada limitada pela cota)
+        """
+        throttled = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.fill_rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return throttled
+                wait = (1 - self.tokens) / self.fill_rate
+            throttled = True
+            time.sleep(wait)
+
+
+class SheetsClient:
+    """Cliente gspread compartilhado, com cache de abas e orçamento de cota."""
+
+    def __init__(self, creds_path: str = None, requests_per_minute: int = REQUESTS_PER_MINUTE,
+                 max_retries: int = MAX_RETRIES):
+        self.creds_path = creds_path
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(requests_per_minute)
+        self._lock = threading.RLock()
+        self._gc = None
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._counters = {"calls": 0, "throttled": 0, "retries": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def counters(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def _install_quota_guard(self, session):
+        """Envolve a sessão HTTP do gspread: cota e contagem em toda requisição, retry conforme should_retry."""
+        send = session.request
+
+        def request(method, url, *args, **kwargs):
+            for attempt in range(self.max_retries + 1):
+                if self._bucket.acquire():
+                    self._count("throttled")
+                self._count("calls")
+                response = send(method, url, *args, **kwargs)
+                if not should_retry(method, response.status_code) or attempt == self.max_retries:
+                    return response
+                self._count("retries")
+                delay = min(2 ** attempt, 32)
+                print(f"⚠️ Sheets respondeu {response.status_code}. Nova tentativa em {delay}s...", file=sys.stderr)
+                time.sleep(delay)
+
+        session.request = request
+
+    def client(self):
+        """Cliente gspread autenticado (criado uma vez por processo)."""
+        with self._lock:
+            if self._gc is None:
+                import gspread
+                creds_path = self.creds_path or find_credentials()
+                if not creds_path:
+                    raise FileNotFoundError("Arquivo client_secret.json não encontrado.")
+                gc = gspread.service_account(filename=creds_path)
+                # gspread >= 6 guarda a sessão em http_client; versões anteriores, no próprio cliente
+                http_client = getattr(gc, "http_client", gc)
+                self._install_quota_guard(http_client.session)
+                self._gc = gc
+            return self._gc
+
+    def spreadsheet(self, spreadsheet_id: str = None):
+        spreadsheet_id = spreadsheet_id or os.getenv("SPREADSHEET_ID") or DEFAULT_SPREADSHEET_ID
+        with self._lock:
+            if spreadsheet_id not in self._spreadsheets:
+                self._spreadsheets[spreadsheet_id] = self.client().open_by_key(spreadsheet_id)
+            return self._spreadsheets[spreadsheet_id]
+
+    def worksheet(self, title: str = ROI_WORKSHEET, spreadsheet_id: str = None,
+                  create_header: list = None, fallback_first: bool = False):
+        """
+        Aba da planilha, em cache.
+
+        Args:
+            title: Nome da aba
+            spreadsheet_id: ID da planilha (padrão: SPREADSHEET_ID do .env)
+            create_header: Se informado, cria a aba com esse cabeçalho caso não exista
+            fallback_first: Se a aba não existir, usa a primeira aba da planilha
+        """
+        import gspread
+        spreadsheet = self.spreadsheet(spreadsheet_id)
+        key = (spreadsheet.id, title)
+        with self._lock:
+            if key not in self._worksheets:
+                try:
+                    ws = spreadsheet.worksheet(title)
+                except gspread.exceptions.WorksheetNotFound:
+                    if create_header:
+                        ws = spreadsheet.add_worksheet(title=title, rows=1000, cols=10)
+                        ws.append_row(create_header)
+                    elif fallback_first:
+                        ws = spreadsheet.sheet1
+                    else:
+                        raise
+                self._worksheets[key] = ws
+            return self._worksheets[key]
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_sheets_client() -> SheetsClient:
+    """Cliente compartilhado do processo."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = SheetsClient()
+        return _shared_client
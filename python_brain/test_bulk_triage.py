@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Triagem em lote: mesmas decisões que o cérebro nos casos de test_cases/.
+
+O cérebro roda com Vision, chat, RAG, Telegram e Sheets trocados por fakes que
+só registram a chamada (defesa por template, sem LLM):
+    python test_bulk_triage.py
+"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import reimbursement_brain as brain
+from bulk_triage import BUCKET_CHAT, BUCKET_DECIDED, BUCKET_INCOMPLETE, BUCKET_VISION, triage
+
+CASES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_cases")
+
+
+def load_cases() -> list:
+    cases = []
+    for name in sorted(os.listdir(CASES_DIR)):
+        if name.endswith(".json"):
+            with open(os.path.join(CASES_DIR, name), encoding="utf-8") as f:
+                case = json.load(f)
+            case.pop("expected_result", None)
+            cases.append(case)
+    return cases
+
+
+def run_brain(cases: list) -> list:
+    """(resultado, etapas caras chamadas) de cada caso."""
+    calls = []
+    fakes = {
+        "analyze_image_evidence": lambda **kwargs: calls.append("vision") or {
+            "verdict": "ANALISE_HUMANA", "confidence": 0.5, "reasoning": "fake", "red_flags": []},
+        "analyze_chat_context": lambda **kwargs: calls.append("chat") or {
+            "has_chat": True, "findings": [], "sentiment": "neutral", "red_flags": [], "engine": "rules"},
+        "get_policy_answer": lambda query: "Regra oficial (fake).",
+        "send_telegram_approval": lambda data: {"sent": False},
+        "log_roi_to_sheet": lambda data: True,
+        "llm_allowed": lambda stage: False,
+    }
+    originals = {name: getattr(brain, name) for name in fakes}
+    for name, fake in fakes.items():
+        setattr(brain, name, fake)
+    try:
+        results = []
+        for case in cases:
+            calls.clear()
+            results.append((brain.process_refund_request(json.dumps(case)), list(calls)))
+        return results
+    finally:
+        for name, original in originals.items():
+            setattr(brain, name, original)
+
+
+def test_triage_agrees_with_brain():
+    cases = load_cases()
+    frame = triage(cases)["frame"]
+    for i, (result, calls) in enumerate(run_brain(cases)):
+        bucket, action, order_id = frame.at[i, "bucket"], frame.at[i, "action"], cases[i]["order_id"]
+        if bucket == BUCKET_DECIDED:
+            assert result["action"] == action and not calls, (order_id, action, result["action"], calls)
+        elif bucket == BUCKET_VISION:
+            assert calls == ["vision"], (order_id, calls)
+        elif bucket == BUCKET_CHAT:
+            assert calls == ["chat"], (order_id, calls)
+        else:
+            assert bucket == BUCKET_INCOMPLETE
+            assert result["action"] in ("PENDING", "ERROR") and not calls, (order_id, result["action"], calls)
+
+
+def test_every_bucket_is_exercised():
+    counts = triage(load_cases())["counts"]
+    assert all(counts[bucket] for bucket in (BUCKET_DECIDED, BUCKET_VISION, BUCKET_CHAT, BUCKET_INCOMPLETE)), counts
+
+
+def test_anomalous_gps_does_not_supply_arrival():
+    # Sem actual_arrival_at; o trajeto "chega" atrasado, mas com um salto impossível no meio
+    logs = [
+        {"timestamp": "2025-11-20T19:40:00Z", "latitude": -23.60, "longitude": -46.70},
+        {"timestamp": "2025-11-20T19:41:00Z", "latitude": -23.50, "longitude": -46.60},
+        {"timestamp": "2025-11-20T20:00:00Z", "latitude": -23.5614, "longitude": -46.6559},
+        {"timestamp": "2025-11-20T20:10:00Z", "latitude": -23.5614, "longitude": -46.6559},
+    ]
+    case = {
+        "order_id": "GPS-SPOOF",
+        "reason_code": "ITEM_NOT_RECEIVED",
+        "financial_impact": 90.0,
+        "timestamps": {"eta_max": "2025-11-20T19:30:00Z"},
+        "delivery_evidence": {"gps_logs": logs, "delivery_pin_validated": False,
+                              "address_latitude": -23.5614, "address_longitude": -46.6559},
+        "chat_history": [],
+    }
+    frame = triage([case])["frame"]
+    assert frame.at[0, "bucket"] == BUCKET_INCOMPLETE, frame.at[0, "rule"]
+    (result, calls), = run_brain([case])
+    assert result["action"] == "PENDING" and not calls, (result, calls)
+    assert result["gps_analysis"]["verdict"] == "ANOMALOUS", result
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) da triagem em lote.")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Cache incremental do chat: retry não chama o Gemini, mensagens novas vão sozinhas.
+
+Usa um LLM falso e SQLites temporários (cache do chat e consumo de tokens):
+    python test_chat_cache.py
+"""
+
+import os
+import sys
+import json
+import tempfile
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import clients
+import llm_usage
+import reimbursement_brain as brain
+from chat_cache import ChatAnalysisCache, compact_history, prefix_hashes
+
+ORDER = {"order_id": "CHAT-1", "reason_code": "ITEM_NOT_RECEIVED"}
+
+
+class FakeLLM:
+    """Guarda os prompts recebidos e responde uma análise fixa."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=json.dumps({
+            "has_chat": True,
+            "informal_agreement": {"exists": False, "details": ""},
+            "customer_absent": {"likely": False, "evidence": ""},
+            "contact_attempts": 0,
+            "sentiment": "neutral",
+            "findings": [],
+            "red_flags": [],
+            "summary": f"RESUMO-{len(self.prompts)}",
+        }), usage_metadata={"input_tokens": 10, "output_tokens": 5})
+
+
+def message(i, sender="customer"):
+    return {"sender": sender, "text": f"Mensagem {i}: o pedido vai demorar?", "timestamp": f"2025-11-20T19:{i:02d}:00Z"}
+
+
+def with_fakes(fn):
+    """Roda fn(llm) com LLM falso e stores temporários; restaura o cérebro ao final."""
+    workdir = tempfile.mkdtemp()
+    llm = FakeLLM()
+    cache = ChatAnalysisCache(os.path.join(workdir, "chat_cache.db"))
+    original_cache, original_store = brain.get_chat_cache, llm_usage._shared_store
+    clients.get_registry().register("llm", lambda registry: llm)
+    brain.get_chat_cache = lambda: cache
+    llm_usage._shared_store = llm_usage.UsageStore(os.path.join(workdir, "llm_usage.db"))
+    try:
+        return fn(llm)
+    finally:
+        clients.get_registry().register("llm", clients._llm)
+        brain.get_chat_cache = original_cache
+        llm_usage._shared_store = original_store
+
+
+def test_lookup_reuses_only_prefix():
+    cache = ChatAnalysisCache(os.path.join(tempfile.mkdtemp(), "chat_cache.db"))
+    chat = [message(1), message(2)]
+    cache.store("O1", prefix_hashes(chat, "v"), {"sentiment": "neutral"}, "resumo")
+
+    longer = prefix_hashes(chat + [message(3)], "v")
+    previous = cache.lookup("O1", longer)
+    assert previous["message_count"] == 2 and previous["summary"] == "resumo", previous
+
+    # Mensagem antiga editada (ou outro seed, ex.: versão do prompt) não é prefixo
+    edited = prefix_hashes([message(9), message(2), message(3)], "v")
+    assert cache.lookup("O1", edited) is None
+    assert cache.lookup("O1", prefix_hashes(chat, "v2")) is None
+    assert cache.lookup("O1", longer[:1]) is None
+
+
+def test_retry_does_not_call_llm():
+    def run(llm):
+        chat = [message(1), message(2, "driver")]
+        first = brain.analyze_chat_context(chat, ORDER)
+        again = brain.analyze_chat_context(list(chat), ORDER)
+        assert len(llm.prompts) == 1, llm.prompts
+        assert again == first, (again, first)
+    with_fakes(run)
+
+
+def test_new_messages_sent_with_previous_summary():
+    def run(llm):
+        chat = [message(1), message(2, "driver")]
+        brain.analyze_chat_context(chat, ORDER)
+        brain.analyze_chat_context(chat + [message(3)], ORDER)
+        assert len(llm.prompts) == 2, llm.prompts
+        prompt = llm.prompts[1]
+        assert "RESUMO-1" in prompt and "NOVAS MENSAGENS DO CHAT" in prompt
+        assert "Mensagem 3" in prompt
+        assert "Mensagem 1" not in prompt and "Mensagem 2" not in prompt
+    with_fakes(run)
+
+
+def test_compact_history_keeps_recent_within_budget():
+    messages = [message(i) for i in range(40)]
+    older, recent = compact_history(messages, budget=60)
+    assert "Mensagem 39" in recent
+    assert "Mensagem 0:" not in recent
+    assert older.startswith(f"{40 - len(recent.splitlines())} mensagem(ns) anteriores"), older
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do cache incremental do chat.")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Pré-classificador do chat: acordo informal só com pedido real e confirmação.
+
+Reclamações que citam a portaria, confirmações vagas ("ok") e pedidos sem
+resposta do entregador não podem fechar a decisão sem o Gemini.
+
+    python test_chat_rules.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chat_rules import MIN_CONFIDENCE, classify_chat
+
+
+def chat(*messages):
+    return [{"sender": sender, "text": text} for sender, text in messages]
+
+
+def test_confirmed_request_is_agreement():
+    result = classify_chat(chat(
+        ("customer", "Não vou conseguir descer. Pode deixar com o porteiro?"),
+        ("driver", "Sem problemas! Vou deixar na portaria."),
+    ))
+    assert result["informal_agreement"]["exists"], result
+    assert result["confidence"] >= MIN_CONFIDENCE, result
+
+
+def test_complaint_mentioning_place_is_not_agreement():
+    result = classify_chat(chat(
+        ("customer", "Meu pedido não foi entregue na portaria, cadê?"),
+        ("driver", "Ok, vou verificar"),
+    ))
+    assert not result["informal_agreement"]["exists"], result
+    assert result["confidence"] < MIN_CONFIDENCE, result
+
+
+def test_negated_request_is_not_agreement():
+    result = classify_chat(chat(
+        ("customer", "Nunca pedi para deixar com o vizinho!"),
+        ("driver", "Combinado, deixei com o vizinho."),
+    ))
+    assert not result["informal_agreement"]["exists"], result
+
+
+def test_bare_ok_does_not_confirm():
+    result = classify_chat(chat(
+        ("customer", "Pode deixar na portaria"),
+        ("driver", "Ok"),
+    ))
+    assert result["informal_agreement"]["exists"], result
+    assert result["confidence"] < MIN_CONFIDENCE, result
+
+
+def test_unconfirmed_agreement_goes_to_llm_even_with_absence():
+    result = classify_chat(chat(
+        ("customer", "Deixa na portaria"),
+        ("driver", "Cheguei, cliente não atende"),
+        ("driver", "Tentei ligar 2 vezes"),
+        ("driver", "Sem resposta"),
+    ))
+    assert result["customer_absent"]["likely"], result
+    assert result["confidence"] < MIN_CONFIDENCE, result
+
+
+def timed_chat(*messages):
+    return [{"sender": sender, "text": text, "timestamp": f"2025-11-20T19:{minute:02d}:00Z"}
+            for minute, sender, text in messages]
+
+
+def test_routine_status_then_complaint_is_not_absence():
+    result = classify_chat(timed_chat(
+        (0, "restaurant", "Preparando seu pedido"),
+        (10, "driver", "Saí para entrega"),
+        (15, "driver", "Estou a caminho"),
+        (25, "driver", "Entregue! Bom apetite"),
+        (27, "customer", "Não recebi meu pedido"),
+    ))
+    assert not result["customer_absent"]["likely"], result
+    assert result["confidence"] < MIN_CONFIDENCE, result
+
+
+def test_message_volume_alone_is_not_absence():
+    result = classify_chat(timed_chat(
+        (0, "driver", "Oi, tudo bem?"),
+        (5, "driver", "Estou na frente do prédio"),
+        (12, "driver", "Qual o número do apartamento?"),
+    ))
+    assert not result["customer_absent"]["likely"], result
+
+
+def test_prompt_complaint_cancels_absence():
+    result = classify_chat(timed_chat(
+        (0, "driver", "Cheguei, cliente não atende"),
+        (3, "driver", "Tentei ligar 2 vezes"),
+        (6, "driver", "Sem resposta"),
+        (8, "customer", "Estou aqui e não recebi nada, isso é um problema"),
+    ))
+    assert not result["customer_absent"]["likely"], result
+
+
+def test_explicit_absence_still_detected():
+    result = classify_chat(timed_chat(
+        (0, "driver", "Cheguei no endereço. Onde você está?"),
+        (4, "driver", "Tentei ligar 3 vezes mas não atende"),
+        (10, "driver", "Não consegui entregar, cliente não atendeu"),
+        (45, "customer", "Não recebi meu pedido! Quero reembolso."),
+    ))
+    assert result["customer_absent"]["likely"], result
+    assert result["confidence"] >= MIN_CONFIDENCE, result
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do pré-classificador do chat.")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Risco do cliente: score só com total de pedidos, e record/assess idempotentes.
+
+Cada teste usa um SQLite temporário:
+    python test_customer_risk.py
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from customer_risk import RISK_HIGH, RISK_LOW, RISK_UNKNOWN, CustomerRiskStore
+
+
+def new_store() -> CustomerRiskStore:
+    return CustomerRiskStore(os.path.join(tempfile.mkdtemp(), "customer_risk.db"))
+
+
+def test_no_snapshot_is_unknown():
+    store = new_store()
+    for i in range(3):
+        store.record("C1", f"O{i}", "ACEITAR_CANCELAMENTO")
+    risk = store.assess("C1", "O-NOVO")
+    assert risk["level"] == RISK_UNKNOWN, risk
+    assert risk["score"] is None, risk
+    assert risk["accepted"] == 3, risk
+
+
+def test_snapshot_gives_rate():
+    store = new_store()
+    low = store.assess("C1", "O1", {"total_orders": 50, "refund_requests": 1})
+    assert low["level"] == RISK_LOW, low
+    high = store.assess("C2", "O2", {"total_orders": 6, "refund_requests": 4})
+    assert high["level"] == RISK_HIGH, high
+
+
+def test_refunds_seen_here_raise_stale_snapshot():
+    store = new_store()
+    store.assess("C1", "O0", {"total_orders": 8, "refund_requests": 0})
+    for i in range(4):
+        store.record("C1", f"O{i}", "ACEITAR_CANCELAMENTO")
+    risk = store.assess("C1", "O-NOVO")
+    assert risk["refund_requests"] == 4, risk
+    assert risk["level"] == RISK_HIGH, risk
+
+
+def test_record_is_idempotent():
+    store = new_store()
+    store.record("C1", "O1", "CONTESTAR")
+    store.record("C1", "O1", "CONTESTAR")
+    assert store.stats()["requests"] == 1
+    # Troca de ação move só o contador correspondente
+    store.record("C1", "O1", "ACEITAR_CANCELAMENTO")
+    risk = store.assess("C1", "O2")
+    assert (risk["refund_requests"], risk["accepted"], risk["contested"]) == (1, 1, 0), risk
+
+
+def test_current_order_excluded_from_assess():
+    store = new_store()
+    store.assess("C1", "O1", {"total_orders": 10, "refund_requests": 0})
+    store.record("C1", "O1", "ACEITAR_CANCELAMENTO")
+    # Retry do mesmo pedido não conta o próprio pedido
+    retry = store.assess("C1", "O1")
+    assert (retry["accepted"], retry["refund_requests"]) == (0, 0), retry
+    other = store.assess("C1", "O2")
+    assert (other["accepted"], other["refund_requests"]) == (1, 1), other
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do risco do cliente.")
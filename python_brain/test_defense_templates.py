@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Templates de defesa: o fechamento da CONTESTAR acompanha a evidência que decidiu o pedido
+(o reforço do PIN só aparece quando o PIN foi validado).
+
+As etapas externas do cérebro são trocadas por fakes:
+    python test_defense_templates.py
+"""
+
+import os
+import sys
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import llm_usage
+import reimbursement_brain as brain
+from defense_templates import CONTESTAR_CLOSINGS, DEFAULT_CONTESTAR_CLOSING, render_defense
+from policy_cache import QUERY_CUSTOMER_ABSENT, QUERY_LATE_DELIVERY, QUERY_PIN
+
+PIN_CLOSING = CONTESTAR_CLOSINGS[QUERY_PIN]
+ADDRESS = (-23.5614, -46.6559)
+START = datetime(2025, 11, 20, 19, 30, tzinfo=timezone.utc)
+FIELDS = {
+    "situation": "Situação.",
+    "evidence": "Evidência.",
+    "rule_official": "Regra oficial (fake).",
+    "order_id": "DEF-1",
+    "customer_claim": "ITEM_NOT_RECEIVED",
+}
+
+
+def with_fakes(fn, **extra):
+    """Roda fn com Sheets, Telegram, política e store de tokens trocados por fakes."""
+    workdir = tempfile.mkdtemp()
+    fakes = {
+        "get_policy_answer": lambda query: "Regra oficial (fake).",
+        "send_telegram_approval": lambda data: {"sent": False},
+        "log_roi_to_sheet": lambda data: True,
+        **extra,
+    }
+    originals = {name: getattr(brain, name) for name in fakes}
+    original_store = llm_usage._shared_store
+    llm_usage._shared_store = llm_usage.UsageStore(os.path.join(workdir, "llm_usage.db"))
+    for name, fake in fakes.items():
+        setattr(brain, name, fake)
+    try:
+        return fn()
+    finally:
+        llm_usage._shared_store = original_store
+        for name, original in originals.items():
+            setattr(brain, name, original)
+
+
+def order(**overrides) -> str:
+    data = {
+        "order_id": "DEF-1",
+        "reason_code": "ITEM_NOT_RECEIVED",
+        "financial_impact": 80.0,
+        "timestamps": {"eta_max": "2025-11-20T20:00:00Z", "actual_arrival_at": "2025-11-20T19:50:00Z"},
+        "delivery_evidence": {"gps_logs": [], "delivery_pin_validated": False},
+        "chat_history": [],
+    }
+    data.update(overrides)
+    return json.dumps(data)
+
+
+def waited_route() -> list:
+    """Aproxima do endereço, espera 8 minutos na porta e vai embora."""
+    def point(minute, lat, lon):
+        return {"timestamp": (START + timedelta(minutes=minute)).isoformat().replace("+00:00", "Z"),
+                "latitude": lat, "longitude": lon}
+    logs = [point(i, ADDRESS[0] - 0.0006 * (10 - i), ADDRESS[1]) for i in range(10)]
+    logs += [point(10 + i, ADDRESS[0] + 0.00001 * (i % 2), ADDRESS[1]) for i in range(9)]
+    logs += [point(18 + i, ADDRESS[0], ADDRESS[1] + 0.0006 * i) for i in range(1, 6)]
+    return logs
+
+
+def test_closing_follows_evidence():
+    assert render_defense("CONTESTAR", QUERY_PIN, **FIELDS).endswith(PIN_CLOSING)
+    absent = render_defense("CONTESTAR", QUERY_CUSTOMER_ABSENT, **FIELDS)
+    assert absent.endswith(CONTESTAR_CLOSINGS[QUERY_CUSTOMER_ABSENT]) and "PIN" not in absent, absent
+    assert render_defense("CONTESTAR", None, **FIELDS).endswith(DEFAULT_CONTESTAR_CLOSING)
+    # O ACEITAR_CANCELAMENTO mantém o próprio fechamento
+    accepted = render_defense("ACEITAR_CANCELAMENTO", QUERY_LATE_DELIVERY, **FIELDS)
+    assert "PIN" not in accepted and accepted.endswith("situações semelhantes."), accepted
+
+
+def test_pin_defense_reinforces_pin():
+    result = with_fakes(lambda: brain.process_refund_request(order(delivery_evidence={
+        "gps_logs": [], "delivery_pin_validated": True, "pin_validated_at": "2025-11-20T19:50:00Z",
+    })))
+    assert result["action"] == "CONTESTAR" and result["defense_renderer"] == "template", result
+    assert result["generated_defense"].endswith(PIN_CLOSING), result["generated_defense"]
+
+
+def test_gps_waited_defense_has_no_pin_closing():
+    result = with_fakes(lambda: brain.process_refund_request(order(
+        timestamps={"eta_max": "2025-11-20T20:00:00Z"},
+        delivery_evidence={"gps_logs": waited_route(), "delivery_pin_validated": False,
+                           "address_latitude": ADDRESS[0], "address_longitude": ADDRESS[1]},
+    )))
+    assert result["action"] == "CONTESTAR" and result["defense_renderer"] == "template", result
+    assert "PIN" not in result["generated_defense"], result["generated_defense"]
+    assert result["generated_defense"].endswith(CONTESTAR_CLOSINGS[QUERY_CUSTOMER_ABSENT])
+
+
+def test_budget_downgraded_defense_has_no_pin_closing():
+    # Cliente ausente pelas regras do chat; sem orçamento para a defesa, o template vale
+    result = with_fakes(lambda: brain.process_refund_request(order(chat_history=[
+        {"sender": "driver", "text": "Cheguei no endereço. Onde você está?", "timestamp": "2025-11-20T19:50:00Z"},
+        {"sender": "driver", "text": "Tentei ligar 3 vezes mas não atende", "timestamp": "2025-11-20T19:54:00Z"},
+        {"sender": "driver", "text": "Não consegui entregar, cliente não atendeu", "timestamp": "2025-11-20T20:00:00Z"},
+    ])), llm_allowed=lambda stage: stage != llm_usage.STAGE_DEFENSE)
+    assert result["action"] == "CONTESTAR" and result["defense_renderer"] == "template", result
+    assert "PIN" not in result["generated_defense"], result["generated_defense"]
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) dos templates de defesa.")
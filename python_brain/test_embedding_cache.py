@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Cache de embeddings: acerto e falta por (modelo, tipo, texto), despejo LRU no put_many
+e o modelo embrulhado chamado só para os textos que faltam.
+
+Usa SQLites temporários e um modelo de embeddings fake:
+    python test_embedding_cache.py
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import embedding_cache
+from embedding_cache import EmbeddingCache, CachedEmbeddings, cache_key, KIND_QUERY, KIND_DOCUMENT
+
+
+class FakeEmbeddings:
+    """Vetor derivado do tamanho do texto; anota cada chamada."""
+    model = "fake-embedding-001"
+
+    def __init__(self):
+        self.document_calls = []
+        self.query_calls = []
+
+    def embed_documents(self, texts):
+        self.document_calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        self.query_calls.append(text)
+        return [float(len(text)), 0.25]
+
+
+class FakeClock:
+    """Relógio controlado para o last_used do LRU."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def new_cache(max_entries: int = 100) -> EmbeddingCache:
+    return EmbeddingCache(os.path.join(tempfile.mkdtemp(), "embedding_cache.db"), max_entries=max_entries)
+
+
+def test_key_hit_and_miss():
+    cache = new_cache()
+    key = cache_key("modelo-a", KIND_QUERY, "reembolso")
+    cache.put_many([(key, "modelo-a", KIND_QUERY, [1.0, 0.5])])
+    assert cache.get_many([key]) == {key: [1.0, 0.5]}
+    # Qualquer parte da chave diferente é outra entrada
+    for other in (cache_key("modelo-b", KIND_QUERY, "reembolso"),
+                  cache_key("modelo-a", KIND_DOCUMENT, "reembolso"),
+                  cache_key("modelo-a", KIND_QUERY, "reembolso parcial")):
+        assert other != key
+        assert cache.get_many([other]) == {}
+
+
+def test_put_many_evicts_least_recently_used():
+    clock = FakeClock()
+    original_time = embedding_cache.time
+    embedding_cache.time = clock
+    try:
+        cache = new_cache(max_entries=3)
+        keys = [cache_key("m", KIND_DOCUMENT, f"chunk {i}") for i in range(4)]
+        for i, key in enumerate(keys[:3]):
+            clock.now += 1
+            cache.put_many([(key, "m", KIND_DOCUMENT, [float(i)])])
+        # Usar o mais antigo o torna o mais recente; quem sai é o chunk 1
+        clock.now += 1
+        cache.get_many([keys[0]])
+        clock.now += 1
+        cache.put_many([(keys[3], "m", KIND_DOCUMENT, [3.0])])
+    finally:
+        embedding_cache.time = original_time
+    assert cache.stats()["entries"] == 3
+    assert set(cache.get_many(keys)) == {keys[0], keys[2], keys[3]}
+
+
+def test_documents_only_embed_misses():
+    model = FakeEmbeddings()
+    embeddings = CachedEmbeddings(model, cache=new_cache())
+    first = embeddings.embed_documents(["a", "bb"])
+    second = embeddings.embed_documents(["bb", "ccc", "a", "ccc"])
+    assert model.document_calls == [["a", "bb"], ["ccc"]], model.document_calls
+    assert first == [[1.0, 0.5], [2.0, 0.5]]
+    assert second == [[2.0, 0.5], [3.0, 0.5], [1.0, 0.5], [3.0, 0.5]]
+    assert (embeddings.hits, embeddings.misses) == (2, 3)
+
+
+def test_query_only_embeds_misses():
+    model = FakeEmbeddings()
+    cache = new_cache()
+    embeddings = CachedEmbeddings(model, cache=cache)
+    assert embeddings.embed_query("prazo") == [5.0, 0.25]
+    assert embeddings.embed_query("prazo") == [5.0, 0.25]
+    assert model.query_calls == ["prazo"]
+    # Consulta e documento com o mesmo texto não compartilham vetor
+    embeddings.embed_documents(["prazo"])
+    assert model.document_calls == [["prazo"]]
+    # Outro processo com o mesmo cache em disco também não chama o modelo
+    other_model = FakeEmbeddings()
+    assert CachedEmbeddings(other_model, cache=cache).embed_query("prazo") == [5.0, 0.25]
+    assert other_model.query_calls == []
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do cache de embeddings.")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Evidência de GPS: GpsTrace (arrays tipados, simplificado) dá o mesmo veredito que a lista de pontos.
+
+    python test_gps_evidence.py
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gps_evidence import (
+    VERDICT_ANOMALOUS, VERDICT_NOT_AT_ADDRESS, VERDICT_REACHED, VERDICT_WAITED, GpsTrace, analyze_gps,
+)
+
+ADDRESS = (-23.5614, -46.6559)
+START = datetime(2025, 11, 20, 19, 30, tzinfo=timezone.utc)
+ETA = "2025-11-20T20:00:00Z"
+
+
+def point(minute: float, lat: float, lon: float) -> dict:
+    return {"timestamp": (START + timedelta(minutes=minute)).isoformat().replace("+00:00", "Z"),
+            "latitude": lat, "longitude": lon}
+
+
+def route(wait_minutes: int) -> list:
+    """Aproxima em linha reta (um ponto por minuto), espera na porta e vai embora."""
+    logs = [point(i, ADDRESS[0] - 0.0006 * (10 - i), ADDRESS[1]) for i in range(10)]
+    logs += [point(10 + i, ADDRESS[0] + 0.00001 * (i % 2), ADDRESS[1]) for i in range(wait_minutes + 1)]
+    end = 10 + wait_minutes
+    logs += [point(end + i, ADDRESS[0], ADDRESS[1] + 0.0006 * i) for i in range(1, 6)]
+    return logs
+
+
+def test_dwell_verdicts():
+    waited = analyze_gps(route(8), eta_max=ETA, address=ADDRESS)
+    assert waited["verdict"] == VERDICT_WAITED, waited
+    assert waited["dwell_seconds"] == 8 * 60, waited
+    assert waited["arrived_at"] == "2025-11-20T19:40:00Z", waited
+    assert waited["minutes_vs_eta"] == -20.0, waited
+
+    reached = analyze_gps(route(2), eta_max=ETA, address=ADDRESS)
+    assert reached["verdict"] == VERDICT_REACHED, reached
+
+    far = analyze_gps(route(8)[:5], eta_max=ETA, address=ADDRESS)
+    assert far["verdict"] == VERDICT_NOT_AT_ADDRESS, far
+
+
+def test_teleport_is_anomalous():
+    logs = route(8)
+    logs[3] = dict(logs[3], latitude=ADDRESS[0] + 1.0)
+    assert analyze_gps(logs, eta_max=ETA, address=ADDRESS)["verdict"] == VERDICT_ANOMALOUS
+
+
+def test_trace_matches_logs():
+    logs = route(8)
+    trace = GpsTrace.from_logs(logs, simplify_tolerance_m=0)
+    assert len(trace) == len(logs)
+    assert analyze_gps(trace, eta_max=ETA, address=ADDRESS) == analyze_gps(logs, eta_max=ETA, address=ADDRESS)
+    assert analyze_gps(trace.to_logs(), eta_max=ETA, address=ADDRESS) == analyze_gps(logs, eta_max=ETA, address=ADDRESS)
+
+
+def test_simplified_trace_keeps_verdict_and_dwell():
+    logs = route(8)
+    full = analyze_gps(logs, eta_max=ETA, address=ADDRESS)
+    trace = GpsTrace.from_logs(logs, simplify_tolerance_m=10)
+    assert len(trace) < len(logs), len(trace)
+    simplified = analyze_gps(trace, eta_max=ETA, address=ADDRESS)
+    for key in ("verdict", "arrived_at", "minutes_vs_eta", "dwell_seconds", "anomalies"):
+        assert simplified[key] == full[key], (key, simplified[key], full[key])
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) da evidência de GPS.")
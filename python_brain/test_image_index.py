@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Índice de fotos: veredito em cache por (sha256, tipo de reclamação), quase-duplicatas por dHash
+e foto reutilizada bloqueando o reembolso automático.
+
+Gera imagens pequenas e SQLites temporários; o Gemini Vision é um fake:
+    python test_image_index.py
+"""
+
+import io
+import os
+import sys
+import json
+import tempfile
+from types import SimpleNamespace
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import clients
+import llm_usage
+import reimbursement_brain as brain
+from image_index import ImageIndex, fingerprint
+
+ACCEPT = {"verdict": "ACEITAR_REEMBOLSO", "confidence": 0.9, "reasoning": "Comida estragada.", "red_flags": []}
+
+
+def photo_bytes(flip: bool = False, size=(256, 192), quality: int = 95) -> bytes:
+    """Gradiente com um bloco escuro; flip espelha (outra imagem para o dHash)."""
+    img = Image.new("RGB", (256, 192))
+    img.putdata([(x, (x + y) % 256, y) for y in range(192) for x in range(256)])
+    img.paste((20, 20, 20), (40, 30, 120, 110))
+    if flip:
+        img = img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    img = img.resize(size)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def new_index(max_distance: int = 6) -> ImageIndex:
+    return ImageIndex(os.path.join(tempfile.mkdtemp(), "image_index.db"), max_distance=max_distance)
+
+
+def test_verdict_cached_per_photo_and_claim():
+    index = new_index()
+    fp = fingerprint(photo_bytes())
+    assert index.put_verdict(fp, "QUALITY_ISSUE", ACCEPT)
+    assert index.get_verdict(fp, "QUALITY_ISSUE") == ACCEPT
+    assert index.get_verdict(fp, "ITEM_NOT_RECEIVED") is None
+    assert index.get_verdict(fingerprint(photo_bytes(flip=True)), "QUALITY_ISSUE") is None
+    # Veredito inconclusivo não entra no cache
+    assert not index.put_verdict(fp, "WRONG_ITEM", {"verdict": "ANALISE_HUMANA"})
+    assert index.get_verdict(fp, "WRONG_ITEM") is None
+
+
+def test_recompressed_copy_reuses_verdict():
+    index = new_index()
+    original = fingerprint(photo_bytes())
+    copy = fingerprint(photo_bytes(size=(200, 150), quality=60))
+    assert copy["sha256"] != original["sha256"]
+    assert (copy["dhash"] ^ original["dhash"]).bit_count() <= index.max_distance
+    index.put_verdict(original, "QUALITY_ISSUE", ACCEPT)
+    assert index.get_verdict(copy, "QUALITY_ISSUE") == ACCEPT
+
+
+def test_hamming_threshold():
+    index = new_index(max_distance=6)
+    base = {"sha256": "a" * 64, "dhash": 0x0123456789ABCDEF}
+    index.put_verdict(base, "QUALITY_ISSUE", ACCEPT)
+    within = {"sha256": "b" * 64, "dhash": base["dhash"] ^ 0b111111}    # 6 bits
+    beyond = {"sha256": "c" * 64, "dhash": base["dhash"] ^ 0b1111111}   # 7 bits
+    assert index.similar(within) == [within["sha256"], base["sha256"]]
+    assert index.get_verdict(within, "QUALITY_ISSUE") == ACCEPT
+    assert index.similar(beyond) == [beyond["sha256"]]
+    assert index.get_verdict(beyond, "QUALITY_ISSUE") is None
+
+
+def test_reused_photo_blocks_auto_accept():
+    workdir = tempfile.mkdtemp()
+    photo = os.path.join(workdir, "foto.jpg")
+    with open(photo, "wb") as f:
+        f.write(photo_bytes())
+    vision_calls = []
+
+    class FakeVision:
+        def invoke(self, messages):
+            vision_calls.append(messages)
+            return SimpleNamespace(content=json.dumps(ACCEPT), usage_metadata={"input_tokens": 10, "output_tokens": 5})
+
+    index = ImageIndex(os.path.join(workdir, "image_index.db"))
+    fakes = {
+        "get_image_index": lambda: index,
+        "build_vision_message": lambda prompt, image_url: {"text": prompt, "image_url": image_url},
+        "get_policy_answer": lambda query: "Regra oficial (fake).",
+        "send_telegram_approval": lambda data: {"sent": False},
+        "log_roi_to_sheet": lambda data: True,
+        # Defesa por template (sem langchain); o Vision segue liberado
+        "llm_allowed": lambda stage: stage != llm_usage.STAGE_DEFENSE,
+    }
+    originals = {name: getattr(brain, name) for name in fakes}
+    original_store = llm_usage._shared_store
+    for name, fake in fakes.items():
+        setattr(brain, name, fake)
+    llm_usage._shared_store = llm_usage.UsageStore(os.path.join(workdir, "llm_usage.db"))
+    clients.get_registry().register("vision", lambda registry: FakeVision())
+
+    def order(order_id):
+        return json.dumps({
+            "order_id": order_id,
+            "reason_code": "QUALITY_ISSUE",
+            "financial_impact": 65.0,
+            "timestamps": {"eta_max": "2025-11-20T18:45:00Z", "actual_arrival_at": "2025-11-20T18:40:00Z"},
+            "delivery_evidence": {"gps_logs": [], "delivery_pin_validated": False},
+            "chat_history": [],
+            "photo_evidence_url": photo,
+        })
+
+    try:
+        first = brain.process_refund_request(order("FOTO-1"))
+        second = brain.process_refund_request(order("FOTO-2"))
+    finally:
+        for name, original in originals.items():
+            setattr(brain, name, original)
+        llm_usage._shared_store = original_store
+        clients.get_registry().register("vision", clients._vision)
+
+    assert first["action"] == "ACEITAR_CANCELAMENTO", first
+    # Mesma foto em outro pedido: veredito do cache, mas sem reembolso automático
+    assert len(vision_calls) == 1, len(vision_calls)
+    assert second["action"] == "PENDING", second
+    assert second["image_analysis"]["photo_reused_in"] == ["FOTO-1"], second
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do índice de fotos.")
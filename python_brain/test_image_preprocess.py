@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Pré-processamento das fotos: redução, remoção de EXIF, validação do formato e limite do base64.
+
+Gera imagens pequenas em um diretório temporário:
+    python test_image_preprocess.py
+"""
+
+import io
+import os
+import sys
+import json
+import base64
+import tempfile
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import reimbursement_brain as brain
+from image_preprocess import encode_base64_capped, prepare_image
+
+
+def noisy_photo(path: str, size=(1200, 800), exif=None):
+    """Foto com ruído (não comprime bem, como uma foto de celular)."""
+    img = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    img.save(path, format="JPEG", quality=95, **({"exif": exif} if exif is not None else {}))
+    return path
+
+
+def decoded(prepared: dict) -> Image.Image:
+    header, data = prepared["data_url"].split(",", 1)
+    assert header == "data:image/jpeg;base64", header
+    return Image.open(io.BytesIO(base64.b64decode(data)))
+
+
+def test_downscale_and_bytes_saved():
+    path = noisy_photo(os.path.join(tempfile.mkdtemp(), "foto.jpg"))
+    prepared = prepare_image(path, max_edge=400)
+    assert (prepared["width"], prepared["height"]) == (400, 267), prepared
+    assert decoded(prepared).size == (400, 267)
+    assert prepared["original_bytes"] == os.path.getsize(path)
+    assert prepared["bytes_saved"] == prepared["original_bytes"] - prepared["sent_bytes"] > 0, prepared
+
+
+def test_exif_stripped_after_orientation():
+    exif = Image.Exif()
+    exif[0x010F] = "Fabricante do celular"  # Make
+    exif[0x0112] = 6                        # Orientation: girar 90°
+    path = noisy_photo(os.path.join(tempfile.mkdtemp(), "foto.jpg"), size=(300, 200), exif=exif.tobytes())
+    img = decoded(prepare_image(path, max_edge=1000))
+    assert img.size == (200, 300), img.size
+    assert not dict(img.getexif()), dict(img.getexif())
+
+
+def test_rejects_non_images():
+    workdir = tempfile.mkdtemp()
+    text = os.path.join(workdir, "foto.jpg")
+    with open(text, "w", encoding="utf-8") as f:
+        f.write("não sou uma imagem")
+    tiff = os.path.join(workdir, "foto.tiff")
+    Image.new("RGB", (10, 10)).save(tiff, format="TIFF")
+    for path in (text, tiff):
+        try:
+            prepare_image(path)
+        except (ValueError, OSError):
+            continue
+        raise AssertionError(f"{path} aceito")
+
+
+def test_base64_cap():
+    data = os.urandom(5000)
+    assert encode_base64_capped(io.BytesIO(data), max_bytes=10_000) == base64.b64encode(data).decode("ascii")
+    try:
+        encode_base64_capped(io.BytesIO(data), max_bytes=1000)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("base64 acima do limite aceito")
+    path = noisy_photo(os.path.join(tempfile.mkdtemp(), "foto.jpg"))
+    try:
+        prepare_image(path, max_upload_bytes=1024)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("foto acima do limite aceita")
+
+
+def test_bytes_saved_in_final_result():
+    analysis = {"verdict": "NEGAR_REEMBOLSO", "confidence": 0.9, "reasoning": "fake", "red_flags": [],
+                "image_preprocessing": {"original_bytes": 5000, "sent_bytes": 1000, "bytes_saved": 4000,
+                                        "width": 400, "height": 300}}
+    fakes = {
+        "analyze_image_evidence": lambda **kwargs: dict(analysis),
+        "get_policy_answer": lambda query: "Regra oficial (fake).",
+        "send_telegram_approval": lambda data: {"sent": False},
+        "log_roi_to_sheet": lambda data: True,
+        "llm_allowed": lambda stage: False,
+    }
+    originals = {name: getattr(brain, name) for name in fakes}
+    for name, fake in fakes.items():
+        setattr(brain, name, fake)
+    try:
+        result = brain.process_refund_request(json.dumps({
+            "order_id": "FOTO-1",
+            "reason_code": "QUALITY_ISSUE",
+            "financial_impact": 65.0,
+            "timestamps": {"eta_max": "2025-11-20T18:45:00Z", "actual_arrival_at": "2025-11-20T18:40:00Z"},
+            "delivery_evidence": {"gps_logs": [], "delivery_pin_validated": False},
+            "chat_history": [],
+            "photo_evidence_url": "foto.jpg",
+        }))
+    finally:
+        for name, original in originals.items():
+            setattr(brain, name, original)
+    assert result["action"] == "CONTESTAR", result
+    assert result["image_analysis"]["image_preprocessing"]["bytes_saved"] == 4000, result
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do pré-processamento de imagens.")
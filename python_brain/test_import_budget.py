@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Orçamento de importação do cérebro.
+
+Garante que `import reimbursement_brain` é barato e que os caminhos que não
+precisam de subsistemas externos (JSON malformado, PENDING por falta de
+timestamps) não importam nem conectam em LangChain, Chroma, gspread ou requests.
+
+Roda em um interpretador novo, sem GOOGLE_API_KEY:
+    python test_import_budget.py
+    IMPORT_BUDGET_SECONDS=0.5 python test_import_budget.py
+"""
+
+import os
+import sys
+import json
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "2.0"))
+
+HEAVY_MODULES = [
+    "langchain",
+    "langchain_core",
+    "langchain_community",
+    "langchain_google_genai",
+    "chromadb",
+    "gspread",
+    "requests",
+    "PIL",
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import reimbursement_brain as brain
+elapsed = time.perf_counter() - start
+
+results = [
+    brain.process_refund_request("{nao e json"),
+    brain.process_refund_request(json.dumps({
+        "order_id": "BUDGET-001",
+        "reason_code": "ITEM_NOT_RECEIVED",
+        "financial_impact": 10.0,
+        "timestamps": {"eta_max": "2025-11-20T12:40:00"},
+        "delivery_evidence": {"gps_logs": [], "delivery_pin_validated": False},
+        "chat_history": []
+    })),
+]
+
+from clients import get_registry
+print(json.dumps({
+    "elapsed": elapsed,
+    "actions": [r["action"] for r in results],
+    "modules": sorted(m for m in sys.modules if m.split(".")[0] in %r),
+    "clients": get_registry().initialized(),
+}))
+"""
+
+
+def run_probe() -> dict:
+    env = dict(os.environ)
+    env.pop("GOOGLE_API_KEY", None)
+    completed = subprocess.run(
+        [sys.executable, "-c", "import sys; sys.path.insert(0, %r)\n" % SCRIPT_DIR + PROBE % HEAVY_MODULES],
+        capture_output=True, text=True, env=env, cwd=SCRIPT_DIR, timeout=120,
+    )
+    if completed.returncode != 0:
+        raise AssertionError(f"Falha ao importar o cérebro:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_import_budget():
+    probe = run_probe()
+    assert probe["elapsed"] <= IMPORT_BUDGET_SECONDS, (
+        f"import reimbursement_brain levou {probe['elapsed']:.2f}s (orçamento: {IMPORT_BUDGET_SECONDS:.2f}s)"
+    )
+    assert probe["actions"] == ["ERROR", "PENDING"], probe["actions"]
+    assert not probe["modules"], f"Módulos pesados importados sem necessidade: {probe['modules']}"
+    assert not probe["clients"], f"Clientes criados sem necessidade: {probe['clients']}"
+
+
+if __name__ == "__main__":
+    try:
+        test_import_budget()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ Import do cérebro dentro do orçamento ({IMPORT_BUDGET_SECONDS:.2f}s), sem subsistemas externos.")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Modo lote (--jsonl): cada resultado sai assim que o pedido termina.
+
+O processamento do pedido é trocado por um fake, sem Gemini nem Sheets:
+    python test_jsonl_stream.py
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import reimbursement_brain as brain
+
+
+class EventOut(io.StringIO):
+    """Saída que avisa a cada linha escrita."""
+
+    def __init__(self):
+        super().__init__()
+        self.wrote = threading.Event()
+
+    def write(self, text):
+        n = super().write(text)
+        self.wrote.set()
+        return n
+
+
+def fake_order(line):
+    return {"order_id": json.loads(line)["order_id"], "action": "CONTESTAR"}
+
+
+def with_fake_order(fn, fake=fake_order):
+    original = brain._process_jsonl_line
+    brain._process_jsonl_line = fake
+    try:
+        return fn()
+    finally:
+        brain._process_jsonl_line = original
+
+
+def test_result_emitted_before_next_line():
+    out = EventOut()
+    emitted_before_second = []
+
+    def slow_producer():
+        yield json.dumps({"order_id": "A1"})
+        # Produtor lento: a próxima linha só chega depois de um tempo
+        emitted_before_second.append(out.wrote.wait(timeout=5))
+        yield json.dumps({"order_id": "A2"})
+
+    processed = with_fake_order(lambda: brain.process_jsonl_stream(slow_producer(), max_in_flight=4, out=out))
+    assert processed == 2
+    assert emitted_before_second == [True], "resultado de A1 esperou a próxima linha do stream"
+    ids = sorted(json.loads(line)["order_id"] for line in out.getvalue().splitlines())
+    assert ids == ["A1", "A2"], ids
+
+
+def test_window_bounds_in_flight():
+    lines = [json.dumps({"order_id": f"A{i}"}) for i in range(20)]
+    out = io.StringIO()
+    lock = threading.Lock()
+    running = {"now": 0, "max": 0}
+
+    def slow_order(line):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(0.01)
+        with lock:
+            running["now"] -= 1
+        return fake_order(line)
+
+    processed = with_fake_order(lambda: brain.process_jsonl_stream(lines, max_in_flight=2, out=out), slow_order)
+    assert processed == 20
+    assert len(out.getvalue().splitlines()) == 20
+    assert running["max"] == 2, f"{running['max']} pedido(s) ao mesmo tempo com max_in_flight=2"
+
+
+def test_non_positive_workers_rejected():
+    for workers in (0, -1):
+        try:
+            brain.process_jsonl_stream([], max_in_flight=workers, out=io.StringIO())
+        except ValueError:
+            continue
+        raise AssertionError(f"max_in_flight={workers} aceito")
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do modo lote.")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Orçamento de tokens: limites por pedido e por hora, e o caminho seguro de cada etapa rebaixada.
+
+Usa SQLites temporários; as etapas externas do cérebro são trocadas por fakes:
+    python test_llm_usage.py
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+from types import SimpleNamespace
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import llm_usage
+import reimbursement_brain as brain
+from chat_cache import ChatAnalysisCache
+from image_index import ImageIndex
+from llm_usage import STAGE_CHAT, STAGE_DEFENSE, STAGE_VISION, UsageStore, allow, record, track_order
+
+
+def with_budget(fn, order: int = 0, hourly: int = 0, spent: int = 0):
+    """Roda fn com orçamentos próprios, store temporário (com `spent` tokens na última hora) e fakes no cérebro."""
+    workdir = tempfile.mkdtemp()
+    saved = (llm_usage.ORDER_TOKEN_BUDGET, llm_usage.HOURLY_TOKEN_BUDGET, llm_usage._shared_store)
+    fakes = {
+        "get_chat_cache": lambda: ChatAnalysisCache(os.path.join(workdir, "chat_cache.db")),
+        "get_image_index": lambda: ImageIndex(os.path.join(workdir, "image_index.db")),
+        "get_policy_answer": lambda query: "Regra oficial (fake).",
+        "send_telegram_approval": lambda data: {"sent": False},
+        "log_roi_to_sheet": lambda data: True,
+    }
+    originals = {name: getattr(brain, name) for name in fakes}
+    llm_usage.ORDER_TOKEN_BUDGET, llm_usage.HOURLY_TOKEN_BUDGET = order, hourly
+    llm_usage._shared_store = UsageStore(os.path.join(workdir, "llm_usage.db"))
+    for name, fake in fakes.items():
+        setattr(brain, name, fake)
+    if spent:
+        llm_usage._shared_store.add("OUTRO", STAGE_CHAT, spent, 0, 0.0)
+    try:
+        return fn(workdir)
+    finally:
+        llm_usage.ORDER_TOKEN_BUDGET, llm_usage.HOURLY_TOKEN_BUDGET, llm_usage._shared_store = saved
+        for name, original in originals.items():
+            setattr(brain, name, original)
+
+
+def order(**overrides) -> str:
+    """Pedido entregue no prazo, sem PIN, com um GPS mínimo."""
+    data = {
+        "order_id": "BUDGET-1",
+        "reason_code": "ITEM_NOT_RECEIVED",
+        "financial_impact": 80.0,
+        "timestamps": {"eta_max": "2025-11-20T20:00:00Z", "actual_arrival_at": "2025-11-20T19:50:00Z"},
+        "delivery_evidence": {"gps_logs": [], "delivery_pin_validated": False},
+        "chat_history": [],
+    }
+    data.update(overrides)
+    return json.dumps(data)
+
+
+def test_order_budget():
+    def run(_):
+        with track_order() as usage:
+            assert allow(STAGE_CHAT)
+            record(STAGE_CHAT, {"input_tokens": 70, "output_tokens": 40})
+            assert not allow(STAGE_DEFENSE)
+            assert not allow(STAGE_DEFENSE)
+            assert usage.downgraded == [STAGE_DEFENSE]
+            assert usage.as_dict()["total_tokens"] == 110
+        # Outro pedido começa com o orçamento zerado
+        with track_order() as usage:
+            assert allow(STAGE_CHAT) and usage.downgraded == []
+    with_budget(run, order=100)
+
+
+def test_hourly_budget():
+    def run(_):
+        store = llm_usage.get_usage_store()
+        with track_order():
+            assert allow(STAGE_CHAT)
+            record(STAGE_CHAT, {"input_tokens": 150, "output_tokens": 60})
+            assert not allow(STAGE_CHAT)
+        # Consumo de mais de uma hora atrás não conta
+        with store._db() as conn:
+            conn.execute("UPDATE llm_calls SET created_at = ?", (time.time() - 3700,))
+        with track_order():
+            assert allow(STAGE_CHAT)
+    with_budget(run, hourly=200)
+
+
+def test_usage_from_message_formats():
+    current = SimpleNamespace(usage_metadata={"input_tokens": 12, "output_tokens": 3})
+    legacy = SimpleNamespace(usage_metadata=None, response_metadata={
+        "usage_metadata": {"prompt_token_count": 8, "candidates_token_count": 2}})
+    assert llm_usage.usage_from_message(current) == {"input_tokens": 12, "output_tokens": 3}
+    assert llm_usage.usage_from_message(legacy) == {"input_tokens": 8, "output_tokens": 2}
+    assert llm_usage.usage_from_message(SimpleNamespace()) == {"input_tokens": 0, "output_tokens": 0}
+
+
+def test_downgraded_unconfirmed_chat_goes_to_human_review():
+    def run(_):
+        # Pedido sem confirmação do entregador: as regras ficam abaixo do MIN_CONFIDENCE
+        result = brain.process_refund_request(order(chat_history=[
+            {"sender": "customer", "text": "Pode deixar na portaria", "timestamp": "2025-11-20T19:40:00Z"},
+        ]))
+        assert result["action"] == "PENDING", result
+        assert result["chat_analysis"]["budget_downgrade"], result
+        assert result["llm_usage"]["downgraded"] == [STAGE_CHAT], result
+    with_budget(run, hourly=100, spent=500)
+
+
+def test_downgraded_vision_goes_to_human_review():
+    def run(workdir):
+        photo = os.path.join(workdir, "foto.jpg")
+        Image.new("RGB", (64, 64), (200, 80, 40)).save(photo)
+        result = brain.process_refund_request(order(reason_code="QUALITY_ISSUE", photo_evidence_url=photo))
+        assert result["action"] == "PENDING", result
+        assert result["image_analysis"]["verdict"] == "ANALISE_HUMANA", result
+        assert result["llm_usage"]["downgraded"] == [STAGE_VISION], result
+    with_budget(run, hourly=100, spent=500)
+
+
+def test_downgraded_defense_uses_template():
+    def run(_):
+        # Cliente ausente comprovado pelas regras: decide sem LLM, e a defesa (LLM) vira template
+        result = brain.process_refund_request(order(chat_history=[
+            {"sender": "driver", "text": "Cheguei no endereço. Onde você está?", "timestamp": "2025-11-20T19:50:00Z"},
+            {"sender": "driver", "text": "Tentei ligar 3 vezes mas não atende", "timestamp": "2025-11-20T19:54:00Z"},
+            {"sender": "driver", "text": "Não consegui entregar, cliente não atendeu", "timestamp": "2025-11-20T20:00:00Z"},
+        ]))
+        assert result["action"] == "CONTESTAR", result
+        assert result["defense_renderer"] == "template", result
+        assert STAGE_DEFENSE in result["llm_usage"]["downgraded"], result
+    with_budget(run, hourly=100, spent=500)
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do orçamento de tokens.")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Espelho de ROI: rollups incrementais iguais aos reconstruídos na cópia completa.
+
+Usa uma aba em memória no lugar do Google Sheets e um SQLite temporário:
+    python test_roi_mirror.py
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from roi_mirror import RoiMirror
+from sheets_client import ROI_HEADER
+
+
+class FakeWorksheet:
+    """Responde a ws.get() como o gspread: tudo, ou o intervalo 'A<linha>:D'."""
+
+    def __init__(self, rows: list):
+        self.values = [ROI_HEADER] + rows
+
+    def append(self, *rows):
+        self.values.extend(rows)
+
+    def get(self, range_name=None, **kwargs):
+        if range_name is None:
+            return [list(row) for row in self.values]
+        first_row = int(range_name.split(":")[0][1:])
+        return [list(row) for row in self.values[first_row - 1:]]
+
+
+def new_mirror() -> RoiMirror:
+    return RoiMirror(os.path.join(tempfile.mkdtemp(), "roi_mirror.db"))
+
+
+def test_unparseable_row_keeps_daily_max():
+    mirror = new_mirror()
+    ws = FakeWorksheet([["A1", 50.0, "2025-11-20", "defesa"]])
+    mirror.full_sync(ws)
+    # "1.234" é ambíguo (milhar ou decimal?) e entra como NaN
+    ws.append(["A2", "1.234", "2025-11-20", "defesa"])
+    assert mirror.incremental_sync(ws) == 1
+    kpis = mirror.kpis()
+    assert kpis["maior_valor"] == 50.0, kpis
+    assert kpis["ambiguos"] == 1, kpis
+
+
+def test_incremental_matches_full_rebuild():
+    rows = [
+        ["A1", 50.0, "2025-11-20", "d"],
+        ["A2", "abc", "2025-11-20", "d"],
+        ["A3", "R$ 80,00", "20/11/2025", "d"],
+        ["A4", 30.5, "2025-11-21", "d"],
+        ["A5", "", "", "d"],
+    ]
+    incremental = new_mirror()
+    ws = FakeWorksheet(rows[:1])
+    incremental.full_sync(ws)
+    for row in rows[1:]:
+        ws.append(row)
+        incremental.incremental_sync(ws)
+
+    full = new_mirror()
+    full.full_sync(FakeWorksheet(rows))
+
+    assert incremental.kpis() == full.kpis(), (incremental.kpis(), full.kpis())
+    assert incremental.top(3).equals(full.top(3))
+    assert incremental.kpis()["maior_valor"] == 80.0
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do espelho de ROI.")
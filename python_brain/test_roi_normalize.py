@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Normalização de valores da planilha de ROI: o que é ambíguo é sinalizado, não adivinhado.
+
+    python test_roi_normalize.py
+"""
+
+import os
+import sys
+import math
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from roi_normalize import normalize_currency
+
+
+def normalize(*values):
+    result, ambiguous = normalize_currency(pd.Series(list(values), dtype=object))
+    return list(result), list(ambiguous)
+
+
+def test_br_and_dot_decimal_parse():
+    result, ambiguous = normalize("R$ 1.234,56", "125,50", "125.5", "1.234.567", 99.5)
+    assert result == [1234.56, 125.5, 125.5, 1234567.0, 99.5], result
+    assert not any(ambiguous), ambiguous
+
+
+def test_us_thousands_is_flagged():
+    result, ambiguous = normalize("R$ 1,234.56", "12,345", "1,234")
+    assert all(math.isnan(v) for v in result), result
+    assert all(ambiguous), ambiguous
+
+
+def test_unparseable_text_is_flagged():
+    result, ambiguous = normalize("abc", "R$ --")
+    assert all(math.isnan(v) for v in result), result
+    assert all(ambiguous), ambiguous
+
+
+def test_empty_is_not_flagged():
+    result, ambiguous = normalize("", None)
+    assert all(math.isnan(v) for v in result), result
+    assert not any(ambiguous), ambiguous
+
+
+def test_ticket_ignores_rows_without_value():
+    import tempfile
+    from roi_mirror import RoiMirror
+    from test_roi_mirror import FakeWorksheet
+
+    mirror = RoiMirror(os.path.join(tempfile.mkdtemp(), "roi_mirror.db"))
+    mirror.full_sync(FakeWorksheet([
+        ["A1", 100.0, "2025-11-20", "d"],
+        ["A2", "abc", "2025-11-20", "d"],
+        ["A3", "R$ 50,00", "2025-11-20", "d"],
+    ]))
+    kpis = mirror.kpis()
+    assert kpis["total"] == 3, kpis
+    assert kpis["ticket_medio"] == 75.0, kpis
+    assert kpis["ambiguos"] == 1, kpis
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) da normalização de ROI.")
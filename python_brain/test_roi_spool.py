@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Spool de ROI: cada pedido chega à planilha exatamente uma vez, mesmo com falhas no envio.
+
+Usa uma planilha em memória e um SQLite temporário:
+    python test_roi_spool.py
+"""
+
+import os
+import sys
+import atexit
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import roi_spool
+from roi_spool import RoiSpool
+
+
+class FakeSink:
+    """Planilha em memória; `fail` controla a próxima falha do append_rows."""
+
+    def __init__(self):
+        self.rows = []
+        self.fail = None  # None, "before" (nada gravado) ou "after" (gravou, resposta perdida)
+
+    def append_rows(self, rows):
+        if self.fail == "before":
+            self.fail = None
+            raise ConnectionError("falha antes de gravar")
+        self.rows.extend(rows)
+        if self.fail == "after":
+            self.fail = None
+            raise TimeoutError("gravou, mas a resposta se perdeu")
+
+    def existing_order_ids(self) -> set:
+        return {row[0] for row in self.rows}
+
+
+def with_spool(fn):
+    sink = FakeSink()
+    # Lote maior que o teste e intervalo longo: o flusher de fundo não concorre com os flushes do teste
+    spool = RoiSpool(sink, path=os.path.join(tempfile.mkdtemp(), "roi_spool.db"), batch_size=10, flush_interval=3600)
+    try:
+        return fn(spool, sink)
+    finally:
+        spool.close()
+        atexit.unregister(spool.close)
+
+
+def delivered(sink) -> list:
+    return sorted(row[0] for row in sink.rows)
+
+
+def expire_leases(fn):
+    """Roda fn com todo lote 'inflight' tratado como lease vencido."""
+    original = roi_spool.LEASE_SECONDS
+    roi_spool.LEASE_SECONDS = -1
+    try:
+        return fn()
+    finally:
+        roi_spool.LEASE_SECONDS = original
+
+
+def test_duplicate_enqueue_sent_once():
+    def run(spool, sink):
+        assert spool.enqueue(["O1", 10.0, "2025-11-20", "d"])
+        assert not spool.enqueue(["O1", 10.0, "2025-11-20", "d"])
+        for i in range(2, 6):
+            spool.enqueue([f"O{i}", 10.0, "2025-11-20", "d"])
+        assert spool.flush_all() == 5
+        assert spool.flush_all() == 0
+        assert delivered(sink) == ["O1", "O2", "O3", "O4", "O5"], delivered(sink)
+        assert spool.pending_count() == 0
+    with_spool(run)
+
+
+def test_lost_response_is_not_resent():
+    def run(spool, sink):
+        for i in range(3):
+            spool.enqueue([f"O{i}", 10.0, "2025-11-20", "d"])
+        sink.fail = "after"
+        try:
+            spool.flush_once()
+        except TimeoutError:
+            pass
+        assert spool.pending_count() == 3
+        # Lease vencido: a reconciliação acha as linhas na planilha e não reenvia
+        expire_leases(spool.flush_all)
+        assert delivered(sink) == ["O0", "O1", "O2"], delivered(sink)
+        assert spool.pending_count() == 0
+    with_spool(run)
+
+
+def test_failed_batch_is_resent_once():
+    def run(spool, sink):
+        for i in range(3):
+            spool.enqueue([f"O{i}", 10.0, "2025-11-20", "d"])
+        sink.fail = "before"
+        try:
+            spool.flush_once()
+        except ConnectionError:
+            pass
+        assert sink.rows == []
+        # Lease ainda válido: o lote não é reenviado por outro flush
+        assert spool.flush_all() == 0
+        expire_leases(spool.flush_all)
+        assert delivered(sink) == ["O0", "O1", "O2"], delivered(sink)
+        assert spool.pending_count() == 0
+    with_spool(run)
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do spool de ROI.")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Cliente do Sheets: token bucket da cota e política de retry (sem duplicar appends).
+
+Usa uma sessão HTTP falsa, sem rede nem credenciais:
+    python test_sheets_client.py
+"""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import sheets_client
+from sheets_client import SheetsClient, TokenBucket, should_retry
+
+
+class FakeSession:
+    """Responde os status da fila, um por requisição."""
+
+    def __init__(self, statuses: list):
+        self.statuses = list(statuses)
+        self.requests = []
+
+    def request(self, method, url, *args, **kwargs):
+        self.requests.append(method)
+        return SimpleNamespace(status_code=self.statuses.pop(0))
+
+
+def guarded(statuses: list, max_retries: int = 3):
+    """Sessão falsa com a guarda de cota instalada, sem esperas reais de backoff."""
+    session = FakeSession(statuses)
+    client = SheetsClient(requests_per_minute=6000, max_retries=max_retries)
+    client._install_quota_guard(session)
+    return client, session
+
+
+def without_backoff(fn):
+    original = sheets_client.time
+    sheets_client.time = SimpleNamespace(sleep=lambda seconds: None, monotonic=time.monotonic)
+    try:
+        return fn()
+    finally:
+        sheets_client.time = original
+
+
+def test_bucket_allows_burst_then_throttles():
+    bucket = TokenBucket(rate_per_minute=600)  # 10 fichas/s
+    assert not any(bucket.acquire() for _ in range(600))
+    start = time.monotonic()
+    assert bucket.acquire()
+    assert 0.05 <= time.monotonic() - start < 1.0
+
+
+def test_retry_policy():
+    assert should_retry("GET", 429) and should_retry("POST", 429)
+    assert should_retry("get", 503)
+    assert not should_retry("POST", 503) and not should_retry("PUT", 500)
+    assert not should_retry("GET", 404) and not should_retry("GET", 200)
+
+
+def test_get_retried_on_5xx():
+    def run():
+        client, session = guarded([503, 500, 200])
+        assert session.request("GET", "https://sheets/values").status_code == 200
+        assert session.requests == ["GET", "GET", "GET"]
+        assert client.counters() == {"calls": 3, "throttled": 0, "retries": 2}
+    without_backoff(run)
+
+
+def test_append_not_repeated_on_5xx():
+    def run():
+        client, session = guarded([503, 200])
+        # values:append pode ter gravado antes do 503: o erro volta ao spool, sem repetir
+        assert session.request("POST", "https://sheets/values:append").status_code == 503
+        assert session.requests == ["POST"]
+        assert client.counters()["retries"] == 0
+    without_backoff(run)
+
+
+def test_append_retried_on_429():
+    def run():
+        _, session = guarded([429, 200])
+        assert session.request("POST", "https://sheets/values:append").status_code == 200
+        assert session.requests == ["POST", "POST"]
+    without_backoff(run)
+
+
+def test_gives_up_after_max_retries():
+    def run():
+        _, session = guarded([503] * 5, max_retries=2)
+        assert session.request("GET", "https://sheets/values").status_code == 503
+        assert len(session.requests) == 3
+    without_backoff(run)
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do cliente do Sheets.")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tracing: buckets cumulativos do histograma, formato do texto de /metrics e o trace
+de cada pedido isolado entre threads.
+
+    python test_tracing.py
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tracing
+from tracing import Histogram, span, trace_order, finish_order, render_metrics
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("teste_seconds", "Teste.", "stage", buckets=[0.1, 0.01, 1])
+    for seconds in (0.005, 0.05, 0.5, 5):
+        histogram.observe("rules", seconds)
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP teste_seconds Teste.", "# TYPE teste_seconds histogram"], lines
+    # Buckets em ordem crescente; cada observação conta em todo bucket >= ela, e +Inf == count
+    assert lines[2:] == [
+        'teste_seconds_bucket{stage="rules",le="0.01"} 1',
+        'teste_seconds_bucket{stage="rules",le="0.1"} 2',
+        'teste_seconds_bucket{stage="rules",le="1"} 3',
+        'teste_seconds_bucket{stage="rules",le="+Inf"} 4',
+        'teste_seconds_sum{stage="rules"} 5.555000',
+        'teste_seconds_count{stage="rules"} 4',
+    ], lines
+
+
+def test_render_metrics_format():
+    with trace_order() as trace:
+        with span("teste_render"):
+            pass
+    finish_order(trace, "TESTE_RENDER")
+    lines = render_metrics().splitlines()
+    assert render_metrics().endswith("\n")
+    for metric in (tracing.STAGE_METRIC, tracing.ORDER_METRIC):
+        assert f"# TYPE {metric} histogram" in lines
+        assert any(line.startswith(f"# HELP {metric} ") for line in lines)
+    stage = f'{tracing.STAGE_METRIC}_bucket{{stage="teste_render",le="%s"}} 1'
+    assert stage % f"{tracing.BUCKETS[-1]:g}" in lines
+    assert stage % "+Inf" in lines
+    assert f'{tracing.STAGE_METRIC}_count{{stage="teste_render"}} 1' in lines
+    assert f'{tracing.ORDER_METRIC}_count{{action="TESTE_RENDER"}} 1' in lines
+    assert any(line.startswith(f'{tracing.ORDER_METRIC}_sum{{action="TESTE_RENDER"}} ') for line in lines)
+
+
+def test_trace_order_isolated_per_thread():
+    barrier = threading.Barrier(2)
+    traces = {}
+
+    def order(name):
+        with trace_order() as trace:
+            # As duas threads ficam com o trace aberto ao mesmo tempo
+            barrier.wait()
+            with span(f"etapa_{name}"):
+                time.sleep(0.01)
+            barrier.wait()
+        traces[name] = trace
+
+    threads = [threading.Thread(target=order, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert list(traces["a"].stages) == ["etapa_a"], traces["a"].stages
+    assert list(traces["b"].stages) == ["etapa_b"], traces["b"].stages
+    assert traces["a"].total_ms >= traces["a"].stages["etapa_a"]
+    # Fora de trace_order o span só alimenta o histograma
+    assert tracing._current.get() is None
+    with span("etapa_sem_trace"):
+        pass
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do tracing.")
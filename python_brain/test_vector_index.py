@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Índice vetorial em NumPy: top-k igual à busca exata por cosseno (e ao Chroma, se instalado).
+
+Usa embeddings determinísticos (sem Gemini) e um diretório temporário:
+    python test_vector_index.py
+"""
+
+import os
+import sys
+import hashlib
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vector_index import NumpyVectorStore
+
+DIM = 32
+
+TEXTS = [
+    "PIN validado na entrega comprova o recebimento pelo titular",
+    "Atraso acima de quinze minutos gera cancelamento a favor do cliente",
+    "Foto de qualidade analisada antes do reembolso",
+    "Cliente ausente apos tentativas de contato do entregador",
+    "Acordo informal para deixar o pedido na portaria",
+    "Pedido recusado por embalagem violada",
+    "Contestacao do parceiro com prova de entrega",
+    "Reembolso parcial para item faltante",
+]
+
+QUERIES = ["entrega com PIN", "atraso do pedido", "cliente nao atende", "foto do item", "portaria"]
+
+
+class FakeEmbeddings:
+    """Soma de vetores pseudoaleatórios por palavra: textos com palavras em comum ficam próximos."""
+
+    def _embed(self, text: str) -> list:
+        vector = np.zeros(DIM)
+        for word in text.lower().split():
+            seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:4], "little")
+            vector += np.random.default_rng(seed).standard_normal(DIM)
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def brute_force(query: str, k: int) -> list:
+    """Ids do top-k por cosseno calculado direto nos vetores originais (float64)."""
+    embeddings = FakeEmbeddings()
+    docs = np.asarray(embeddings.embed_documents(TEXTS))
+    q = np.asarray(embeddings.embed_query(query))
+    scores = docs @ q / (np.linalg.norm(docs, axis=1) * np.linalg.norm(q))
+    return [f"doc-{i}" for i in np.argsort(-scores, kind="stable")[:k]]
+
+
+def new_store(path: str = None) -> NumpyVectorStore:
+    return NumpyVectorStore(path or tempfile.mkdtemp(), embedding_function=FakeEmbeddings())
+
+
+def test_top_k_matches_brute_force():
+    store = new_store()
+    store.add_texts(TEXTS, metadatas=[{"page": i} for i in range(len(TEXTS))],
+                    ids=[f"doc-{i}" for i in range(len(TEXTS))])
+    for query in QUERIES:
+        for k in (1, 4, len(TEXTS) + 3):
+            ids = [cid for _, cid, _, _ in store.search(query, k)]
+            assert ids == brute_force(query, k), (query, k, ids)
+            scores = [score for score, _, _, _ in store.search(query, k)]
+            assert scores == sorted(scores, reverse=True), scores
+
+
+def test_persist_reload_and_replace():
+    path = tempfile.mkdtemp()
+    store = new_store(path)
+    store.add_texts(TEXTS, ids=[f"doc-{i}" for i in range(len(TEXTS))])
+    store.persist()
+
+    reloaded = new_store(path)
+    assert reloaded.ids == store.ids
+    for query in QUERIES:
+        assert reloaded.search(query, 3) == store.search(query, 3), query
+
+    # Reingestão com o mesmo id substitui a página, sem duplicar
+    reloaded.add_texts(["Atraso do pedido: nova regra de cancelamento"], ids=["doc-1"])
+    reloaded.persist()
+    again = new_store(path)
+    assert sorted(again.ids) == sorted(store.ids)
+    assert again.search("atraso do pedido", 1)[0][2] == "Atraso do pedido: nova regra de cancelamento"
+    assert len([name for name in os.listdir(path) if name.startswith("vectors-")]) == 1
+
+
+def test_matches_chroma_when_installed():
+    try:
+        import chromadb
+    except ImportError:
+        print("⏭️ chromadb não instalado: comparação com o Chroma ignorada.")
+        return
+    embeddings = FakeEmbeddings()
+    ids = [f"doc-{i}" for i in range(len(TEXTS))]
+    collection = chromadb.EphemeralClient().create_collection(
+        f"policy-{os.getpid()}", metadata={"hnsw:space": "cosine"}
+    )
+    collection.add(ids=ids, documents=TEXTS, embeddings=embeddings.embed_documents(TEXTS))
+    store = new_store()
+    store.add_texts(TEXTS, ids=ids)
+    for query in QUERIES:
+        chroma = collection.query(query_embeddings=[embeddings.embed_query(query)], n_results=4)["ids"][0]
+        assert [cid for _, cid, _, _ in store.search(query, 4)] == chroma, (query, chroma)
+
+
+if __name__ == "__main__":
+    tests = [fn for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    try:
+        for test in tests:
+            test()
+    except AssertionError as e:
+        print(f"❌ {test.__name__}: {e}")
+        sys.exit(1)
+    print(f"✅ {len(tests)} teste(s) do índice vetorial.")
@@ -0,0 +1,140 @@
+"""
+Tempo por etapa de cada pedido (spans) e histogramas no formato do Prometheus.
+
+O cérebro marca cada etapa com `span("nome")` (ou `@traced("nome")` nas funções
+auxiliares). Dentro de `trace_order()`, a duração é somada no trace do pedido
+atual (ContextVar: cada thread/requisição tem o seu); em qualquer caso, ela
+alimenta o histograma global da etapa.
+
+- o resultado do pedido pode trazer o bloco `timings` (BRAIN_INCLUDE_TIMINGS=1
+  ou `/process?timings=1` no brain_server.py);
+- `render_metrics()` gera o texto servido em `/metrics` pelo brain_server.py.
+
+Só usa a biblioteca padrão: não pesa no import do cérebro.
+"""
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+INCLUDE_TIMINGS = os.getenv("BRAIN_INCLUDE_TIMINGS", "0") == "1"
+
+# Limites (s) dos buckets dos histogramas: de cache local (ms) até chamadas lentas ao Gemini
+BUCKETS = [float(b) for b in os.getenv(
+    "BRAIN_METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30"
+).split(",")]
+
+STAGE_METRIC = "refund_brain_stage_duration_seconds"
+ORDER_METRIC = "refund_brain_order_duration_seconds"
+
+_current = contextvars.ContextVar("refund_trace", default=None)
+
+
+class Histogram:
+    """Histograma cumulativo por rótulo (mesma semântica do Prometheus)."""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: list = BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = sorted(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, label_value: str, seconds: float):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for value, series in sorted(self._series.items()):
+                label = f'{self.label}="{value}"'
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound:g}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{label}}} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{{{label}}} {series['count']}")
+        return lines
+
+
+stage_histogram = Histogram(STAGE_METRIC, "Duração de cada etapa do processamento de um pedido.", "stage")
+order_histogram = Histogram(ORDER_METRIC, "Duração total do processamento de um pedido, por ação final.", "action")
+
+
+class Trace:
+    """Etapas de um pedido: ms somados por etapa (uma etapa pode rodar mais de uma vez)."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.total_ms = None
+
+    def add(self, stage: str, ms: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+    def finish(self) -> float:
+        self.total_ms = (time.perf_counter() - self.start) * 1000
+        return self.total_ms
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": round(self.total_ms if self.total_ms is not None else (time.perf_counter() - self.start) * 1000, 3),
+            "stages_ms": {stage: round(ms, 3) for stage, ms in self.stages.items()},
+        }
+
+
+@contextmanager
+def span(stage: str):
+    """Mede o bloco como a etapa `stage` (no trace atual, se houver, e no histograma)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        trace = _current.get()
+        if trace is not None:
+            trace.add(stage, elapsed * 1000)
+        stage_histogram.observe(stage, elapsed)
+
+
+def traced(stage: str):
+    """Decorador: a função inteira é a etapa `stage`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace_order():
+    """Abre o trace de um pedido; o chamador registra a ação com finish_order()."""
+    trace = Trace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace.finish()
+
+
+def finish_order(trace: Trace, action: str):
+    order_histogram.observe(action or "UNKNOWN", trace.total_ms / 1000)
+
+
+def render_metrics() -> str:
+    """Texto de exposição do Prometheus (version 0.0.4)."""
+    return "\n".join(stage_histogram.render() + order_histogram.render()) + "\n"
@@ -0,0 +1,163 @@
+"""
+Índice vetorial em NumPy (memmap) para a base da política.
+
+A política tem poucas páginas: abrir um cliente persistente do Chroma em
+cada processo custa mais que a busca em si. Este backend guarda:
+- vectors-<hash>.f32: matriz float32 (linhas normalizadas), aberta com np.memmap;
+- meta.json: ids, textos, metadados, dimensão e o arquivo de vetores atual.
+
+A busca é um produto matriz-vetor (cosseno, vetores já normalizados) com
+top-k por argpartition. A API cobre o que o cérebro e o ingest_policy.py usam
+do Chroma (get, delete, add_texts, persist, similarity_search, as_retriever),
+então o backend é escolhido só pelo RAG_BACKEND.
+"""
+
+import os
+import json
+import hashlib
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+NUMPY_INDEX_DIR = os.getenv("NUMPY_INDEX_DIR", os.path.join(SCRIPT_DIR, "vector_index_ifood"))
+
+# Mesmo k padrão do as_retriever() do Chroma
+DEFAULT_K = 4
+
+META_FILE = "meta.json"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class NumpyVectorStore:
+    """Vetores da política em memória mapeada, com busca por cosseno."""
+
+    def __init__(self, path: str = NUMPY_INDEX_DIR, embedding_function=None):
+        self.path = path
+        self.embedding_function = embedding_function
+        self._load()
+
+    def _load(self):
+        self.ids, self.texts, self.metadatas = [], [], []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self._vectors_file = None
+        try:
+            with open(os.path.join(self.path, META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.ids, self.texts, self.metadatas = meta["ids"], meta["texts"], meta["metadatas"]
+        self._vectors_file = meta["vectors_file"]
+        if self.ids:
+            self.matrix = np.memmap(
+                os.path.join(self.path, self._vectors_file), dtype=np.float32, mode="r",
+                shape=(len(self.ids), meta["dim"])
+            )
+
+    # --- Escrita (ingest_policy.py) ---
+    def get(self, include=None) -> dict:
+        return {"ids": list(self.ids)}
+
+    def delete(self, ids: list):
+        drop = set(ids)
+        keep = [i for i, cid in enumerate(self.ids) if cid not in drop]
+        self.matrix = np.asarray(self.matrix)[keep] if len(keep) else np.zeros((0, self.matrix.shape[1]), np.float32)
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+
+    def add_texts(self, texts: list, metadatas: list = None, ids: list = None) -> list:
+        """Embeda os textos (uma chamada de embed_documents) e substitui ids já existentes."""
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [hashlib.sha256(t.encode("utf-8")).hexdigest()[:32] for t in texts]
+        vectors = _normalize(np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32))
+        existing = set(self.ids)
+        self.delete([cid for cid in ids if cid in existing])
+        current = np.asarray(self.matrix) if len(self.ids) else np.zeros((0, vectors.shape[1]), np.float32)
+        self.matrix = np.vstack([current, vectors])
+        self.ids += ids
+        self.texts += texts
+        self.metadatas += metadatas
+        return ids
+
+    def persist(self):
+        """
+        Grava a matriz em um arquivo novo e troca o meta.json atomicamente:
+        processos com o índice antigo aberto continuam lendo o arquivo antigo.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        matrix = np.ascontiguousarray(self.matrix, dtype=np.float32)
+        vectors_file = f"vectors-{hashlib.sha256(matrix.tobytes()).hexdigest()[:12]}.f32"
+        if not os.path.exists(os.path.join(self.path, vectors_file)):
+            # Nome derivado do conteúdo: matriz igual já está gravada
+            matrix.tofile(os.path.join(self.path, vectors_file))
+
+        tmp_path = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                "vectors_file": vectors_file,
+                "ids": self.ids,
+                "texts": self.texts,
+                "metadatas": self.metadatas,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+
+        self._load()
+        for name in os.listdir(self.path):
+            if name.startswith("vectors-") and name != vectors_file:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    # Windows: arquivo ainda mapeado por outro processo; sai na próxima gravação
+                    pass
+
+    # --- Leitura (cérebro) ---
+    def search(self, query: str, k: int = DEFAULT_K) -> list:
+        """Top-k por cosseno: [(score, id, texto, metadados)], do mais parecido ao menos."""
+        if not self.ids:
+            return []
+        query_vector = _normalize(np.asarray(self.embedding_function.embed_query(query), dtype=np.float32))
+        scores = self.matrix @ query_vector
+        k = min(k, len(self.ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.ids[i], self.texts[i], self.metadatas[i]) for i in top]
+
+    def similarity_search(self, query: str, k: int = DEFAULT_K) -> list:
+        from langchain_core.documents import Document
+        return [Document(page_content=text, metadata=dict(metadata, id=cid))
+                for _, cid, text, metadata in self.search(query, k)]
+
+    def as_retriever(self, search_kwargs: dict = None):
+        """Retriever do LangChain sobre este índice (mesma interface do Chroma.as_retriever())."""
+        k = (search_kwargs or {}).get("k", DEFAULT_K)
+        return _retriever_class()(store=self, k=k)
+
+
+_retriever_cls = None
+
+
+def _retriever_class():
+    # langchain_core só é importado quando o retriever é montado
+    global _retriever_cls
+    if _retriever_cls is None:
+        from pydantic import ConfigDict
+        from langchain_core.retrievers import BaseRetriever
+
+        class NumpyRetriever(BaseRetriever):
+            model_config = ConfigDict(arbitrary_types_allowed=True)
+
+            store: NumpyVectorStore
+            k: int = DEFAULT_K
+
+            def _get_relevant_documents(self, query, *, run_manager=None):
+                return self.store.similarity_search(query, self.k)
+
+        _retriever_cls = NumpyRetriever
+    return _retriever_cls